@@ -0,0 +1,133 @@
+"""
+Agent Service: pool de agentes, ejecutores y cola de trabajos compartidos por las APIs
+(api_wrapper.py con Flask/gunicorn y api_asgi.py con ASGI/uvicorn).
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import ExitStack, contextmanager
+
+from agents.v3.deadline import Deadline, deadline_scope
+from agents.v3.orchestrator_v4 import AgentOrchestrator
+from agents.v3.progress import progress_scope
+from job_queue import JobQueue
+
+logger = logging.getLogger("agent_api")
+
+# Variables de entorno
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gen-lang-client-0585991170")
+LOCATION = os.getenv("VERTEX_LOCATION", "us-central1")
+API_KEY = os.getenv("AGENT_API_KEY", "your-secret-api-key")
+# Presupuesto por petición síncrona (por debajo del timeout de 300s de gunicorn) y por trabajo
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "280"))
+JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", "3600"))
+# Duración máxima de una conexión SSE (por debajo del timeout de gunicorn; el cliente reconecta)
+PROGRESS_STREAM_SECONDS = float(os.getenv("PROGRESS_STREAM_SECONDS", "240"))
+
+# ---------- Pool de agentes (uno por proceso, inicializado al arrancar el worker) ----------
+
+class AgentPool:
+    """
+    Agentes inicializados una sola vez por proceso (vertexai.init, modelos, cliente de
+    Discovery Engine). Cada petición usa una copia ligera (AgentOrchestrator.fork) con su
+    propio estado por ejecución (audit_trail, verification_log, pipeline_state).
+    """
+    
+    def __init__(self, project_id, location):
+        self.project_id = project_id
+        self.location = location
+        self._orchestrator = None
+        self._lock = threading.Lock()
+    
+    @property
+    def warm(self):
+        return self._orchestrator is not None
+    
+    def start(self):
+        """Inicializa los agentes (idempotente). Lanza la excepción si falla: se reintenta en la siguiente petición."""
+        with self._lock:
+            if self._orchestrator is None:
+                started = time.monotonic()
+                self._orchestrator = AgentOrchestrator(project_id=self.project_id, location=self.location)
+                logger.info(f"🔥 Pool de agentes listo en {time.monotonic() - started:.2f}s (pid {os.getpid()})")
+            return self._orchestrator
+    
+    def orchestrator(self):
+        return self.start().fork()
+
+agent_pool = AgentPool(PROJECT_ID, LOCATION)
+
+# ---------- Ejecutores (compartidos por endpoints síncronos y cola de trabajos) ----------
+
+def execute_agent_1(data):
+    return agent_pool.orchestrator().agent_1.run(override_topic=data.get('manual_topic'))
+
+def execute_agent_2(data):
+    return agent_pool.orchestrator().agent_2.run(data['topic'])
+
+def execute_agent_3(data):
+    return agent_pool.orchestrator().agent_3.run(data['topic'], data['dossier'], force=data.get('force', False))
+
+def execute_agent_4(data):
+    return agent_pool.orchestrator().agent_4.run(data['article'], data['dossier'], force=data.get('force', False))
+
+def execute_pipeline(data):
+    return agent_pool.orchestrator().run_pipeline(
+        manual_topic=data.get('manual_topic'),
+        save_output=data.get('save_output', True),
+        force=data.get('force', False)
+    )
+
+def execute_batch(data):
+    return agent_pool.orchestrator().run_batch(
+        topics=data['topics'],
+        max_concurrency=data.get('max_concurrency'),
+        save_output=data.get('save_output', True),
+        force=data.get('force', False)
+    )
+
+@contextmanager
+def job_scope(job_id, cancel_event):
+    """
+    Contexto de cada trabajo encolado: deadline cancelable vía POST /jobs/<job_id>/cancel
+    y eventos de progreso en /runs/<job_id>/events (run_id = job_id).
+    """
+    with ExitStack() as stack:
+        stack.enter_context(deadline_scope(Deadline(JOB_DEADLINE_SECONDS, cancel_event=cancel_event)))
+        stack.enter_context(progress_scope(job_id))
+        yield
+
+# Cola persistente para ejecuciones largas (no bloquea los endpoints interactivos)
+job_queue = JobQueue(
+    runners={
+        "agent1": execute_agent_1,
+        "agent2": execute_agent_2,
+        "agent3": execute_agent_3,
+        "agent4": execute_agent_4,
+        "pipeline": execute_pipeline,
+        "batch": execute_batch,
+    },
+    db_path=os.getenv("JOB_DB_PATH"),
+    workers=int(os.getenv("JOB_WORKERS", "1")),
+    default_callback_url=os.getenv("JOB_CALLBACK_URL"),
+    allowed_callback_hosts=os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(","),
+    job_scope=job_scope
+)
+
+REQUIRED_FIELDS = {
+    "agent2": ("topic",),
+    "agent3": ("topic", "dossier"),
+    "agent4": ("article", "dossier"),
+    "batch": ("topics",),
+}
+
+def job_accepted(job_id):
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/runs/{job_id}/events",
+        "stream_url": f"/runs/{job_id}/events/stream"
+    }
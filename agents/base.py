@@ -2,11 +2,10 @@
 from abc import ABC, abstractmethod
 import logging
 from typing import List, Optional
-import vertexai
-from vertexai.generative_models import GenerativeModel as VertexModel
-import google.generativeai as genai
-from utils.security import SecuritySanitizer
-import streamlit as st
+from agents.v3.deadline import DeadlineExceeded, call_with_deadline, remaining_timeout, sleep
+from agents.v3.redaction import get_engine
+from agents.v3.replay import generate_content
+from agents.v3.tracing import increment, record_usage, set_attribute, traced
 
 logger = logging.getLogger("semhys-agents")
 
@@ -25,6 +24,9 @@ class SemhysAgent(ABC):
         self._initialize_model()
 
     def _initialize_model(self):
+        # streamlit y los SDK de modelos se cargan al crear el agente, no al importar el módulo
+        import streamlit as st
+        
         # 1. Intentar buscar API KEY
         api_key = None
         try:
@@ -141,6 +143,7 @@ class SemhysAgent(ABC):
 
         # 2. Fallback a Vertex AI (Default)
         try:
+            from vertexai.generative_models import GenerativeModel as VertexModel
             vertex = "gemini-1.0-pro" if "1.0" in self.model_version else self.model_version
             self.model = VertexModel(
                 vertex,
@@ -158,6 +161,7 @@ class SemhysAgent(ABC):
         """Cada agente debe definir su propia personalidad e instrucciones base."""
         pass
 
+    @traced("llm.generate")
     def generate(self, prompt: str, context: str = "") -> str:
         """Método principal para generar respuesta."""
         if not self.model:
@@ -172,6 +176,8 @@ class SemhysAgent(ABC):
         
         retry_delay = 5
         tried_models_log = []
+        set_attribute("agent", self.name)
+        set_attribute("backend", self.backend)
 
         for attempt in range(max_retries + 1):
             current_model_name = self.model_name_current if hasattr(self, 'model_name_current') else 'Vertex/Default'
@@ -180,16 +186,24 @@ class SemhysAgent(ABC):
             try:
                 # 1. Generación
                 # Check if model object has generate_content (it should)
-                response = self.model.generate_content(
+                response = call_with_deadline(
+                    generate_content,
+                    self.model,
+                    f"{self.name}/{current_model_name}",
                     full_prompt,
                     generation_config={"temperature": self.temperature, "max_output_tokens": 2048}
                 )
                 raw_text = response.text
+                set_attribute("model", current_model_name)
+                record_usage(response)
 
                 # 2. ANOMIMIZACIÓN OBLIGATORIA (Capa de salida)
-                safe_text = SecuritySanitizer.sanitize(raw_text)
+                safe_text = get_engine("pii_standard").redact(raw_text)
                 return safe_text
 
+            except DeadlineExceeded:
+                # Sin tiempo o petición cancelada: no reintentar, propagar al llamador
+                raise
             except Exception as e:
                 error_str = str(e)
                 # Detectar 429 (Quota) o 500 (Internal Error que a veces pide cambio de modelo)
@@ -219,20 +233,25 @@ class SemhysAgent(ABC):
                             self.model_name_current = next_model
                             
                             print(f"[{self.name}] ✅ Cambio exitoso a {next_model}. Reintentando...")
-                            import time
-                            time.sleep(2) 
+                            increment("retries")
+                            sleep(2)
                             continue # Reintentar loop con nuevo modelo
                         except Exception as switch_e:
                             print(f"[{self.name}] ❌ Error cambiando modelo: {switch_e}. Intentando siguiente...")
                             # Si falla el cambio, el loop continuará y caerá en el backoff tradicional o siguiente intento
 
                     # Si no se pudo rotar (o es Vertex), usar Backoff tradicional
+                    remaining = remaining_timeout()
+                    if remaining is not None and remaining <= retry_delay:
+                        logger.warning(f"⏱️ Sin tiempo para reintentar en {self.name} ({remaining:.1f}s restantes)")
+                        # Igual que un deadline agotado en la llamada: el pipeline toma su camino de 504
+                        raise DeadlineExceeded(f"Deadline agotado en {self.name} tras: {e}") from e
                     if attempt < max_retries:
-                        import time
                         logger.warning(f"⚠️ Rate Limit (429) en {self.name}. Reintentando en {retry_delay}s...")
                         print(f"[{self.name}] ⏳ Esperando {retry_delay}s para reintentar ({attempt+1}/{max_retries})...")
-                        time.sleep(retry_delay)
+                        sleep(retry_delay)
                         retry_delay *= 2 # Exponential backoff
+                        increment("retries")
                         continue
                 
                 logger.error(f"Error generando con {self.name}: {e}")
@@ -4,13 +4,26 @@ Identifica tendencias de ingeniería hidráulica y eficiencia energética a nive
 """
 
 import os
+import sys
 import json
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
 from typing import Dict, List, Optional
 from datetime import datetime
-import vertexai
-from vertexai.generative_models import GenerativeModel
-from google.cloud import discoveryengine_v1 as discoveryengine
+
+# Raíz del repositorio en el path (ejecución directa del script): los módulos v3 se
+# importan siempre como agents.v3.*, una sola instancia de deadline, tracing, progress...
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.rate_limiter import RateLimiter, get_shared_rate_limiter
+from agents.v3.trend_store import PUBLISHED_SIMILARITY, TrendStore, decayed_score, published_similarity
+from agents.v3.deadline import DeadlineExceeded, call_with_deadline_then, remaining_timeout
+from agents.v3.replay import generate_content
+from agents.v3.tracing import record_usage, set_attribute, span, submit_in_context, traced
 
 logger = logging.getLogger("agent_1_market_intelligence")
 
@@ -20,11 +33,41 @@ class MarketIntelligenceAgent:
     en ingeniería hidráulica y eficiencia energética.
     """
     
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    MODEL_NAME = "gemini-1.5-flash"
+    
+    def __init__(
+        self,
+        project_id: str,
+        location: str = "us-central1",
+        max_workers: Optional[int] = None,
+        early_exit_score: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        trend_store: Optional[TrendStore] = None,
+        staleness_hours: Optional[float] = None
+    ):
         self.project_id = project_id
         self.location = location
+        # SDK de Vertex importado al construir el agente: importar el módulo no lo carga
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
         vertexai.init(project=project_id, location=location)
-        self.model = GenerativeModel("gemini-1.5-flash")
+        self.model = GenerativeModel(self.MODEL_NAME)
+        
+        # Escaneo concurrente bajo el rate limiter compartido del proceso
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.max_workers = max_workers or int(os.getenv("AGENT1_MAX_WORKERS", "14"))
+        
+        # Corte anticipado: detener el escaneo al encontrar un tema con score >= umbral
+        if early_exit_score is None and os.getenv("AGENT1_EARLY_EXIT_SCORE"):
+            early_exit_score = float(os.getenv("AGENT1_EARLY_EXIT_SCORE"))
+        self.early_exit_score = early_exit_score
+        
+        # Historial de tendencias: solo se re-escanean las áreas obsoletas
+        self.trend_store = trend_store or TrendStore()
+        self.staleness_hours = staleness_hours or float(os.getenv("TREND_STALENESS_HOURS", "24"))
+        self.decay_half_life_hours = float(os.getenv("TREND_HALF_LIFE_HOURS", "72"))
+        # Multiplicador aplicado a temas similares a uno ya publicado
+        self.published_penalty = float(os.getenv("TREND_PUBLISHED_PENALTY", "0.2"))
         
         # Temas de interés para SEMHYS
         self.focus_areas = [
@@ -37,6 +80,22 @@ class MarketIntelligenceAgent:
             "IoT in hydraulic systems"
         ]
     
+    def _generate(self, prompt: str, generation_config: Dict):
+        """
+        Llamada al modelo bajo el rate limiter compartido, acotada por el deadline activo.
+        """
+        with span("llm.generate", agent="agent_1", model=self.MODEL_NAME) as s:
+            queued = time.monotonic()
+            self.rate_limiter.acquire()
+            s.set_attribute("rate_limit_wait_ms", round((time.monotonic() - queued) * 1000, 1))
+            # El hueco se libera cuando la llamada termina, aunque el deadline la abandone antes
+            response = call_with_deadline_then(
+                self.rate_limiter.release, generate_content, self.model, self.MODEL_NAME, prompt, generation_config
+            )
+            record_usage(response)
+            return response
+    
+    @traced("agent_1.search_google_grounding")
     def search_google_grounding(self, query: str, max_results: int = 5) -> List[Dict]:
         """
         Búsqueda con Google Search Grounding vía Vertex AI.
@@ -67,7 +126,7 @@ class MarketIntelligenceAgent:
             }}
             """
             
-            response = self.model.generate_content(
+            response = self._generate(
                 prompt,
                 generation_config={
                     "temperature": 0.3,
@@ -87,10 +146,13 @@ class MarketIntelligenceAgent:
             trends_data = json.loads(result_text)
             return trends_data.get("trends", [])
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error en Google Search Grounding: {e}")
             return []
     
+    @traced("agent_1.scan_academic_sources")
     def scan_academic_sources(self, topic: str) -> List[Dict]:
         """
         Simula búsqueda en IEEE, ScienceDirect (en producción usar APIs reales).
@@ -120,7 +182,7 @@ class MarketIntelligenceAgent:
             }}
             """
             
-            response = self.model.generate_content(
+            response = self._generate(
                 prompt,
                 generation_config={
                     "temperature": 0.4,
@@ -137,6 +199,8 @@ class MarketIntelligenceAgent:
             academic_data = json.loads(result_text)
             return academic_data.get("academic_insights", [])
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error en búsqueda académica: {e}")
             return []
@@ -163,49 +227,121 @@ class MarketIntelligenceAgent:
         final_score = min(10, (relevance + impact) / 2 * multiplier)
         return round(final_score, 2)
     
-    def select_top_topic(self) -> Dict:
+    def _score_scan_results(self, kind: str, area: str, results: List[Dict]) -> List[Dict]:
+        """
+        Etiqueta y puntúa los resultados parciales de un área.
+        """
+        scored = []
+        for item in results:
+            item["focus_area"] = area
+            item["score"] = self.score_topic_relevance(item)
+            if kind == "academic":
+                item["source_type"] = "academia"
+                item.setdefault("title", item.get("research_area", "N/A"))
+            scored.append(item)
+        return scored
+    
+    def _rank_candidates(self, topics: List[Dict], now: float) -> List[Dict]:
+        """
+        Ordena candidatos por score con decaimiento temporal,
+        penalizando temas ya publicados.
         """
-        Ejecuta el escaneo completo y selecciona el tema de mayor impacto.
+        published = self.trend_store.published_titles()
+        for topic in topics:
+            scanned_at = topic.pop("_scanned_at", now)
+            rank_score = decayed_score(topic.get("score", 0), now - scanned_at, self.decay_half_life_hours)
+            if published_similarity(topic.get("title", ""), published) >= PUBLISHED_SIMILARITY:
+                rank_score *= self.published_penalty
+                topic["already_published"] = True
+            topic["rank_score"] = round(rank_score, 2)
+            topic["scanned_at"] = datetime.fromtimestamp(scanned_at).isoformat()
+        
+        topics.sort(key=lambda x: x.get("rank_score", 0), reverse=True)
+        return topics
+    
+    @traced("agent_1.select_top_topic")
+    def select_top_topic(self, early_exit_score: Optional[float] = None) -> Dict:
+        """
+        Ejecuta el escaneo y selecciona el tema de mayor impacto.
+        
+        Solo se re-escanean las áreas cuyo último escaneo supera la antigüedad
+        configurada; el resto se toma del historial. Las áreas se escanean en
+        paralelo y los resultados parciales se puntúan a medida que llegan.
+        
+        Args:
+            early_exit_score: Si se alcanza este score, se cancela el resto del escaneo
         """
         logger.info("🔍 Iniciando escaneo global de tendencias...")
         
+        if early_exit_score is None:
+            early_exit_score = self.early_exit_score
+        
+        now = time.time()
+        stale_areas = self.trend_store.stale_areas(self.focus_areas, self.staleness_hours * 3600, now)
+        cached_areas = [a for a in self.focus_areas if a not in stale_areas]
+        logger.info(f"🗂️ Áreas a re-escanear: {len(stale_areas)}/{len(self.focus_areas)}")
+        
         all_topics = []
+        early_exit = False
+        scanned = {area: {} for area in stale_areas}
         
-        # Escanear cada área de enfoque
-        for area in self.focus_areas:
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        for area in stale_areas:
             logger.info(f"Escaneando: {area}")
-            
-            # Búsqueda con grounding
-            trends = self.search_google_grounding(area, max_results=3)
-            
-            # Búsqueda académica
-            academic = self.scan_academic_sources(area)
-            
-            # Combinar resultados
-            for trend in trends:
-                trend["focus_area"] = area
-                trend["score"] = self.score_topic_relevance(trend)
-                all_topics.append(trend)
-            
-            for insight in academic:
-                insight["focus_area"] = area
-                insight["score"] = self.score_topic_relevance(insight)
-                insight["source_type"] = "academia"
-                all_topics.append(insight)
+            # Búsqueda con grounding + búsqueda académica
+            futures[submit_in_context(executor, self.search_google_grounding, area, 3)] = ("trends", area)
+            futures[submit_in_context(executor, self.scan_academic_sources, area)] = ("academic", area)
+        
+        try:
+            for future in as_completed(futures, timeout=remaining_timeout()):
+                kind, area = futures[future]
+                partial = self._score_scan_results(kind, area, future.result())
+                all_topics.extend(partial)
+                
+                # Guardar el área en el historial cuando ambas búsquedas terminaron
+                scanned[area][kind] = partial
+                if len(scanned[area]) == 2:
+                    self.trend_store.record_scan(area, scanned[area]["trends"] + scanned[area]["academic"], now)
+                
+                best = max((t["score"] for t in partial), default=0)
+                if early_exit_score is not None and best >= early_exit_score:
+                    logger.info(f"⚡ Corte anticipado: score {best} >= {early_exit_score} en '{area}'")
+                    early_exit = True
+                    break
+        except FutureTimeout:
+            # Deadline agotado: no esperar a las búsquedas pendientes
+            early_exit = True
+            raise DeadlineExceeded("Deadline agotado durante el escaneo de tendencias")
+        finally:
+            # Cancela las búsquedas pendientes si hubo corte anticipado
+            executor.shutdown(wait=not early_exit, cancel_futures=early_exit)
         
-        # Ordenar por score
-        all_topics.sort(key=lambda x: x.get("score", 0), reverse=True)
+        set_attribute("areas_rescanned", len(stale_areas))
+        set_attribute("areas_from_history", len(cached_areas))
+        set_attribute("early_exit", early_exit)
+        
+        # Candidatos del historial para las áreas vigentes
+        for trend in self.trend_store.load_trends(cached_areas):
+            trend["_scanned_at"] = trend.pop("scanned_at")
+            all_topics.append(trend)
+        
+        # Ordenar por score con decaimiento y penalización de publicados
+        all_topics = self._rank_candidates(all_topics, now)
         
         # Seleccionar top topic
         if all_topics:
             top_topic = all_topics[0]
-            logger.info(f"✅ Tema seleccionado: {top_topic.get('title', 'N/A')} (Score: {top_topic.get('score')})")
+            logger.info(f"✅ Tema seleccionado: {top_topic.get('title', 'N/A')} (Score: {top_topic.get('score')}, Rank: {top_topic.get('rank_score')})")
             
             return {
                 "selected_topic": top_topic,
                 "alternatives": all_topics[1:6],  # Top 5 alternativas
                 "scan_date": datetime.now().isoformat(),
-                "total_topics_analyzed": len(all_topics)
+                "total_topics_analyzed": len(all_topics),
+                "early_exit": early_exit,
+                "areas_rescanned": stale_areas,
+                "areas_from_history": cached_areas
             }
         else:
             logger.warning("⚠️ No se encontraron temas. Usando tema por defecto.")
@@ -219,9 +355,13 @@ class MarketIntelligenceAgent:
                 },
                 "alternatives": [],
                 "scan_date": datetime.now().isoformat(),
-                "total_topics_analyzed": 0
+                "total_topics_analyzed": 0,
+                "early_exit": early_exit,
+                "areas_rescanned": stale_areas,
+                "areas_from_history": cached_areas
             }
     
+    @traced("agent_1.run")
     def run(self, override_topic: Optional[str] = None) -> Dict:
         """
         Punto de entrada principal del agente.
@@ -245,6 +385,9 @@ class MarketIntelligenceAgent:
                 "alternatives": [],
                 "scan_date": datetime.now().isoformat(),
                 "total_topics_analyzed": 0,
+                "early_exit": False,
+                "areas_rescanned": [],
+                "areas_from_history": [],
                 "mode": "manual_override"
             }
         else:
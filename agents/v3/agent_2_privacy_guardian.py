@@ -4,12 +4,25 @@ Extrae conocimiento técnico de la base de datos vectorial con CERO filtración
 """
 
 import os
-import re
+import sys
 import json
+import hashlib
 import logging
-from typing import Dict, List, Optional, Set
-from google.cloud import discoveryengine_v1 as discoveryengine
-from google.api_core.client_options import ClientOptions
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+# Raíz del repositorio en el path (ejecución directa del script): los módulos v3 se
+# importan siempre como agents.v3.*, una sola instancia de deadline, tracing, progress...
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.audit_store import AuditTrail, get_audit_store
+from agents.v3.deadline import DeadlineExceeded, remaining_timeout
+from agents.v3.redaction import FORBIDDEN_PATTERNS, SENSITIVE_KEYWORDS, ScanResult, get_engine
+from agents.v3.replay import replay_call, replay_mode
+from agents.v3.sanitize_cache import get_sanitize_cache
+from agents.v3.tracing import set_attribute, span, traced
 
 logger = logging.getLogger("agent_2_privacy_guardian")
 
@@ -19,30 +32,10 @@ class PrivacyGuardianAgent:
     con reglas estrictas de sanitización para proteger datos privados.
     """
     
-    # REGLAS DE HIERRO: Patrones que NUNCA deben aparecer en el output
-    FORBIDDEN_PATTERNS = [
-        # Nombres de clientes (detectar nombres propios en contexto de proyectos)
-        r'\b(Client|Cliente|Customer|Company)\s+[A-Z][a-z]+',
-        # Ubicaciones específicas de proyectos
-        r'\b\d+\s+[A-Z][a-z]+\s+(Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd)',
-        # Coordenadas GPS
-        r'\b\d+\.\d+°?\s*[NS],?\s*\d+\.\d+°?\s*[EW]',
-        # Datos financieros
-        r'\$\s*\d+[\d,]*(\.\d{2})?',
-        r'\b\d+[\d,]*\s*(USD|EUR|dollars?|euros?)\b',
-        # Números de contrato/proyecto
-        r'\b(Contract|Project|PO)\s*#?\s*\d+',
-        # Emails y teléfonos
-        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-        r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
-    ]
-    
-    # Palabras clave que indican información privada
-    SENSITIVE_KEYWORDS = {
-        'client', 'cliente', 'customer', 'contract', 'contrato',
-        'budget', 'presupuesto', 'cost', 'costo', 'price', 'precio',
-        'confidential', 'confidencial', 'proprietary', 'private'
-    }
+    # REGLAS DE HIERRO (conjunto "privacy_guardian" del servicio de redacción)
+    FORBIDDEN_PATTERNS = FORBIDDEN_PATTERNS
+    SENSITIVE_KEYWORDS = SENSITIVE_KEYWORDS
+    REDACTION_ENGINE = get_engine("privacy_guardian")
     
     def __init__(
         self,
@@ -54,15 +47,47 @@ class PrivacyGuardianAgent:
         self.location = location
         self.data_store_id = data_store_id
         
-        # Cliente de Discovery Engine
+        # Cliente de Discovery Engine (en modo replay no se crea ni se importa el SDK: sin credenciales ni red)
+        self.client = None if replay_mode() == "replay" else self._search_client(location)
+        
+        # Auditoría de sanitización: contadores + muestra en memoria, log completo en audit_store
+        self.audit_trail = AuditTrail(get_audit_store())
+        
+        # Resultados de sanitización por documento, compartidos entre workers (sanitize_cache.py)
+        self.sanitized_store = get_sanitize_cache()
+        
+        # Cachés compartidas en modo batch (ver enable_shared_caches)
+        self.retrieval_cache: Optional[Dict] = None
+        self.sanitize_cache: Optional[Dict] = None
+        self.cache_stats: Optional[Dict] = None
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _search_client(location: str):
+        """Cliente de Discovery Engine; el SDK se importa aquí y no al importar el módulo."""
+        from google.cloud import discoveryengine_v1 as discoveryengine
+        from google.api_core.client_options import ClientOptions
+
         client_options = (
             ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
             if location != "global" else None
         )
-        self.client = discoveryengine.SearchServiceClient(client_options=client_options)
-        
-        # Audit log para tracking de sanitización
-        self.audit_log = []
+        return discoveryengine.SearchServiceClient(client_options=client_options)
+
+    def enable_shared_caches(self):
+        """
+        Activa cachés de recuperación y sanitización compartidas.
+        Las copias del agente (ver AgentOrchestrator.run_batch) comparten las mismas cachés,
+        así cada documento repetido entre temas se sanitiza una sola vez.
+        """
+        self.retrieval_cache = {}
+        self.sanitize_cache = {}
+        self.cache_stats = {"retrieval_hits": 0, "retrieval_misses": 0, "sanitize_hits": 0, "sanitize_misses": 0}
+    
+    def disable_shared_caches(self):
+        self.retrieval_cache = None
+        self.sanitize_cache = None
+        self.cache_stats = None
     
     def _detect_sensitive_content(self, text: str) -> List[str]:
         """
@@ -71,21 +96,7 @@ class PrivacyGuardianAgent:
         Returns:
             Lista de patrones detectados
         """
-        violations = []
-        
-        # Verificar patrones prohibidos
-        for pattern in self.FORBIDDEN_PATTERNS:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                violations.append(f"Pattern: {pattern[:30]}... (matches: {len(matches)})")
-        
-        # Verificar palabras clave sensibles
-        text_lower = text.lower()
-        for keyword in self.SENSITIVE_KEYWORDS:
-            if keyword in text_lower:
-                violations.append(f"Keyword: {keyword}")
-        
-        return violations
+        return self.REDACTION_ENGINE.scan(text).violations
     
     def _sanitize_text(self, text: str) -> str:
         """
@@ -93,29 +104,20 @@ class PrivacyGuardianAgent:
         
         REGLA: Solo extraer principios técnicos, fórmulas físicas, y soluciones de ingeniería.
         """
-        # Remover patrones prohibidos
-        sanitized = text
-        for pattern in self.FORBIDDEN_PATTERNS:
-            sanitized = re.sub(pattern, "[REDACTED]", sanitized, flags=re.IGNORECASE)
-        
-        # Remover líneas que contengan keywords sensibles
-        lines = sanitized.split('\n')
-        clean_lines = []
-        
-        for line in lines:
-            line_lower = line.lower()
-            has_sensitive = any(kw in line_lower for kw in self.SENSITIVE_KEYWORDS)
-            
-            if not has_sensitive and "[REDACTED]" not in line:
-                clean_lines.append(line)
-            else:
-                self.audit_log.append({
-                    "action": "line_removed",
-                    "reason": "sensitive_content",
-                    "preview": line[:50] + "..." if len(line) > 50 else line
-                })
-        
-        return '\n'.join(clean_lines)
+        scan = self.REDACTION_ENGINE.scan(text)
+        self.audit_trail.extend(self._removed_line_events(scan.removed_lines))
+        return scan.text
+    
+    @staticmethod
+    def _removed_line_events(removed_lines: List[str]) -> List[Dict]:
+        return [
+            {
+                "action": "line_removed",
+                "reason": "sensitive_content",
+                "preview": line[:50] + "..." if len(line) > 50 else line
+            }
+            for line in removed_lines
+        ]
     
     def _extract_technical_knowledge(self, document: Dict) -> Optional[Dict]:
         """
@@ -124,6 +126,14 @@ class PrivacyGuardianAgent:
         Returns:
             Dict con conocimiento técnico sanitizado o None si no hay contenido válido
         """
+        knowledge, events = self._sanitize_document(document)
+        self.audit_trail.extend(events)
+        return knowledge
+    
+    def _sanitize_document(self, document: Dict) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        Sanitización de un documento sin efectos: (conocimiento o None, eventos de auditoría).
+        """
         # Obtener contenido del documento
         struct_data = document.get("struct_data", {})
         snippet = document.get("snippet", "")
@@ -132,27 +142,36 @@ class PrivacyGuardianAgent:
         # Combinar texto disponible
         full_text = f"{title}\n{snippet}"
         
-        # Detectar contenido sensible ANTES de sanitizar
-        violations = self._detect_sensitive_content(full_text)
+        document_name = document.get("id") or title
+        if struct_data.get("sanitized") and self.REDACTION_ENGINE.is_clean(full_text):
+            # Fragmento del espejo sanitizado en la ingesta (ingest_sanitized.py): solo verificación
+            scan = ScanResult([], full_text, [])
+        else:
+            if struct_data.get("sanitized"):
+                logger.warning(f"⚠️ Fragmento del espejo no supera la verificación, se re-sanitiza: {title[:50]}")
+            # Una sola pasada (o una consulta a la caché si el documento ya se sanitizó
+            # con esta versión de las reglas): violaciones, texto sanitizado y líneas eliminadas
+            scan = self.REDACTION_ENGINE.scan_cached(full_text, document_name, self.sanitized_store)
+        violations = scan.violations
+        sanitized_text = scan.text
         
+        events = []
         if violations:
-            self.audit_log.append({
+            events.append({
                 "action": "document_flagged",
                 "document_title": title[:50],
                 "violations": violations
             })
-        
-        # Sanitizar
-        sanitized_text = self._sanitize_text(full_text)
+        events.extend(self._removed_line_events(scan.removed_lines))
         
         # Si después de sanitizar no queda nada útil, descartar
         if len(sanitized_text.strip()) < 50:
-            self.audit_log.append({
+            events.append({
                 "action": "document_rejected",
                 "reason": "insufficient_technical_content",
                 "document_title": title[:50]
             })
-            return None
+            return None, events
         
         # Extraer metadata técnica (disciplina, tipo de documento)
         discipline = struct_data.get("discipline", "general")
@@ -168,7 +187,115 @@ class PrivacyGuardianAgent:
                 "original_length": len(full_text),
                 "sanitized_length": len(sanitized_text)
             }
-        }
+        }, events
+    
+    @traced("agent_2.search_documents")
+    def _search_documents(self, query: str, max_docs: int) -> List[Dict]:
+        """
+        Búsqueda en Discovery Engine (con caché compartida si está activa).
+        
+        Returns:
+            Lista de documentos crudos (title, snippet, struct_data, score)
+        """
+        cache_key = (query, max_docs)
+        if self.retrieval_cache is not None:
+            with self._cache_lock:
+                if cache_key in self.retrieval_cache:
+                    self.cache_stats["retrieval_hits"] += 1
+                    set_attribute("cache_hit", True)
+                    return self.retrieval_cache[cache_key]
+        
+        with span("vertex.search", data_store=self.data_store_id, page_size=max_docs):
+            documents = replay_call(
+                "discovery.search",
+                {"project": self.project_id, "data_store": self.data_store_id, "query": query, "page_size": max_docs},
+                lambda: self._discovery_search(query, max_docs)
+            )
+        
+        set_attribute("cache_hit", False)
+        set_attribute("documents", len(documents))
+        
+        if self.retrieval_cache is not None:
+            with self._cache_lock:
+                self.retrieval_cache[cache_key] = documents
+                self.cache_stats["retrieval_misses"] += 1
+        
+        return documents
+    
+    def _discovery_search(self, query: str, max_docs: int) -> List[Dict]:
+        """
+        Llamada real a Discovery Engine, normalizada a dicts serializables.
+        """
+        serving_config = self.client.serving_config_path(
+            project=self.project_id,
+            location=self.location,
+            data_store=self.data_store_id,
+            serving_config="default_config",
+        )
+        
+        from google.cloud import discoveryengine_v1 as discoveryengine
+        
+        request = discoveryengine.SearchRequest(
+            serving_config=serving_config,
+            query=query,
+            page_size=max_docs,
+        )
+        
+        # Timeout de la búsqueda acotado por el deadline de la petición
+        response = self.client.search(
+            request=request,
+            timeout=remaining_timeout(float(os.getenv("SEARCH_TIMEOUT_SECONDS", "30")))
+        )
+        
+        documents = []
+        for result in response.results:
+            documents.append({
+                "id": getattr(result.document, "name", "") or getattr(result, "id", ""),
+                "title": getattr(result.document.derived_struct_data, "title", "N/A") if hasattr(result.document, "derived_struct_data") else "N/A",
+                "snippet": getattr(result, "snippet", "") if hasattr(result, "snippet") else "",
+                "struct_data": dict(result.document.struct_data) if hasattr(result.document, "struct_data") else {},
+                "score": getattr(result, "score", 0.0) if hasattr(result, "score") else 0.0
+            })
+        return documents
+    
+    @traced("agent_2.sanitize_document")
+    def _extract_technical_knowledge_cached(self, document: Dict) -> Optional[Dict]:
+        """
+        _extract_technical_knowledge con deduplicación por contenido en modo batch.
+        Los eventos de auditoría del documento se re-aplican a la auditoría actual.
+        """
+        if self.sanitize_cache is None:
+            return self._extract_technical_knowledge(document)
+        
+        struct_data = document.get("struct_data", {})
+        content_key = hashlib.sha256(
+            "\n".join([
+                document.get("title", ""),
+                document.get("snippet", ""),
+                str(struct_data.get("discipline", "")),
+                str(struct_data.get("doc_type", ""))
+            ]).encode("utf-8")
+        ).hexdigest()
+        
+        with self._cache_lock:
+            cached = self.sanitize_cache.get(content_key)
+            if cached is not None:
+                self.cache_stats["sanitize_hits"] += 1
+        
+        if cached is None:
+            set_attribute("cache_hit", False)
+            cached = self._sanitize_document(document)
+            with self._cache_lock:
+                self.sanitize_cache[content_key] = cached
+                self.cache_stats["sanitize_misses"] += 1
+            knowledge, events = cached
+            self.audit_trail.extend(events)
+            return knowledge
+        
+        set_attribute("cache_hit", True)
+        knowledge, events = cached
+        self.audit_trail.extend(events)
+        return dict(knowledge) if knowledge else None
     
     def query_knowledge_base(self, topic: str, max_docs: int = 10) -> List[Dict]:
         """
@@ -192,50 +319,32 @@ class PrivacyGuardianAgent:
             metodologías, tecnologías, especificaciones técnicas.
             """
             
-            serving_config = self.client.serving_config_path(
-                project=self.project_id,
-                location=self.location,
-                data_store=self.data_store_id,
-                serving_config="default_config",
-            )
-            
-            request = discoveryengine.SearchRequest(
-                serving_config=serving_config,
-                query=technical_query,
-                page_size=max_docs,
-            )
-            
-            response = self.client.search(request=request)
-            results = list(response.results)
+            results = self._search_documents(technical_query, max_docs)
             
             logger.info(f"📄 Documentos recuperados: {len(results)}")
             
             # Procesar y sanitizar cada documento
             sanitized_docs = []
             
-            for result in results:
-                doc_data = {
-                    "title": getattr(result.document.derived_struct_data, "title", "N/A") if hasattr(result.document, "derived_struct_data") else "N/A",
-                    "snippet": getattr(result, "snippet", "") if hasattr(result, "snippet") else "",
-                    "struct_data": dict(result.document.struct_data) if hasattr(result.document, "struct_data") else {},
-                    "score": getattr(result, "score", 0.0) if hasattr(result, "score") else 0.0
-                }
-                
+            for doc_data in results:
                 # Extraer conocimiento técnico
-                technical_knowledge = self._extract_technical_knowledge(doc_data)
+                technical_knowledge = self._extract_technical_knowledge_cached(doc_data)
                 
                 if technical_knowledge:
                     sanitized_docs.append(technical_knowledge)
             
             logger.info(f"✅ Documentos sanitizados: {len(sanitized_docs)}")
-            logger.info(f"🛡️ Eventos de auditoría: {len(self.audit_log)}")
+            logger.info(f"🛡️ Eventos de auditoría: {len(self.audit_trail)}")
             
             return sanitized_docs
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"❌ Error consultando DB vectorial: {e}")
             return []
     
+    @traced("agent_2.generate_knowledge_dossier")
     def generate_knowledge_dossier(self, topic: str) -> Dict:
         """
         Genera un "Dossier de Conocimiento Sanitizado" para el tema dado.
@@ -244,8 +353,8 @@ class PrivacyGuardianAgent:
         """
         logger.info(f"📋 Generando Dossier de Conocimiento para: {topic}")
         
-        # Resetear audit log
-        self.audit_log = []
+        # Nueva auditoría por dossier (las copias del orquestador no comparten la anterior)
+        self.audit_trail = AuditTrail(get_audit_store())
         
         # Consultar DB
         sanitized_docs = self.query_knowledge_base(topic, max_docs=15)
@@ -258,23 +367,24 @@ class PrivacyGuardianAgent:
                 by_discipline[discipline] = []
             by_discipline[discipline].append(doc)
         
+        stored = self.audit_trail.flush()
+        
         # Generar dossier
         dossier = {
             "topic": topic,
             "total_documents": len(sanitized_docs),
             "disciplines_covered": list(by_discipline.keys()),
             "knowledge_base": by_discipline,
-            "audit_summary": {
-                "total_audit_events": len(self.audit_log),
-                "documents_flagged": len([e for e in self.audit_log if e.get("action") == "document_flagged"]),
-                "documents_rejected": len([e for e in self.audit_log if e.get("action") == "document_rejected"]),
-                "lines_removed": len([e for e in self.audit_log if e.get("action") == "line_removed"])
-            },
+            "audit_summary": self.audit_trail.summary(),
             "privacy_guarantee": "✅ ZERO PII - Solo conocimiento técnico",
-            "audit_log": self.audit_log  # Para revisión si es necesario
+            # Muestra de los últimos eventos; el log completo se consulta por audit_id
+            # (python agents/v3/audit_store.py <audit_id>)
+            "audit_samples": self.audit_trail.samples(),
+            "audit_id": self.audit_trail.audit_id if stored else None
         }
         
         logger.info(f"✅ Dossier generado: {len(sanitized_docs)} docs, {len(by_discipline)} disciplinas")
+        set_attribute("documents", len(sanitized_docs))
         
         return dossier
     
@@ -4,12 +4,25 @@ Procesa el Dossier de Conocimiento como única "Fuente de Verdad" y genera conte
 """
 
 import os
+import sys
 import json
+import time
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
-import vertexai
-from vertexai.generative_models import GenerativeModel
+
+# Raíz del repositorio en el path (ejecución directa del script): los módulos v3 se
+# importan siempre como agents.v3.*, una sola instancia de deadline, tracing, progress...
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.stage_cache import StageCache, dossier_fingerprint
+from agents.v3.rate_limiter import RateLimiter, get_shared_rate_limiter
+from agents.v3.deadline import DeadlineExceeded, call_with_deadline_then, check_deadline
+from agents.v3.progress import emit
+from agents.v3.replay import generate_content
+from agents.v3.tracing import record_usage, set_attribute, span, traced
 
 logger = logging.getLogger("agent_3_notebook_synthesizer")
 
@@ -19,13 +32,47 @@ class NotebookSynthesizerAgent:
     Estilo NotebookLM: procesa el dossier como única fuente de verdad.
     """
     
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    MODEL_NAME = "gemini-1.5-flash"
+    # Incrementar al cambiar los prompts: invalida la caché de artículos
+    PROMPT_VERSION = "1"
+    
+    def __init__(
+        self,
+        project_id: str,
+        location: str = "us-central1",
+        stage_cache: Optional[StageCache] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
         self.project_id = project_id
         self.location = location
+        # SDK de Vertex importado al construir el agente: importar el módulo no lo carga
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
         vertexai.init(project=project_id, location=location)
         
         # Modelo para síntesis técnica
-        self.model = GenerativeModel("gemini-1.5-flash")
+        self.model = GenerativeModel(self.MODEL_NAME)
+        
+        # Caché de artículos por contenido (tema + dossier + modelo + prompt)
+        self.stage_cache = stage_cache or StageCache()
+        
+        # Rate limiter compartido del proceso (también en modo batch)
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+    
+    def _generate(self, prompt: str, generation_config: Dict):
+        """
+        Llamada al modelo bajo el rate limiter compartido, acotada por el deadline activo.
+        """
+        with span("llm.generate", agent="agent_3", model=self.MODEL_NAME) as s:
+            queued = time.monotonic()
+            self.rate_limiter.acquire()
+            s.set_attribute("rate_limit_wait_ms", round((time.monotonic() - queued) * 1000, 1))
+            # El hueco se libera cuando la llamada termina, aunque el deadline la abandone antes
+            response = call_with_deadline_then(
+                self.rate_limiter.release, generate_content, self.model, self.MODEL_NAME, prompt, generation_config
+            )
+            record_usage(response)
+            return response
     
     def _build_context_from_dossier(self, dossier: Dict) -> str:
         """
@@ -57,6 +104,7 @@ class NotebookSynthesizerAgent:
         
         return "\n".join(context_parts)
     
+    @traced("agent_3.generate_article_structure")
     def generate_article_structure(self, topic: str, dossier: Dict) -> Dict:
         """
         Genera la estructura lógica del artículo basada en el dossier.
@@ -98,7 +146,7 @@ class NotebookSynthesizerAgent:
         """
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
                 prompt,
                 generation_config={
                     "temperature": 0.4,
@@ -118,6 +166,8 @@ class NotebookSynthesizerAgent:
             
             return structure
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generando estructura: {e}")
             # Estructura por defecto
@@ -137,6 +187,7 @@ class NotebookSynthesizerAgent:
                 "estimated_reading_time": "5 minutes"
             }
     
+    @traced("agent_3.write_section")
     def write_section(self, section: Dict, context: str, previous_sections: str = "") -> str:
         """
         Escribe una sección individual del artículo.
@@ -169,7 +220,7 @@ class NotebookSynthesizerAgent:
         """
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
                 prompt,
                 generation_config={
                     "temperature": 0.5,
@@ -183,10 +234,13 @@ class NotebookSynthesizerAgent:
             
             return section_content
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error escribiendo sección {section.get('section_number')}: {e}")
             return f"[Error generando contenido para sección {section.get('section_title')}]"
     
+    @traced("agent_3.synthesize_article")
     def synthesize_article(self, topic: str, dossier: Dict) -> Dict:
         """
         Genera el artículo completo basado en el dossier.
@@ -207,6 +261,8 @@ class NotebookSynthesizerAgent:
         previous_content = ""
         
         for section in structure.get("sections", []):
+            # Sin presupuesto restante no tiene sentido seguir escribiendo secciones
+            check_deadline("agent_3.write_section")
             section_content = self.write_section(section, context, previous_content)
             
             article_sections.append({
@@ -214,6 +270,7 @@ class NotebookSynthesizerAgent:
                 "section_title": section.get("section_title"),
                 "content": section_content
             })
+            emit("section_written", "agent_3", topic=topic, **article_sections[-1])
             
             # Acumular contenido previo para coherencia
             previous_content += f"\n\n## {section.get('section_title')}\n{section_content}"
@@ -259,18 +316,44 @@ class NotebookSynthesizerAgent:
             }
         }
     
-    def run(self, topic: str, dossier: Dict) -> Dict:
+    @traced("agent_3.run")
+    def run(self, topic: str, dossier: Dict, force: bool = False) -> Dict:
         """
         Punto de entrada principal del agente.
         
         Args:
             topic: Tema del artículo
             dossier: Dossier de conocimiento de Agent 2
+            force: Si True, ignora la caché y regenera el artículo
         
         Returns:
             Artículo técnico completo
         """
-        return self.synthesize_article(topic, dossier)
+        cache_key = self.stage_cache.key("agent_3_synthesis", {
+            "topic": topic,
+            "dossier": dossier_fingerprint(dossier),
+            "model": self.MODEL_NAME,
+            "prompt_version": self.PROMPT_VERSION
+        })
+        
+        if not force:
+            cached = self.stage_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"⚡ Artículo recuperado de caché ({cache_key[:12]})")
+                set_attribute("cache_hit", True)
+                # Copia: el dict de la caché no se modifica
+                return {**cached, "cache": {"hit": True, "key": cache_key}}
+        
+        set_attribute("cache_hit", False)
+        result = self.synthesize_article(topic, dossier)
+        
+        # No cachear artículos con secciones fallidas
+        failed_sections = [s for s in result["article"]["sections"] if s["content"].startswith("[Error")]
+        if not failed_sections:
+            self.stage_cache.put(cache_key, result)
+        
+        result["cache"] = {"hit": False, "key": cache_key}
+        return result
 
 
 if __name__ == "__main__":
@@ -7,10 +7,25 @@ import os
 import json
 import logging
 import re
+import sys
+import time
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-import vertexai
-from vertexai.generative_models import GenerativeModel
+
+# Raíz del repositorio en el path (ejecución directa del script): los módulos v3 se
+# importan siempre como agents.v3.*, una sola instancia de deadline, tracing, progress...
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.evidence_index import EvidenceIndex
+from agents.v3.claim_checker import extract_local_claims, pre_verify
+from agents.v3.stage_cache import StageCache, dossier_fingerprint
+from agents.v3.rate_limiter import RateLimiter, get_shared_rate_limiter
+from agents.v3.deadline import DeadlineExceeded, call_with_deadline_then, check_deadline
+from agents.v3.progress import emit
+from agents.v3.replay import generate_content
+from agents.v3.tracing import record_usage, set_attribute, span, traced
 
 logger = logging.getLogger("agent_4_auditor")
 
@@ -20,17 +35,59 @@ class AuditorAgent:
     Valida cada afirmación técnica contra las fuentes del dossier.
     """
     
-    def __init__(self, project_id: str, location: str = "us-central1"):
+    MODEL_NAME = "gemini-1.5-flash"
+    # Incrementar al cambiar prompts o reglas de verificación: invalida la caché de auditorías
+    PROMPT_VERSION = "1"
+    
+    # Pasajes del dossier enviados al LLM por cada afirmación
+    EVIDENCE_TOP_K = 5
+    
+    def __init__(
+        self,
+        project_id: str,
+        location: str = "us-central1",
+        local_extraction: bool = True,
+        stage_cache: Optional[StageCache] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
         self.project_id = project_id
         self.location = location
+        # SDK de Vertex importado al construir el agente: importar el módulo no lo carga
+        import vertexai
+        from vertexai.generative_models import GenerativeModel
         vertexai.init(project=project_id, location=location)
         
         # Modelo con Temperature: 0 para máxima precisión
-        self.model = GenerativeModel("gemini-1.5-flash")
+        self.model = GenerativeModel(self.MODEL_NAME)
+        
+        # Caché de auditorías por contenido (artículo + dossier + modelo + prompt)
+        self.stage_cache = stage_cache or StageCache()
+        
+        # Rate limiter compartido del proceso (también en modo batch)
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        
+        # Extracción local de afirmaciones (sin LLM) + pre-verificación numérica
+        self.local_extraction = local_extraction
         
         # Log de verificación
         self.verification_log = []
     
+    def _generate(self, prompt: str, generation_config: Dict):
+        """
+        Llamada al modelo bajo el rate limiter compartido, acotada por el deadline activo.
+        """
+        with span("llm.generate", agent="agent_4", model=self.MODEL_NAME) as s:
+            queued = time.monotonic()
+            self.rate_limiter.acquire()
+            s.set_attribute("rate_limit_wait_ms", round((time.monotonic() - queued) * 1000, 1))
+            # El hueco se libera cuando la llamada termina, aunque el deadline la abandone antes
+            response = call_with_deadline_then(
+                self.rate_limiter.release, generate_content, self.model, self.MODEL_NAME, prompt, generation_config
+            )
+            record_usage(response)
+            return response
+    
+    @traced("agent_4.extract_claims")
     def extract_claims(self, article_text: str) -> List[str]:
         """
         Extrae afirmaciones técnicas del artículo que requieren verificación.
@@ -68,7 +125,7 @@ class AuditorAgent:
         """
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
                 prompt,
                 generation_config={
                     "temperature": 0.0,  # TEMPERATURA CERO para precisión
@@ -89,13 +146,20 @@ class AuditorAgent:
             logger.info(f"🔍 Afirmaciones extraídas: {len(claims)}")
             return claims
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error extrayendo afirmaciones: {e}")
             return []
     
-    def verify_claim(self, claim: Dict, dossier: Dict) -> Dict:
+    def verify_claim(self, claim: Dict, dossier: Dict, evidence_index: Optional[EvidenceIndex] = None) -> Dict:
         """
-        Verifica una afirmación individual contra el dossier.
+        Verifica una afirmación individual contra los pasajes relevantes del dossier.
+        
+        Args:
+            claim: Afirmación extraída del artículo
+            dossier: Dossier de conocimiento de Agent 2
+            evidence_index: Índice de pasajes del dossier (se construye si no se pasa)
         
         Returns:
             Dict con resultado de verificación
@@ -103,20 +167,42 @@ class AuditorAgent:
         claim_text = claim.get("claim_text", "")
         claim_id = claim.get("claim_id", 0)
         
-        # Construir contexto de verificación desde el dossier
-        knowledge_base = dossier.get("knowledge_base", {})
-        all_technical_content = []
+        if evidence_index is None:
+            evidence_index = EvidenceIndex(dossier)
         
-        for discipline, docs in knowledge_base.items():
-            for doc in docs:
-                all_technical_content.append(doc.get("technical_content", ""))
+        # Solo los top-k pasajes que respaldan esta afirmación
+        candidates = evidence_index.search(claim_text, top_k=self.EVIDENCE_TOP_K)
+        sources_context = "\n".join(f"[{c['passage_id']}] {c['text']}" for c in candidates)
+        
+        if not candidates:
+            verification = {
+                "claim_id": claim_id,
+                "claim_text": claim_text,
+                "verified": False,
+                "confidence": 0.0,
+                "issue": "Ningún pasaje del dossier respalda esta afirmación",
+                "recommendation": "eliminar",
+                "verification_method": "no_evidence",
+                "supporting_evidence_candidates": []
+            }
+            logger.info(f"❌ NO VERIFICABLE - Claim #{claim_id}: sin pasajes candidatos")
+            self.verification_log.append(verification)
+            return verification
         
-        sources_context = "\n\n".join(all_technical_content)
+        # Pre-verificación numérica determinista: solo lo ambiguo va al LLM
+        local_result = pre_verify(claim, candidates)
+        if local_result:
+            verification = {"claim_id": claim_id, "claim_text": claim_text, **local_result}
+            verification["supporting_evidence_candidates"] = candidates
+            status = "✅ VERIFICADA" if verification["verified"] else "❌ NO VERIFICABLE"
+            logger.info(f"{status} (local) - Claim #{claim_id}: {claim_text[:60]}...")
+            self.verification_log.append(verification)
+            return verification
         
         prompt = f"""
         Actúa como un auditor técnico riguroso.
         
-        FUENTES VERIFICADAS (Dossier de Conocimiento):
+        PASAJES CANDIDATOS (Dossier de Conocimiento):
         {sources_context}
         
         AFIRMACIÓN A VERIFICAR:
@@ -134,14 +220,15 @@ class AuditorAgent:
         {{
             "verified": true/false,
             "confidence": 0.0-1.0,
-            "supporting_evidence": "cita textual de la fuente que respalda (si verified=true)",
+            "supporting_evidence": "cita textual del pasaje que respalda (si verified=true)",
+            "supporting_passage_ids": ["id del pasaje entre corchetes"],
             "issue": "descripción del problema (si verified=false)",
             "recommendation": "mantener/modificar/eliminar"
         }}
         """
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
                 prompt,
                 generation_config={
                     "temperature": 0.0,  # TEMPERATURA CERO
@@ -159,6 +246,8 @@ class AuditorAgent:
             verification = json.loads(result_text)
             verification["claim_id"] = claim_id
             verification["claim_text"] = claim_text
+            verification["verification_method"] = "llm"
+            verification["supporting_evidence_candidates"] = candidates
             
             # Log
             status = "✅ VERIFICADA" if verification.get("verified") else "❌ NO VERIFICABLE"
@@ -168,6 +257,8 @@ class AuditorAgent:
             
             return verification
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error verificando claim #{claim_id}: {e}")
             return {
@@ -176,7 +267,9 @@ class AuditorAgent:
                 "verified": False,
                 "confidence": 0.0,
                 "issue": f"Error de verificación: {str(e)}",
-                "recommendation": "eliminar"
+                "recommendation": "eliminar",
+                "verification_method": "llm",
+                "supporting_evidence_candidates": candidates
             }
     
     def generate_references_section(self, dossier: Dict) -> str:
@@ -203,6 +296,7 @@ class AuditorAgent:
         
         return references_section
     
+    @traced("agent_4.audit_article")
     def audit_article(self, article: Dict, dossier: Dict) -> Dict:
         """
         Audita el artículo completo.
@@ -217,14 +311,35 @@ class AuditorAgent:
         
         article_text = article.get("full_text", "")
         
-        # Extraer afirmaciones
-        claims = self.extract_claims(article_text)
+        # Extraer afirmaciones (local por defecto, LLM como alternativa)
+        if self.local_extraction:
+            claims = extract_local_claims(article_text)
+            logger.info(f"🔍 Afirmaciones extraídas (local): {len(claims)}")
+        else:
+            claims = self.extract_claims(article_text)
+        
+        # Indexar el dossier una sola vez para toda la auditoría
+        evidence_index = EvidenceIndex(dossier)
+        logger.info(f"📚 Índice de evidencia: {len(evidence_index)} pasajes")
+        set_attribute("claims", len(claims))
         
         # Verificar cada afirmación
         verifications = []
         for claim in claims:
-            verification = self.verify_claim(claim, dossier)
+            check_deadline("agent_4.verify_claim")
+            with span("agent_4.verify_claim", claim_id=claim.get("claim_id")) as s:
+                verification = self.verify_claim(claim, dossier, evidence_index)
+                s.set_attribute("verification_method", verification.get("verification_method"))
+                s.set_attribute("verified", bool(verification.get("verified")))
             verifications.append(verification)
+            emit(
+                "claim_verified", "agent_4",
+                claim_id=verification.get("claim_id"),
+                claim_text=verification.get("claim_text"),
+                verified=bool(verification.get("verified")),
+                verification_method=verification.get("verification_method"),
+                progress=f"{len(verifications)}/{len(claims)}"
+            )
         
         # Calcular estadísticas
         total_claims = len(verifications)
@@ -233,6 +348,16 @@ class AuditorAgent:
         
         verification_rate = (verified_claims / total_claims * 100) if total_claims > 0 else 0
         
+        # Verificaciones resueltas sin LLM
+        llm_verifications = len([v for v in verifications if v.get("verification_method") == "llm"])
+        avoided_verifications = total_claims - llm_verifications
+        pre_verification = {
+            "local_extraction": self.local_extraction,
+            "resolved_locally": avoided_verifications,
+            "sent_to_llm": llm_verifications,
+            "llm_verifications_avoided_rate": round(avoided_verifications / total_claims * 100, 2) if total_claims > 0 else 0.0
+        }
+        
         # Determinar si el artículo pasa la auditoría
         # REGLA: Mínimo 80% de afirmaciones verificadas
         MINIMUM_VERIFICATION_RATE = 80.0
@@ -244,6 +369,7 @@ class AuditorAgent:
         
         # Si pasa la auditoría, agregar referencias al artículo
         audited_article = article.copy()
+        audited_article["metadata"] = dict(article.get("metadata", {}))
         if passed_audit:
             audited_article["full_text"] = article_text + "\n\n" + references_section
             audited_article["metadata"]["references_added"] = True
@@ -259,12 +385,15 @@ class AuditorAgent:
             "verified_claims": verified_claims,
             "unverified_claims": unverified_claims,
             "minimum_required_rate": MINIMUM_VERIFICATION_RATE,
+            "evidence_passages_indexed": len(evidence_index),
+            "pre_verification": pre_verification,
             "verifications": verifications,
             "recommendations": self._generate_recommendations(verifications),
             "audited_at": datetime.now().isoformat()
         }
         
         logger.info(f"{'✅' if passed_audit else '❌'} Auditoría completada: {verification_rate:.1f}% verificado")
+        logger.info(f"⚡ Verificaciones LLM evitadas: {avoided_verifications}/{total_claims} ({pre_verification['llm_verifications_avoided_rate']}%)")
         
         return {
             "audited_article": audited_article,
@@ -292,18 +421,49 @@ class AuditorAgent:
         
         return recommendations
     
-    def run(self, article: Dict, dossier: Dict) -> Dict:
+    @traced("agent_4.run")
+    def run(self, article: Dict, dossier: Dict, force: bool = False) -> Dict:
         """
         Punto de entrada principal del agente.
         
         Args:
             article: Artículo generado por Agent 3
             dossier: Dossier de conocimiento de Agent 2
+            force: Si True, ignora la caché y re-audita el artículo
         
         Returns:
             Artículo auditado con reporte de verificación
         """
-        return self.audit_article(article, dossier)
+        cache_key = self.stage_cache.key("agent_4_audit", {
+            "article": article,
+            "dossier": dossier_fingerprint(dossier),
+            "model": self.MODEL_NAME,
+            "prompt_version": self.PROMPT_VERSION,
+            "local_extraction": self.local_extraction,
+            "evidence_top_k": self.EVIDENCE_TOP_K
+        })
+        
+        if not force:
+            cached = self.stage_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"⚡ Auditoría recuperada de caché ({cache_key[:12]})")
+                set_attribute("cache_hit", True)
+                # Copia: el dict de la caché no se modifica
+                return {**cached, "cache": {"hit": True, "key": cache_key}}
+        
+        set_attribute("cache_hit", False)
+        result = self.audit_article(article, dossier)
+        
+        # No cachear auditorías con errores de verificación (fallos transitorios del modelo)
+        errored = [
+            v for v in result["audit_report"]["verifications"]
+            if str(v.get("issue", "")).startswith("Error de verificación")
+        ]
+        if not errored:
+            self.stage_cache.put(cache_key, result)
+        
+        result["cache"] = {"hit": False, "key": cache_key}
+        return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+Audit Store: registro de auditoría de sanitización, acotado en memoria y completo en disco.
+
+El dossier ya no lleva el log completo (viaja a Agent 3, Agent 4 y al pipeline_state):
+lleva contadores, una muestra de los últimos eventos y un audit_id. Los eventos completos
+se escriben en lotes a un almacén local de solo-anexado (SQLite) y se consultan por id:
+
+    trail = AuditTrail()
+    trail.record({"action": "line_removed", ...})
+    trail.flush()
+    trail.summary(), trail.samples(), trail.audit_id
+
+    python agents/v3/audit_store.py <audit_id>      # eventos completos de una ejecución
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger("audit_store")
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pipeline_outputs", "audit_store.db"
+)
+
+# Eventos pendientes a partir de los cuales se escriben al almacén (memoria acotada)
+FLUSH_EVERY = 500
+
+
+class AuditStore:
+    """
+    Almacén local de eventos de auditoría por audit_id. Solo se anexan filas.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = os.path.abspath(db_path or os.getenv("AUDIT_STORE_PATH", DEFAULT_DB_PATH))
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS audit_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    audit_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    action TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_audit_events_id ON audit_events (audit_id, seq);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por operación: seguro entre hilos y entre workers
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def append(self, audit_id: str, events: Iterable[Dict], first_seq: int = 0, now: Optional[float] = None):
+        now = now or time.time()
+        rows = [
+            (audit_id, first_seq + i, str(event.get("action", "")), json.dumps(event, ensure_ascii=False), now)
+            for i, event in enumerate(events)
+        ]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO audit_events (audit_id, seq, action, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def events(self, audit_id: str, action: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        query = "SELECT payload FROM audit_events WHERE audit_id = ?"
+        params: list = [audit_id]
+        if action:
+            query += " AND action = ?"
+            params.append(action)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def counts(self, audit_id: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT action, COUNT(*) FROM audit_events WHERE audit_id = ? GROUP BY action", (audit_id,)
+            ).fetchall()
+        return dict(rows)
+
+
+_default_store: Optional[AuditStore] = None
+_default_failed = False
+_default_lock = threading.Lock()
+
+
+def get_audit_store() -> Optional[AuditStore]:
+    """Almacén compartido del proceso (None si AUDIT_STORE_ENABLED=0 o no se pudo abrir)."""
+    global _default_store, _default_failed
+    if os.getenv("AUDIT_STORE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    with _default_lock:
+        if _default_store is None and not _default_failed:
+            try:
+                _default_store = AuditStore()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"⚠️ Almacén de auditoría desactivado: {e}")
+                _default_failed = True
+        return _default_store
+
+
+class AuditTrail:
+    """
+    Auditoría de una ejecución: contadores por acción, muestra circular de los
+    últimos eventos y escritura por lotes del log completo en el AuditStore.
+    """
+
+    def __init__(self, store: Optional[AuditStore] = None, sample_size: Optional[int] = None):
+        self.audit_id = uuid.uuid4().hex
+        self.store = store
+        self.counts: Counter = Counter()
+        self.total = 0
+        self._samples = deque(maxlen=sample_size if sample_size is not None else int(os.getenv("AUDIT_SAMPLE_SIZE", "20")))
+        self._pending: List[Dict] = []
+        self._flushed = 0
+        self._lock = threading.Lock()
+
+    def record(self, event: Dict):
+        with self._lock:
+            self.counts[event.get("action", "unknown")] += 1
+            self.total += 1
+            self._samples.append(event)
+            if self.store is None:
+                return
+            self._pending.append(event)
+            flush = len(self._pending) >= FLUSH_EVERY
+        if flush:
+            self.flush()
+
+    def extend(self, events: Iterable[Dict]):
+        for event in events:
+            self.record(event)
+
+    def flush(self) -> bool:
+        """Escribe los eventos pendientes. False si no hay almacén o la escritura falló."""
+        if self.store is None:
+            return False
+        with self._lock:
+            pending, self._pending = self._pending, []
+            first_seq = self._flushed
+            self._flushed += len(pending)
+        try:
+            self.store.append(self.audit_id, pending, first_seq=first_seq)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ No se pudo escribir la auditoría {self.audit_id}: {e}")
+            return False
+        return True
+
+    def samples(self) -> List[Dict]:
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "total_audit_events": self.total,
+                "documents_flagged": self.counts["document_flagged"],
+                "documents_rejected": self.counts["document_rejected"],
+                "lines_removed": self.counts["line_removed"],
+            }
+
+    def __len__(self) -> int:
+        return self.total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python agents/v3/audit_store.py <audit_id> [acción]")
+        sys.exit(1)
+    store = AuditStore()
+    for event in store.events(sys.argv[1], action=sys.argv[2] if len(sys.argv) > 2 else None):
+        print(json.dumps(event, ensure_ascii=False))
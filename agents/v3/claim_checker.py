@@ -0,0 +1,275 @@
+"""
+Verificador Numérico Local: extrae afirmaciones del artículo sin LLM y pre-verifica
+las afirmaciones numéricas contra los pasajes del dossier de forma determinista.
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from agents.v3.evidence_index import parse_number, tokenize
+
+# Unidades soportadas -> (unidad canónica, factor de conversión)
+UNIT_CONVERSIONS = {
+    "%": ("%", 1.0),
+    "w": ("kW", 0.001),
+    "kw": ("kW", 1.0),
+    "mw": ("kW", 1000.0),
+    "hp": ("kW", 0.7457),
+    "bar": ("bar", 1.0),
+    "mbar": ("bar", 0.001),
+    "kpa": ("bar", 0.01),
+    "mpa": ("bar", 10.0),
+    "psi": ("bar", 0.0689476),
+    "m³/h": ("m³/h", 1.0),
+    "m3/h": ("m³/h", 1.0),
+    "l/s": ("m³/h", 3.6),
+    "m³/s": ("m³/h", 3600.0),
+    "m3/s": ("m³/h", 3600.0),
+    "gpm": ("m³/h", 0.227125),
+}
+
+_NUMBER = r"\d+(?:[.,]\d+)*"
+_UNIT = r"%|kW|MW|W|hp|bar|mbar|kPa|MPa|psi|m³/h|m3/h|l/s|m³/s|m3/s|gpm"
+_PAIR_SEP = r"-|–|\bto\b|\ba\b|\bal\b|\bhasta\b|\by\b|\band\b"
+# Un par de valores solo es un rango si se escribe como tal: con guion o con su
+# introductor ("entre X y Y", "de X a Y", "from X to Y"). Sin él, "30% y 40%" es una lista.
+RANGE_FORMS = {
+    "entre": ("y",),
+    "between": ("and",),
+    "de": ("a", "al", "hasta"),
+    "del": ("a", "al", "hasta"),
+    "desde": ("a", "al", "hasta"),
+    "from": ("to",),
+}
+
+QUANTITY_RE = re.compile(
+    rf"(?:\b(?P<opener>{'|'.join(RANGE_FORMS)})\s+)?"
+    rf"(?P<low>{_NUMBER})\s*(?:(?P<low_unit>{_UNIT})\s*)?"
+    rf"(?:(?P<sep>{_PAIR_SEP})\s*(?P<high>{_NUMBER})\s*)?"
+    rf"(?P<unit>{_UNIT})(?![A-Za-z0-9])",
+    re.IGNORECASE,
+)
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Marcadores de afirmaciones técnicas/comparativas sin números
+COMPARATIVE_MARKERS = re.compile(
+    r"\b(than|compared|versus|vs|reduce[sn]?|increase[sn]?|improve[sn]?|"
+    r"más que|menos que|comparad[oa]s?|reduce[nr]?|aumenta[nr]?|mejora[nr]?|"
+    r"disminuye[nr]?)\b",
+    re.IGNORECASE,
+)
+PRINCIPLE_MARKERS = re.compile(
+    r"(=|\b(law|ley|ecuaci[oó]n|equation|f[oó]rmula|formula|principio|principle)\b)",
+    re.IGNORECASE,
+)
+
+# Tolerancia relativa para considerar dos valores iguales
+REL_TOLERANCE = 0.01
+
+# Términos a cada lado de un número que describen de qué magnitud se habla
+CONTEXT_WINDOW = 6
+
+
+def extract_quantities(text: str) -> List[Dict]:
+    """
+    Extrae cantidades (valores o rangos) con unidad normalizada.
+
+    Returns:
+        Lista de {"low", "high", "unit", "raw", "start", "end"} en unidades canónicas
+    """
+    quantities = []
+    for match in QUANTITY_RE.finditer(text):
+        unit_raw = match.group("unit").lower()
+        if unit_raw not in UNIT_CONVERSIONS:
+            continue
+        unit, factor = UNIT_CONVERSIONS[unit_raw]
+        low_unit, low_factor = UNIT_CONVERSIONS[(match.group("low_unit") or unit_raw).lower()]
+        low = parse_number(match.group("low")) * low_factor
+        if not match.group("high"):
+            quantities.append(_quantity(low, None, unit, match.start("low"), match.end(), text))
+            continue
+
+        high = parse_number(match.group("high")) * factor
+        if low_unit == unit and _is_range(match.group("opener"), match.group("sep")):
+            # "1 MW a 1500 kW": cada extremo con su propio factor
+            quantities.append(_quantity(low, high, unit, match.start("low"), match.end(), text))
+        else:
+            # "50% and 30 bar", "30% y 40%": dos cantidades distintas, no un rango
+            low_end = match.end("low_unit") if match.group("low_unit") else match.end("low")
+            quantities.append(_quantity(low, None, low_unit, match.start("low"), low_end, text))
+            quantities.append(_quantity(high, None, unit, match.start("high"), match.end(), text))
+    return quantities
+
+
+def _is_range(opener: Optional[str], sep: str) -> bool:
+    sep = sep.lower()
+    if sep in ("-", "–"):
+        return True
+    return bool(opener) and sep in RANGE_FORMS[opener.lower()]
+
+
+def _quantity(low: float, high: Optional[float], unit: str, start: int, end: int, text: str) -> Dict:
+    high = low if high is None else high
+    if high < low:
+        low, high = high, low
+    return {
+        "low": round(low, 6),
+        "high": round(high, 6),
+        "unit": unit,
+        "raw": text[start:end].strip(),
+        "start": start,
+        "end": end,
+    }
+
+
+def _context_terms(text: str, quantity: Dict) -> Set[str]:
+    """Términos (sin números ni stopwords) alrededor de la cantidad en el texto."""
+    def words(fragment: str) -> List[str]:
+        return [t for t in tokenize(fragment) if not t.startswith("#")]
+
+    return set(
+        words(text[:quantity["start"]])[-CONTEXT_WINDOW:]
+        + words(text[quantity["end"]:])[:CONTEXT_WINDOW]
+    )
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= REL_TOLERANCE * max(abs(a), abs(b), 1e-9)
+
+
+def _contained(claim_q: Dict, source_q: Dict) -> bool:
+    """True si el valor/rango de la afirmación cae dentro del valor/rango de la fuente."""
+    return (
+        (claim_q["low"] >= source_q["low"] or _close(claim_q["low"], source_q["low"]))
+        and (claim_q["high"] <= source_q["high"] or _close(claim_q["high"], source_q["high"]))
+    )
+
+
+def _overlaps(claim_q: Dict, source_q: Dict) -> bool:
+    return claim_q["low"] <= source_q["high"] and source_q["low"] <= claim_q["high"]
+
+
+def segment_sentences(article_text: str) -> List[Tuple[str, str]]:
+    """
+    Segmenta el artículo en frases, ignorando títulos y metadatos de Markdown.
+
+    Returns:
+        Lista de (frase, sección)
+    """
+    sentences = []
+    section = ""
+    for line in article_text.split("\n"):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("---"):
+            continue
+        if stripped.startswith("#"):
+            section = stripped.lstrip("#").strip()
+            continue
+        if stripped.startswith("**") and ":**" in stripped:
+            # Metadatos (Audiencia, Tiempo de lectura...)
+            continue
+        stripped = re.sub(r"^([-*+]|\d+\.)\s+", "", stripped)
+        for sentence in SENTENCE_SPLIT_RE.split(stripped):
+            sentence = sentence.strip()
+            if len(sentence) >= 20:
+                sentences.append((sentence, section))
+    return sentences
+
+
+def extract_local_claims(article_text: str) -> List[Dict]:
+    """
+    Extrae afirmaciones verificables sin LLM (mismo formato que AuditorAgent.extract_claims).
+    """
+    claims = []
+    for sentence, section in segment_sentences(article_text):
+        quantities = extract_quantities(sentence)
+        if quantities:
+            claim_type = "numerical"
+        elif COMPARATIVE_MARKERS.search(sentence):
+            # Números sin unidad (años, secciones, recuentos) no hacen verificable una frase
+            claim_type = "comparative"
+        elif PRINCIPLE_MARKERS.search(sentence):
+            claim_type = "principle"
+        else:
+            continue
+        claims.append({
+            "claim_id": len(claims) + 1,
+            "claim_text": sentence,
+            "claim_type": claim_type,
+            "section": section,
+            "quantities": quantities,
+        })
+    return claims
+
+
+def pre_verify(claim: Dict, candidates: List[Dict]) -> Optional[Dict]:
+    """
+    Verificación determinista de una afirmación numérica contra los pasajes candidatos.
+    Solo se compara una cantidad de la fuente si los términos que la rodean comparten
+    alguno con los de la afirmación (misma magnitud: "fugas del 5%" no se contrasta
+    con "eficiencia del 30%").
+
+    Returns:
+        Registro de verificación si el resultado es concluyente, None si es ambiguo
+        (en cuyo caso debe verificarse con el LLM).
+    """
+    claim_text = claim.get("claim_text", "")
+    quantities = claim.get("quantities")
+    if quantities is None or any("start" not in q for q in quantities):
+        quantities = extract_quantities(claim_text)
+    if not quantities or not candidates:
+        return None
+
+    # Por pasaje: [(cantidad, términos de contexto)]
+    passage_quantities = [
+        (c, [(q, _context_terms(c["text"], q)) for q in extract_quantities(c["text"])])
+        for c in candidates
+    ]
+
+    def comparable(claim_q: Dict, claim_terms: Set[str], source_qs: List) -> List[Dict]:
+        return [q for q, terms in source_qs if q["unit"] == claim_q["unit"] and terms & claim_terms]
+
+    supporting = []
+    for claim_q in quantities:
+        claim_terms = _context_terms(claim_text, claim_q)
+        match = next(
+            (
+                c for c, source_qs in passage_quantities
+                for source_q in comparable(claim_q, claim_terms, source_qs)
+                if _contained(claim_q, source_q)
+            ),
+            None,
+        )
+        if match is None:
+            break
+        supporting.append(match)
+    else:
+        # Todas las cantidades tienen coincidencia exacta o de rango
+        unique = list({c["passage_id"]: c for c in supporting}.values())
+        return {
+            "verified": True,
+            "confidence": 1.0,
+            "supporting_evidence": " ".join(c["text"] for c in unique),
+            "supporting_passage_ids": [c["passage_id"] for c in unique],
+            "recommendation": "mantener",
+            "verification_method": "numeric_match",
+        }
+
+    # Contradicción: el pasaje más relevante trae la misma magnitud (unidad y contexto) con valores disjuntos
+    top_passage, top_quantities = passage_quantities[0]
+    for claim_q in quantities:
+        same_unit = comparable(claim_q, _context_terms(claim_text, claim_q), top_quantities)
+        if same_unit and not any(_overlaps(claim_q, q) for q in same_unit):
+            return {
+                "verified": False,
+                "confidence": 0.9,
+                "issue": (
+                    f"El dato '{claim_q['raw']}' no coincide con la fuente "
+                    f"({', '.join(q['raw'] for q in same_unit)})"
+                ),
+                "supporting_passage_ids": [top_passage["passage_id"]],
+                "recommendation": "modificar",
+                "verification_method": "numeric_mismatch",
+            }
+
+    return None
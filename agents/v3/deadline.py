@@ -0,0 +1,192 @@
+"""
+Deadline: presupuesto de tiempo y cancelación por petición, propagado con ContextVar
+desde el borde HTTP (o la cola de trabajos) hasta cada búsqueda y llamada LLM.
+
+    with deadline_scope(Deadline(280)):
+        orchestrator.run_pipeline(...)
+
+    # En cada llamada externa:
+    client.search(request=req, timeout=remaining_timeout(30))
+    response = call_with_deadline(model.generate_content, prompt)
+
+    # Bajo el rate limiter: el hueco se libera cuando la llamada termina de verdad
+    limiter.acquire()
+    response = call_with_deadline_then(limiter.release, model.generate_content, prompt)
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+# Intervalo de sondeo de cancelación mientras se espera una llamada externa
+POLL_SECONDS = 0.5
+
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el presupuesto de tiempo de la petición."""
+
+
+class Cancelled(DeadlineExceeded):
+    """La petición fue cancelada (cliente desconectado o cancelación explícita)."""
+
+
+class Deadline:
+    """
+    Instante límite (monotónico) + señal de cancelación compartible entre hilos.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self._cancel_event = cancel_event or threading.Event()
+        self.cancel_reason: Optional[str] = None
+
+    def remaining(self) -> Optional[float]:
+        """Segundos restantes (None = sin límite)."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        self.cancel_reason = reason
+        self._cancel_event.set()
+
+    def check(self, what: str = ""):
+        """Lanza Cancelled/DeadlineExceeded si ya no hay que seguir trabajando."""
+        suffix = f" ({what})" if what else ""
+        if self.cancelled:
+            raise Cancelled(f"Petición cancelada: {self.cancel_reason or 'cancelled'}{suffix}")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Deadline agotado{suffix}")
+
+    def timeout(self, default: Optional[float] = None) -> Optional[float]:
+        """Timeout para la siguiente llamada: el menor entre 'default' y el tiempo restante."""
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return remaining if default is None else min(default, remaining)
+
+    def sleep(self, seconds: float):
+        """Espera interrumpible: termina antes si se cancela o se agota el deadline."""
+        remaining = self.remaining()
+        wait = seconds if remaining is None else min(seconds, max(remaining, 0))
+        self._cancel_event.wait(wait)
+        self.check()
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("semhys_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def set_deadline(deadline: Optional[Deadline]) -> contextvars.Token:
+    """Activa 'deadline' en el contexto actual; devolver el token a reset_deadline."""
+    return _current_deadline.set(deadline)
+
+
+def reset_deadline(token: contextvars.Token):
+    _current_deadline.reset(token)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Activa 'deadline' para todo el trabajo del contexto actual (y de los hilos copiados)."""
+    token = set_deadline(deadline)
+    try:
+        yield deadline
+    finally:
+        reset_deadline(token)
+
+
+def check_deadline(what: str = ""):
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(what)
+
+
+def remaining_timeout(default: Optional[float] = None) -> Optional[float]:
+    """Timeout para una llamada externa: 'default' acotado por el deadline activo."""
+    deadline = _current_deadline.get()
+    return default if deadline is None else deadline.timeout(default)
+
+
+def sleep(seconds: float):
+    """time.sleep consciente del deadline activo."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("DEADLINE_CALL_WORKERS", "32")),
+                thread_name_prefix="deadline-call"
+            )
+        return _executor
+
+
+def call_with_deadline(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecuta una llamada bloqueante sin timeout propio (p. ej. generate_content de Vertex)
+    acotada por el deadline activo. Si se agota o se cancela, el llamador recibe
+    DeadlineExceeded/Cancelled de inmediato; la llamada en curso se abandona.
+    """
+    return call_with_deadline_then(None, func, *args, **kwargs)
+
+
+def call_with_deadline_then(on_done: Optional[Callable[[], None]], func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    call_with_deadline + on_done() una sola vez, cuando la llamada termina de verdad.
+    Si el deadline la abandona, on_done se ejecuta al acabar en segundo plano: un hueco
+    del rate limiter liberado así no deja pasar más llamadas simultáneas que el límite.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if on_done is not None:
+                on_done()
+
+    try:
+        deadline.check()
+        ctx = contextvars.copy_context()
+        future = _get_executor().submit(ctx.run, func, *args, **kwargs)
+    except BaseException:
+        if on_done is not None:
+            on_done()
+        raise
+    if on_done is not None:
+        future.add_done_callback(lambda _: on_done())
+    while True:
+        remaining = deadline.remaining()
+        wait = POLL_SECONDS if remaining is None else max(min(POLL_SECONDS, remaining), 0)
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            try:
+                deadline.check("llamada externa")
+            except DeadlineExceeded:
+                future.cancel()
+                raise
@@ -0,0 +1,168 @@
+"""
+Índice de Evidencia: indexa el Dossier de Conocimiento a nivel de frase/pasaje
+para que el Auditor (Agent 4) verifique cada afirmación solo contra los pasajes relevantes.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List
+
+# Separador de frases: puntuación final seguida de espacio (no corta decimales como 3.5)
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+")
+# Números con separadores de miles y decimales: 1,500 / 1.234,5 / 0,85
+WORD_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Pasajes más cortos que esto se unen a la frase anterior
+MIN_PASSAGE_CHARS = 40
+
+STOPWORDS = {
+    # Español
+    "de", "la", "el", "en", "y", "a", "los", "las", "del", "un", "una", "por", "con",
+    "para", "que", "se", "su", "sus", "al", "lo", "como", "mas", "o", "es", "son",
+    # Inglés
+    "the", "of", "and", "in", "to", "a", "an", "by", "for", "with", "on", "is", "are",
+    "be", "can", "that", "this", "as", "at", "or", "from", "up",
+}
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin acentos."""
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def parse_number(raw: str) -> float:
+    """
+    Interpreta separadores: '1,500' -> 1500, '0,85' -> 0.85, '1.234,5' -> 1234.5.
+    Un único separador seguido de exactamente 3 dígitos se toma como separador de miles.
+    """
+    separators = re.findall(r"[.,]", raw)
+    if not separators:
+        return float(raw)
+    if len(set(separators)) == 2:
+        # Ambos presentes: el último es el decimal y el resto, de miles
+        integer, _, decimals = raw.rpartition(separators[-1])
+        return float(f"{re.sub(r'[.,]', '', integer)}.{decimals}")
+    parts = re.split(r"[.,]", raw)
+    if len(parts) > 2 or (len(parts[-1]) == 3 and parts[0] != "0"):
+        return float("".join(parts))
+    return float(".".join(parts))
+
+
+def _normalize_number(raw: str) -> str:
+    """'0,85' -> '0.85', '50.0' -> '50', '1,000' -> '1000' (mismo criterio que claim_checker)."""
+    return f"{parse_number(raw):g}"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza texto para BM25.
+    Los números se emiten además como tokens numéricos '#<valor>' normalizados.
+    """
+    folded = _fold(text)
+    tokens = [t for t in WORD_RE.findall(folded) if t not in STOPWORDS and not NUMBER_RE.fullmatch(t)]
+    tokens.extend(f"#{_normalize_number(n)}" for n in NUMBER_RE.findall(folded))
+    return tokens
+
+
+def split_passages(text: str) -> List[str]:
+    """
+    Divide un contenido técnico en pasajes (frases), uniendo fragmentos muy cortos.
+    """
+    passages: List[str] = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        for sentence in SENTENCE_SPLIT_RE.split(line):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if passages and len(sentence) < MIN_PASSAGE_CHARS:
+                passages[-1] = f"{passages[-1]} {sentence}"
+            else:
+                passages.append(sentence)
+    return passages
+
+
+class EvidenceIndex:
+    """
+    Índice BM25 sobre los pasajes del dossier, con refuerzo de coincidencias numéricas.
+    Se construye una vez por auditoría y se consulta por cada afirmación.
+    """
+
+    K1 = 1.5
+    B = 0.75
+    # Peso extra de los tokens numéricos ('#50') frente a los términos normales
+    NUMERIC_BOOST = 2.0
+
+    def __init__(self, dossier: Dict):
+        self.passages: List[Dict] = []
+        self._term_freqs: List[Counter] = []
+        self._doc_freqs: Counter = Counter()
+
+        knowledge_base = dossier.get("knowledge_base", {})
+        for discipline, docs in knowledge_base.items():
+            for doc_index, doc in enumerate(docs):
+                content = doc.get("technical_content", "")
+                for passage_index, passage in enumerate(split_passages(content)):
+                    terms = Counter(tokenize(passage))
+                    self.passages.append({
+                        "passage_id": f"{discipline}:{doc_index}:{passage_index}",
+                        "discipline": discipline,
+                        "doc_type": doc.get("doc_type", "unknown"),
+                        "text": passage,
+                        "length": sum(terms.values()),
+                    })
+                    self._term_freqs.append(terms)
+                    self._doc_freqs.update(terms.keys())
+
+        total_length = sum(p["length"] for p in self.passages)
+        self._avg_length = (total_length / len(self.passages)) if self.passages else 0.0
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def _idf(self, term: str) -> float:
+        n = len(self.passages)
+        df = self._doc_freqs.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        """
+        Devuelve los top_k pasajes que mejor respaldan la consulta.
+
+        Returns:
+            Lista de pasajes (passage_id, discipline, doc_type, text, score)
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms or not self.passages:
+            return []
+
+        scored = []
+        for passage, freqs in zip(self.passages, self._term_freqs):
+            score = 0.0
+            norm = self.K1 * (1 - self.B + self.B * passage["length"] / (self._avg_length or 1.0))
+            for term in query_terms:
+                tf = freqs.get(term, 0)
+                if not tf:
+                    continue
+                weight = self.NUMERIC_BOOST if term.startswith("#") else 1.0
+                score += weight * self._idf(term) * tf * (self.K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, passage))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [
+            {
+                "passage_id": p["passage_id"],
+                "discipline": p["discipline"],
+                "doc_type": p["doc_type"],
+                "text": p["text"],
+                "score": round(s, 4),
+            }
+            for s, p in scored[:top_k]
+        ]
@@ -2,6 +2,8 @@
 from typing import List, Dict
 import json
 from agents.base import SemhysAgent
+from agents.v3.tracing import traced
+from agents.v3.source_table import SourceTable
 
 class ConceptMapper(SemhysAgent):
     """
@@ -39,18 +41,21 @@ class ConceptMapper(SemhysAgent):
         }
         """
 
-    def map_content(self, topic: str, accepted_sources: List[Dict]) -> Dict:
+    @traced("v3.map_content")
+    def map_content(self, topic: str, accepted_sources: List[Dict], source_table: SourceTable = None) -> Dict:
         """
         Genera el mapa conceptual.
         """
         print(f"[{self.name}] Mapeando conceptos para: {topic}")
         
-        sources_text = json.dumps(accepted_sources, indent=2, ensure_ascii=False)
+        table = source_table or SourceTable(accepted_sources)
+        sources_text = table.render(("title", "content"))
         
         prompt = (
             f"Extrae el conocimiento estructurado para el tema: '{topic}'.\n"
             f"Basado EXCLUSIVAMENTE en estas fuentes aceptadas:\n\n"
             f"{sources_text}\n\n"
+            f"Usa el ID [n] de cada fuente como 'source_number'.\n"
             f"Devuelve un JSON válido con 'concept_map'."
         )
 
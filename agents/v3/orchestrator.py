@@ -1,8 +1,7 @@
 
 import json
 import logging
-from typing import Dict, List, Any
-import streamlit as st
+from typing import Dict, List, Any, Optional
 
 # Importar módulos V3
 from agents.v3.validator import SourceValidator
@@ -10,9 +9,22 @@ from agents.v3.mapper import ConceptMapper
 from agents.v3.outliner import ArticleOutliner
 from agents.v3.writer import GroundedWriter
 from agents.v3.verifier import VerifierAgent
+from agents.v3.source_table import SourceTable
+from agents.v3.deadline import check_deadline
+from agents.v3.progress import emit
+from agents.v3.tracing import set_attribute, traced
 
 logger = logging.getLogger("semhys-v3")
 
+
+def _source_id(value) -> Optional[int]:
+    """ID de fuente del validador como entero (None si no es un número)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class BloggerV3Agent:
     """
     Agente Orquestador V3 (NotebookLM Style).
@@ -26,6 +38,7 @@ class BloggerV3Agent:
         self.writer = GroundedWriter()
         self.verifier = VerifierAgent()
 
+    @traced("v3.run_pipeline")
     def run_pipeline(self, topic: str, raw_sources: List[Dict], status_container=None) -> Dict:
         """
         Ejecuta todo el flujo V3.
@@ -39,46 +52,75 @@ class BloggerV3Agent:
         def update_status(msg):
             print(f"[V3 Pipeline] {msg}")
             result["log"].append(msg)
+            emit("status", "v3", message=msg)
             if status_container:
                 status_container.write(f"⚙️ {msg}")
 
+        # Tabla compacta de fuentes (IDs estables), construida una sola vez
+        source_table = SourceTable(raw_sources)
+        set_attribute("sources", len(source_table))
+
         # --- FASE 1: VALIDACIÓN ---
         update_status("Validando fuentes con criterio CRAAP...")
-        validation_result = self.validator.validate(topic, raw_sources)
+        validation_result = self.validator.validate(topic, raw_sources, source_table=source_table)
         result["sources_validation"] = validation_result
         
-        # Filtrar solo aceptadas
+        # Filtrar solo aceptadas (match por ID contra la tabla de fuentes)
         accepted_sources = []
         if "validation_table" in validation_result:
             for s in validation_result["validation_table"]:
+                source_id = _source_id(s.get("source_number"))
+                if source_id is not None:
+                    # El LLM puede devolver "3" en lugar de 3
+                    s["source_number"] = source_id
+                if source_id not in source_table.rows:
+                    # Sin ID reconocible: se busca la fuente por url/título
+                    source_id = source_table.find(s.get("url", ""), s.get("title", ""))
+                    if source_id is not None:
+                        s["source_number"] = source_id
+                row = source_table.rows.get(source_id)
+                if row:
+                    s.setdefault("title", row["title"])
+                    s.setdefault("url", row["url"])
                 if s.get("decision") == "ACCEPTED":
-                    # Mapear de vuelta al objeto original si es necesario, 
-                    # aquí asumimos que validation_result tiene suficiente info o hacemos match por URL/ID
-                    # Para simplificar, reconstruimos una lista simple
                     accepted_sources.append(s)
+
+        accepted_table = source_table.restrict(s.get("source_number") for s in accepted_sources)
         
         if len(accepted_sources) == 0:
             result["error"] = "No sources passed validation."
             update_status("❌ Ninguna fuente pasó el filtro CRAAP. Abortando.")
             return result
 
+        if len(accepted_table) == 0:
+            # Los veredictos no traen contenido: sin fuentes identificables no hay con qué escribir
+            result["error"] = "Accepted sources do not match any input source."
+            update_status("❌ Las fuentes aceptadas no coinciden con ninguna fuente de entrada. Abortando.")
+            return result
+
         update_status(f"✅ {len(accepted_sources)} fuentes aceptadas.")
+        set_attribute("accepted_sources", len(accepted_table))
 
         # --- FASE 2: CONCEPTO Y ESTRUCTURA ---
+        check_deadline("v3.map")
         update_status("Generando mapa conceptual (Mind Map)...")
-        concept_map = self.mapper.map_content(topic, accepted_sources)
+        concept_map = self.mapper.map_content(topic, accepted_sources, source_table=accepted_table)
         result["concept_map"] = concept_map
         
+        check_deadline("v3.outline")
         update_status("Diseñando estructura del artículo...")
-        structure = self.outliner.create_outline(topic, concept_map, accepted_sources)
+        structure = self.outliner.create_outline(topic, concept_map, accepted_sources, source_table=accepted_table)
         result["article_structure"] = structure
 
         # --- FASE 3: REDACCIÓN ---
         # --- FASE 3: REDACCIÓN (ONE-SHOT OPTIMIZATION) ---
+        check_deadline("v3.write")
         update_status("Redactando artículo completo (Modo Optimizado)...")
         
         # Usamos el modo One-Shot para evitar rate limits (429) por múltiples llamadas
-        full_article_content = self.writer.write_full_article_one_shot(topic, structure, accepted_sources)
+        full_article_content = self.writer.write_full_article_one_shot(
+            topic, structure, accepted_sources, source_table=accepted_table
+        )
         
         # Simular estructura de secciones para el JSON final (parseo simple)
         sections_output = []
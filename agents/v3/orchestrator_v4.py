@@ -3,20 +3,29 @@ Orchestrator V4: Coordina la ejecución secuencial de los agentes autónomos
 """
 
 import os
+import copy
 import json
+import time
 import logging
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from datetime import datetime
 import sys
 
-# Agregar directorio padre al path para imports
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Raíz del repositorio en el path (ejecución directa del script): los módulos v3 se
+# importan siempre como agents.v3.*, una sola instancia de deadline, tracing, progress...
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
 
 # Importar agentes
-from agent_1_market_intelligence import MarketIntelligenceAgent
-from agent_2_privacy_guardian import PrivacyGuardianAgent
-from agent_3_notebook_synthesizer import NotebookSynthesizerAgent
-from agent_4_auditor import AuditorAgent
+from agents.v3.agent_1_market_intelligence import MarketIntelligenceAgent
+from agents.v3.agent_2_privacy_guardian import PrivacyGuardianAgent
+from agents.v3.agent_3_notebook_synthesizer import NotebookSynthesizerAgent
+from agents.v3.agent_4_auditor import AuditorAgent
+from agents.v3.deadline import Cancelled, DeadlineExceeded, check_deadline
+from agents.v3 import progress
+from agents.v3.tracing import current_span, set_attribute, submit_in_context, traced
 
 logger = logging.getLogger("orchestrator_v4")
 
@@ -46,10 +55,12 @@ class AgentOrchestrator:
             "results": {}
         }
     
+    @traced("pipeline.run")
     def run_pipeline(
         self,
         manual_topic: Optional[str] = None,
-        save_output: bool = True
+        save_output: bool = True,
+        force: bool = False
     ) -> Dict:
         """
         Ejecuta el pipeline completo de generación de contenido.
@@ -57,6 +68,7 @@ class AgentOrchestrator:
         Args:
             manual_topic: Tema manual desde panel de control (opcional)
             save_output: Si True, guarda resultados en archivos JSON
+            force: Si True, ignora la caché de etapas (Agent 3 y Agent 4)
         
         Returns:
             Dict con resultados completos del pipeline
@@ -67,6 +79,7 @@ class AgentOrchestrator:
         
         self.pipeline_state["started_at"] = datetime.now().isoformat()
         self.pipeline_state["status"] = "running"
+        self.pipeline_state["trace_id"] = current_span().trace_id
         
         try:
             # ========== AGENT 1: OJEADOR GLOBAL ==========
@@ -75,11 +88,15 @@ class AgentOrchestrator:
             logger.info("="*80)
             
             self.pipeline_state["current_agent"] = "agent_1"
+            check_deadline("agent_1")
+            progress.stage_started("agent_1", manual_topic=manual_topic)
             agent_1_result = self.agent_1.run(override_topic=manual_topic)
             self.pipeline_state["results"]["agent_1"] = agent_1_result
             
             selected_topic = agent_1_result["selected_topic"]["title"]
             logger.info(f"✅ Tema seleccionado: {selected_topic}")
+            set_attribute("topic", selected_topic)
+            progress.stage_finished("agent_1", topic=selected_topic, selected_topic=agent_1_result["selected_topic"])
             
             # ========== AGENT 2: GUARDIÁN DE PRIVACIDAD ==========
             logger.info("\n" + "="*80)
@@ -87,8 +104,16 @@ class AgentOrchestrator:
             logger.info("="*80)
             
             self.pipeline_state["current_agent"] = "agent_2"
+            check_deadline("agent_2")
+            progress.stage_started("agent_2", topic=selected_topic)
             agent_2_result = self.agent_2.run(selected_topic)
             self.pipeline_state["results"]["agent_2"] = agent_2_result
+            progress.stage_finished(
+                "agent_2",
+                topic=selected_topic,
+                total_documents=agent_2_result["total_documents"],
+                disciplines_covered=agent_2_result["disciplines_covered"]
+            )
             
             logger.info(f"✅ Dossier generado: {agent_2_result['total_documents']} documentos")
             logger.info(f"🛡️ {agent_2_result['privacy_guarantee']}")
@@ -99,12 +124,16 @@ class AgentOrchestrator:
             logger.info("="*80)
             
             self.pipeline_state["current_agent"] = "agent_3"
-            agent_3_result = self.agent_3.run(selected_topic, agent_2_result)
+            check_deadline("agent_3")
+            progress.stage_started("agent_3", topic=selected_topic)
+            agent_3_result = self.agent_3.run(selected_topic, agent_2_result, force=force)
             self.pipeline_state["results"]["agent_3"] = agent_3_result
             
             article = agent_3_result["article"]
             logger.info(f"✅ Artículo generado: {article['title']}")
             logger.info(f"📊 {article['metadata']['word_count']} palabras, {article['metadata']['sections_count']} secciones")
+            # Borrador completo: permite publicar/revisar mientras corre la auditoría
+            progress.stage_finished("agent_3", topic=selected_topic, draft=article)
             
             # ========== AGENT 4: AUDITOR ==========
             logger.info("\n" + "="*80)
@@ -112,10 +141,19 @@ class AgentOrchestrator:
             logger.info("="*80)
             
             self.pipeline_state["current_agent"] = "agent_4"
-            agent_4_result = self.agent_4.run(article, agent_2_result)
+            check_deadline("agent_4")
+            progress.stage_started("agent_4", topic=selected_topic)
+            agent_4_result = self.agent_4.run(article, agent_2_result, force=force)
             self.pipeline_state["results"]["agent_4"] = agent_4_result
             
             audit_report = agent_4_result["audit_report"]
+            progress.stage_finished(
+                "agent_4",
+                topic=selected_topic,
+                passed=agent_4_result["passed"],
+                audit_status=audit_report["audit_status"],
+                verification_rate=audit_report["verification_rate"]
+            )
             logger.info(f"{'✅' if agent_4_result['passed'] else '❌'} Auditoría: {audit_report['audit_status']}")
             logger.info(f"📊 Verificación: {audit_report['verification_rate']}% ({audit_report['verified_claims']}/{audit_report['total_claims']} afirmaciones)")
             
@@ -125,6 +163,7 @@ class AgentOrchestrator:
                 logger.warning(f"Recomendaciones: {', '.join(audit_report['recommendations'])}")
                 
                 self.pipeline_state["status"] = "failed_audit"
+                set_attribute("status", "failed_audit")
                 self.pipeline_state["completed_at"] = datetime.now().isoformat()
                 
                 return {
@@ -140,8 +179,12 @@ class AgentOrchestrator:
             logger.info("="*80)
             
             self.pipeline_state["status"] = "completed"
+            set_attribute("status", "completed")
             self.pipeline_state["completed_at"] = datetime.now().isoformat()
             
+            # Registrar el tema como publicado para no repetirlo en próximos escaneos
+            self.agent_1.trend_store.mark_published(selected_topic)
+            
             # Resultado final
             final_result = {
                 "status": "success",
@@ -153,7 +196,8 @@ class AgentOrchestrator:
                     "completed_at": self.pipeline_state["completed_at"],
                     "total_documents_analyzed": agent_2_result["total_documents"],
                     "disciplines_covered": agent_2_result["disciplines_covered"],
-                    "privacy_guarantee": agent_2_result["privacy_guarantee"]
+                    "privacy_guarantee": agent_2_result["privacy_guarantee"],
+                    "trace_id": self.pipeline_state["trace_id"]
                 }
             }
             
@@ -169,20 +213,123 @@ class AgentOrchestrator:
             traceback.print_exc()
             
             self.pipeline_state["status"] = "error"
+            set_attribute("status", "error")
+            progress.stage_failed(self.pipeline_state.get("current_agent") or "pipeline", str(e))
             self.pipeline_state["error"] = str(e)
             self.pipeline_state["completed_at"] = datetime.now().isoformat()
             
-            return {
+            error_result = {
                 "status": "error",
                 "error": str(e),
                 "pipeline_state": self.pipeline_state
             }
+            # Distinguir cancelaciones y deadlines agotados de errores del pipeline
+            if isinstance(e, Cancelled):
+                error_result["reason"] = "cancelled"
+            elif isinstance(e, DeadlineExceeded):
+                error_result["reason"] = "deadline_exceeded"
+            return error_result
+    
+    def fork(self) -> "AgentOrchestrator":
+        """
+        Copia ligera del orquestador para ejecutar un tema en paralelo (batch) o una
+        petición de la API sobre los agentes ya inicializados (api_wrapper.AgentPool).
+        Comparte modelos, clientes, cachés y rate limiter; el estado por ejecución
+        (pipeline_state, audit_trail, verification_log) es independiente.
+        """
+        clone = copy.copy(self)
+        clone.agent_2 = copy.copy(self.agent_2)
+        clone.agent_4 = copy.copy(self.agent_4)
+        clone.pipeline_state = {
+            "started_at": None,
+            "completed_at": None,
+            "status": "idle",
+            "current_agent": None,
+            "results": {}
+        }
+        return clone
+    
+    def _run_timed(self, topic: str, save_output: bool, force: bool) -> Dict:
+        started = time.monotonic()
+        result = self.fork().run_pipeline(manual_topic=topic, save_output=save_output, force=force)
+        duration_seconds = round(time.monotonic() - started, 2)
+        progress.emit("topic_finished", topic=topic, status=result.get("status"), duration_seconds=duration_seconds)
+        return {"topic": topic, "duration_seconds": duration_seconds, "result": result}
+    
+    @traced("pipeline.batch")
+    def run_batch(
+        self,
+        topics: List[str],
+        max_concurrency: Optional[int] = None,
+        save_output: bool = True,
+        force: bool = False
+    ) -> Dict:
+        """
+        Ejecuta el pipeline para varios temas en paralelo (p. ej. una semana de artículos).
+        
+        Todos los temas comparten la caché de recuperación, la deduplicación de
+        documentos sanitizados y el rate limiter del proceso.
+        
+        Args:
+            topics: Temas a procesar (se usan como tema manual de Agent 1)
+            max_concurrency: Máximo de temas simultáneos (BATCH_MAX_CONCURRENCY, por defecto 3)
+            save_output: Si True, guarda resultados de cada tema
+            force: Si True, ignora la caché de etapas
+        
+        Returns:
+            Dict con resultados por tema y estadísticas agregadas
+        """
+        max_concurrency = max_concurrency or int(os.getenv("BATCH_MAX_CONCURRENCY", "3"))
+        logger.info(f"📦 Iniciando batch: {len(topics)} temas (concurrencia {max_concurrency})")
+        
+        started_at = datetime.now().isoformat()
+        started = time.monotonic()
+        
+        self.agent_2.enable_shared_caches()
+        try:
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                futures = [submit_in_context(executor, self._run_timed, t, save_output, force) for t in topics]
+                per_topic = [f.result() for f in futures]
+            cache_stats = dict(self.agent_2.cache_stats)
+        finally:
+            self.agent_2.disable_shared_caches()
+        
+        total_seconds = round(time.monotonic() - started, 2)
+        statuses = [r["result"].get("status") for r in per_topic]
+        sequential_seconds = round(sum(r["duration_seconds"] for r in per_topic), 2)
+        
+        stats = {
+            "topics": len(topics),
+            "succeeded": statuses.count("success"),
+            "failed_audit": statuses.count("failed"),
+            "errors": statuses.count("error"),
+            "total_seconds": total_seconds,
+            "sum_topic_seconds": sequential_seconds,
+            "speedup": round(sequential_seconds / total_seconds, 2) if total_seconds else None,
+            "unique_documents_sanitized": cache_stats["sanitize_misses"],
+            "sanitizations_reused": cache_stats["sanitize_hits"],
+            "retrieval_cache_hits": cache_stats["retrieval_hits"],
+            "retrieval_queries": cache_stats["retrieval_misses"]
+        }
+        
+        logger.info(f"📦 Batch completado en {total_seconds}s: {stats['succeeded']}/{len(topics)} exitosos")
+        set_attribute("topics", len(topics))
+        
+        return {
+            "status": "completed",
+            "started_at": started_at,
+            "completed_at": datetime.now().isoformat(),
+            "results": per_topic,
+            "stats": stats,
+            "trace_id": current_span().trace_id
+        }
     
     def _save_results(self, result: Dict):
         """
         Guarda los resultados del pipeline en archivos.
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Microsegundos: evita colisiones entre temas de un mismo batch
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         
         # Crear directorio de outputs si no existe
         output_dir = os.path.join(os.path.dirname(__file__), "..", "..", "pipeline_outputs")
@@ -2,6 +2,8 @@
 from typing import List, Dict
 import json
 from agents.base import SemhysAgent
+from agents.v3.tracing import traced
+from agents.v3.source_table import SourceTable, compact_json
 
 class ArticleOutliner(SemhysAgent):
     """
@@ -37,21 +39,24 @@ class ArticleOutliner(SemhysAgent):
         }
         """
 
-    def create_outline(self, topic: str, concept_map: Dict, sources_summary: List[Dict]) -> Dict:
+    @traced("v3.create_outline")
+    def create_outline(self, topic: str, concept_map: Dict, sources_summary: List[Dict], source_table: SourceTable = None) -> Dict:
         """
         Crea el outline basado en los conceptos extraídos.
         """
         print(f"[{self.name}] Diseñando estructura para: {topic}")
         
-        # Simplificar inputs para el prompt
-        map_str = json.dumps(concept_map, indent=2, ensure_ascii=False)
-        sources_str = json.dumps(sources_summary, indent=2, ensure_ascii=False)
+        # Simplificar inputs para el prompt: el mapa ya cita las fuentes por ID,
+        # aquí basta con el título de cada una
+        table = source_table or SourceTable(sources_summary)
+        map_str = compact_json(concept_map)
+        sources_str = table.render(("title",))
         
         prompt = (
             f"Genera una estructura de artículo para '{topic}'.\n\n"
             f"MAPA CONCEPTUAL:\n{map_str}\n\n"
             f"FUENTES DISPONIBLES:\n{sources_str}\n\n"
-            f"Asigna fuentes específicas a cada sección. Devuelve JSON válido."
+            f"Asigna fuentes específicas (IDs [n]) a cada sección. Devuelve JSON válido."
         )
 
         response = self.generate(prompt)
@@ -0,0 +1,204 @@
+"""
+Progress: bus de eventos de progreso por ejecución (run), consumible mientras el pipeline corre.
+
+Cada run escribe sus eventos en <PROGRESS_DIR>/<run_id>.jsonl (una línea por evento),
+así cualquier worker de gunicorn puede servirlos por polling o SSE:
+
+    with progress_scope(job_id):
+        orchestrator.run_pipeline(...)          # emite stage_started/stage_finished, parciales...
+
+    read_events(job_id, after=12)               # polling
+    for event in follow(job_id, after=12): ...  # SSE
+
+Evento: {"run_id", "seq", "ts", "type", "stage", "data"}
+Tipos: run_started, stage_started, stage_finished, stage_failed, section_written,
+claim_verified, topic_finished (batch), status (pipeline V3), run_finished, run_failed.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger("progress")
+
+DEFAULT_PROGRESS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pipeline_outputs", "progress"
+)
+
+TERMINAL_EVENTS = ("run_finished", "run_failed")
+
+_RUN_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+def progress_dir() -> str:
+    return os.path.abspath(os.getenv("PROGRESS_DIR", DEFAULT_PROGRESS_DIR))
+
+
+def _run_path(run_id: str) -> str:
+    if not _RUN_ID_RE.match(run_id):
+        raise ValueError(f"run_id inválido: {run_id!r}")
+    return os.path.join(progress_dir(), f"{run_id}.jsonl")
+
+
+class ProgressRun:
+    """
+    Emisor de eventos de un run. Compartido entre los hilos del run (contexto copiado).
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.path = _run_path(run_id)
+        # Continúa la numeración si el run_id ya tiene eventos (reintento con el mismo id)
+        existing = read_events(run_id)
+        self._seq = existing[-1]["seq"] if existing else 0
+        self._lock = threading.Lock()
+        # Inicio de cada etapa por (etapa, hilo): en batch varios temas corren la misma etapa
+        self._stage_started: Dict[tuple, float] = {}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def emit(self, event_type: str, stage: Optional[str] = None, **data) -> Dict:
+        with self._lock:
+            self._seq += 1
+            event = {
+                "run_id": self.run_id,
+                "seq": self._seq,
+                "ts": time.time(),
+                "type": event_type,
+                "stage": stage,
+                "data": data
+            }
+            line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo escribir evento de progreso ({self.run_id}): {e}")
+        return event
+
+    def stage_started(self, stage: str, **data):
+        self._stage_started[(stage, threading.get_ident())] = time.monotonic()
+        self.emit("stage_started", stage, **data)
+
+    def _elapsed_ms(self, stage: str) -> Optional[float]:
+        started = self._stage_started.pop((stage, threading.get_ident()), None)
+        return round((time.monotonic() - started) * 1000, 1) if started is not None else None
+
+    def stage_finished(self, stage: str, **data):
+        self.emit("stage_finished", stage, duration_ms=self._elapsed_ms(stage), **data)
+
+    def stage_failed(self, stage: str, error: str, **data):
+        self.emit("stage_failed", stage, duration_ms=self._elapsed_ms(stage), error=error, **data)
+
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("semhys_progress_run", default=None)
+
+
+def current_run() -> Optional[ProgressRun]:
+    return _current_run.get()
+
+
+@contextmanager
+def progress_scope(run_id: str, **data):
+    """
+    Activa el run 'run_id' para todo el trabajo del contexto actual.
+    Emite run_started al entrar y run_finished/run_failed al salir.
+    """
+    _prune_old_runs()
+    run = ProgressRun(run_id)
+    token = _current_run.set(run)
+    started = time.monotonic()
+    run.emit("run_started", **data)
+    try:
+        yield run
+    except BaseException as e:
+        run.emit("run_failed", error=str(e)[:500], duration_ms=round((time.monotonic() - started) * 1000, 1))
+        raise
+    else:
+        run.emit("run_finished", duration_ms=round((time.monotonic() - started) * 1000, 1))
+    finally:
+        _current_run.reset(token)
+
+
+# ---------- Helpers para los agentes (no-op fuera de un run) ----------
+
+def emit(event_type: str, stage: Optional[str] = None, **data):
+    run = _current_run.get()
+    if run is not None:
+        run.emit(event_type, stage, **data)
+
+
+def stage_started(stage: str, **data):
+    run = _current_run.get()
+    if run is not None:
+        run.stage_started(stage, **data)
+
+
+def stage_finished(stage: str, **data):
+    run = _current_run.get()
+    if run is not None:
+        run.stage_finished(stage, **data)
+
+
+def stage_failed(stage: str, error: str, **data):
+    run = _current_run.get()
+    if run is not None:
+        run.stage_failed(stage, error, **data)
+
+
+# ---------- Lectura (polling / SSE) ----------
+
+def read_events(run_id: str, after: int = 0) -> List[Dict]:
+    """
+    Eventos del run con seq > 'after' (lista vacía si el run no existe todavía).
+    """
+    events = []
+    try:
+        with open(_run_path(run_id), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # línea a medio escribir
+                event = json.loads(line)
+                if event["seq"] > after:
+                    events.append(event)
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def follow(run_id: str, after: int = 0, poll_interval: float = 0.5, timeout: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Generador de eventos en vivo: termina tras el evento final del run o al agotar 'timeout'.
+    """
+    started = time.monotonic()
+    while True:
+        for event in read_events(run_id, after):
+            after = event["seq"]
+            yield event
+            if event["type"] in TERMINAL_EVENTS:
+                return
+        if timeout is not None and time.monotonic() - started >= timeout:
+            return
+        time.sleep(poll_interval)
+
+
+def _prune_old_runs():
+    """Elimina los logs de runs más antiguos que PROGRESS_RETENTION_HOURS."""
+    retention_s = float(os.getenv("PROGRESS_RETENTION_HOURS", "72")) * 3600
+    cutoff = time.time() - retention_s
+    try:
+        entries = os.scandir(progress_dir())
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                if entry.name.endswith(".jsonl") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
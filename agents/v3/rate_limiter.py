@@ -0,0 +1,88 @@
+"""
+Rate Limiter compartido para las llamadas a Vertex AI.
+Limita la concurrencia y el ritmo (RPM) de todas las llamadas de los agentes de un proceso.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from agents.v3.deadline import DeadlineExceeded, remaining_timeout, sleep
+
+
+class RateLimiter:
+    """
+    Limitador thread-safe: máximo de llamadas simultáneas + intervalo mínimo entre inicios.
+
+    Uso:
+        with limiter:
+            model.generate_content(...)
+
+        # Llamada acotada por el deadline: el hueco se libera cuando la llamada termina,
+        # no cuando el llamador la abandona
+        limiter.acquire()
+        call_with_deadline_then(limiter.release, model.generate_content, ...)
+    """
+
+    def __init__(self, max_concurrent: int = 16, requests_per_minute: Optional[float] = None):
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        """
+        Espera un hueco; la espera está acotada por el deadline activo (si lo hay).
+        """
+        timeout = remaining_timeout()
+        if timeout is None:
+            # Sin deadline (CLI, benchmarks): esperar sin límite
+            self._semaphore.acquire()
+        elif not self._semaphore.acquire(timeout=timeout):
+            raise DeadlineExceeded("Deadline agotado esperando al rate limiter")
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            try:
+                sleep(wait)
+            except DeadlineExceeded:
+                self._semaphore.release()
+                raise
+
+    def release(self):
+        self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """
+    Devuelve el limitador compartido del proceso.
+    Configurable con VERTEX_MAX_CONCURRENCY y VERTEX_RPM.
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            rpm = os.getenv("VERTEX_RPM")
+            _shared_limiter = RateLimiter(
+                max_concurrent=int(os.getenv("VERTEX_MAX_CONCURRENCY", "16")),
+                requests_per_minute=float(rpm) if rpm else None,
+            )
+        return _shared_limiter
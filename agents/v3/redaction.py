@@ -0,0 +1,969 @@
+"""
+Redaction: servicio único de redacción con conjuntos de reglas intercambiables.
+
+Lo usan el Guardián de Privacidad (Agent 2), la capa de salida de SemhysAgent
+(agents/base.py) y todas las rutas de semhys-agents (app/services/redaction.py):
+
+    engine = get_engine("privacy_guardian")
+    result = engine.scan(text)      # result.violations, result.text, result.removed_lines
+    engine.redact(text)             # solo el texto redactado
+    engine.blocked_by(text)         # reglas de bloqueo (kill-switch) que coinciden
+    engine.redact_model(response)   # todos los str de un modelo pydantic / dict / lista
+
+    stream = StreamRedactor(get_engine("pii_strict"))
+    for chunk in chunks:
+        out.write(stream.feed(chunk))   # coincidencias partidas entre chunks incluidas
+    out.write(stream.close())
+
+- Patrones: una sola regex compilada con alternancia de grupos con nombre (p0|p1|...).
+- Palabras clave: otra regex compilada (alternancia en un lookahead) sobre el texto
+  en minúsculas (todas las coincidencias, incluidas las solapadas como "client"
+  dentro de "cliente").
+- Conjuntos de reglas: RuleSet registrados con register_rule_set(); get_engine()
+  compila cada uno una sola vez por proceso.
+- Lista de bloqueo de clientes/plantas/proyectos (CLIENT_BLOCKLIST_PATH): miles de
+  nombres en un autómata Aho-Corasick con plegado de mayúsculas y acentos y límites
+  de palabra; se recarga sola cuando cambia el fichero.
+
+Micro-benchmark (MB/s frente a la implementación anterior, una regex por patrón, y
+autómata frente a alternancia con una lista de bloqueo de 5000 nombres):
+    python agents/v3/redaction.py
+"""
+
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger("redaction")
+
+REDACTED = "[REDACTED]"
+
+# Cambiar al modificar el algoritmo de scan: invalida las cachés de documentos sanitizados
+ENGINE_VERSION = 1
+
+# REGLAS DE HIERRO: Patrones que NUNCA deben aparecer en el output
+FORBIDDEN_PATTERNS = [
+    # Nombres de clientes (detectar nombres propios en contexto de proyectos)
+    r'\b(Client|Cliente|Customer|Company)\s+[A-Z][a-z]+',
+    # Ubicaciones específicas de proyectos
+    r'\b\d+\s+[A-Z][a-z]+\s+(Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd)',
+    # Coordenadas GPS
+    r'\b\d+\.\d+°?\s*[NS],?\s*\d+\.\d+°?\s*[EW]',
+    # Datos financieros
+    r'\$\s*\d+[\d,]*(\.\d{2})?',
+    r'\b\d+[\d,]*\s*(USD|EUR|dollars?|euros?)\b',
+    # Números de contrato/proyecto
+    r'\b(Contract|Project|PO)\s*#?\s*\d+',
+    # Emails y teléfonos
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
+]
+
+# Palabras clave que indican información privada
+SENSITIVE_KEYWORDS = {
+    'client', 'cliente', 'customer', 'contract', 'contrato',
+    'budget', 'presupuesto', 'cost', 'costo', 'price', 'precio',
+    'confidential', 'confidencial', 'proprietary', 'private'
+}
+
+# PII de las rutas de semhys-agents (antes app/services/redaction.py)
+EMAIL_PATTERN = r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b"
+PHONE_PATTERN = r"(\+?\d{1,2}\s*)?(\(?\d{3}\)?[\s.-]?)?\d{3}[\s.-]?\d{4}"
+ID_PATTERN = r"\b([A-Z0-9]{12,}|[0-9]{9,})\b"
+
+# Kill-switch: referencias internas que bloquean una respuesta (antes copiado en
+# blog_routes.py y commercial_routes.py)
+KILL_SWITCH_PATTERNS = [
+    r"gs://",
+    r"\.pdf\b", r"\.docx\b", r"\.xlsx\b", r"\.pptx\b",
+]
+
+# Nombres de clientes siempre bloqueados (además de los de CLIENT_BLOCKLIST_PATH)
+DEFAULT_CLIENT_NAMES = ("BAVARIA", "RCI")
+
+DEFAULT_BLOCKLIST_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "config", "client_blocklist.txt"
+)
+
+
+class KeywordPattern:
+    """
+    Palabras clave de un RuleSet (unas decenas) en una sola regex compilada.
+
+    La alternancia va dentro de un lookahead, así cada posición aporta su palabra más
+    larga sin consumir texto; las más cortas que empiezan en el mismo punto son
+    prefijos de esa y se emiten también (todas las coincidencias, incluidas las solapadas).
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+        self.max_length = max((len(k) for k in self.keywords), default=0)
+        self._regex = re.compile(
+            "(?=(" + "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True)) + "))"
+        ) if self.keywords else None
+        self._prefixes = {
+            k: tuple(p for p in self.keywords if p != k and k.startswith(p)) for k in self.keywords
+        }
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """(índice del último carácter, palabra clave); 'text' en minúsculas."""
+        if self._regex is None:
+            return
+        for match in self._regex.finditer(text):
+            keyword, start = match.group(1), match.start()
+            yield start + len(keyword) - 1, keyword
+            for prefix in self._prefixes[keyword]:
+                yield start + len(prefix) - 1, prefix
+
+
+class KeywordAutomaton:
+    """
+    Autómata Aho-Corasick: todas las apariciones de todas las palabras clave en O(n).
+
+    Solo para la lista de bloqueo (miles de nombres): la alternancia de KeywordPattern
+    prueba los nombres uno a uno en cada posición y con 5000 nombres es cientos de
+    veces más lenta (ver _benchmark).
+    """
+
+    def __init__(self, keywords: Iterable[str], prefilter_limit: int = 500):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+        self._goto: List[Dict[str, int]] = [{}]
+        outputs: List[Set[str]] = [set()]
+        for keyword in self.keywords:
+            state = 0
+            for ch in keyword:
+                if ch not in self._goto[state]:
+                    self._goto[state][ch] = len(self._goto)
+                    self._goto.append({})
+                    outputs.append(set())
+                state = self._goto[state][ch]
+            outputs[state].add(keyword)
+
+        # BFS: enlaces de fallo y transiciones completas (el escaneo no sigue fallos)
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in list(self._goto[state].items()):
+                fail[child] = self._goto[fail[state]].get(ch, 0) if state else 0
+                outputs[child] |= outputs[fail[child]]
+                queue.append(child)
+            for ch, target in self._goto[fail[state]].items():
+                self._goto[state].setdefault(ch, target)
+        self._out: List[Tuple[str, ...]] = [tuple(sorted(o)) for o in outputs]
+
+        self.max_length = max((len(k) for k in self.keywords), default=0)
+        # Prefiltro en C: toda aparición de una palabra clave empieza dentro de una
+        # coincidencia de esta alternancia, así el autómata solo recorre esas ventanas.
+        # Con listas grandes la alternancia deja de compensar (coste proporcional al número
+        # de palabras): el autómata recorre el texto entero, lineal sea cual sea la lista.
+        self._prefilter = re.compile(
+            "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+        ) if self.keywords and len(self.keywords) <= prefilter_limit else None
+
+    @functools.cached_property
+    def fingerprint(self) -> str:
+        """Hash de las palabras clave (identifica la lista para versionar cachés)."""
+        return hashlib.sha256("\n".join(self.keywords).encode("utf-8")).hexdigest()
+
+    def iter_window(self, text: str, start: int, stop: int) -> Iterator[Tuple[int, str]]:
+        """(índice del último carácter, palabra clave) en text[start:stop]; 'text' en minúsculas."""
+        goto, out = self._goto, self._out
+        root = goto[0]
+        state = 0
+        for i in range(start, min(stop, len(text))):
+            ch = text[i]
+            state = goto[state].get(ch) or root.get(ch, 0)
+            if out[state]:
+                for keyword in out[state]:
+                    yield i, keyword
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Todas las coincidencias, incluidas las solapadas; 'text' en minúsculas."""
+        if self._prefilter is None:
+            if self.keywords:
+                yield from self.iter_window(text, 0, len(text))
+            return
+        for candidate in self._prefilter.finditer(text):
+            first, last = candidate.start(), candidate.end()
+            for end, keyword in self.iter_window(text, first, last + self.max_length - 1):
+                # Cada aparición empieza dentro de exactamente una coincidencia del prefiltro
+                if end - len(keyword) + 1 < last:
+                    yield end, keyword
+
+
+# ---------- Lista de bloqueo de nombres (clientes, plantas, proyectos) ----------
+
+# Espacios ASCII distintos de " " (1 a 1, no cambia posiciones)
+_ASCII_WHITESPACE = str.maketrans("\t\n\r\x0b\x0c", "     ")
+
+
+@functools.lru_cache(maxsize=4096)
+def _fold_char(ch: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", ch)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _fold_table(text: str) -> Optional[Dict[int, str]]:
+    """Tabla de translate si cada carácter de 'text' se pliega a exactamente uno."""
+    if text.isascii():
+        return _ASCII_WHITESPACE
+    table = dict(_ASCII_WHITESPACE)
+    for ch in set(text):
+        if ord(ch) > 127:
+            folded = " " if ch.isspace() else _fold_char(ch)
+            if len(folded) != 1:
+                return None
+            table[ord(ch)] = folded
+    return table
+
+
+def fold(text: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    Texto plegado para comparar nombres: minúsculas (casefold), sin acentos y con cada
+    racha de espacios reducida a uno. Devuelve también el índice original de cada
+    carácter plegado (None si coinciden uno a uno).
+    """
+    # Camino rápido (translate en C): posiciones idénticas a las del original
+    table = _fold_table(text)
+    if table is not None:
+        folded = text.translate(table).lower()
+        if "  " not in folded:
+            return folded, None
+    chars: List[str] = []
+    origin: List[int] = []
+    previous_space = False
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if not previous_space:
+                chars.append(" ")
+                origin.append(i)
+            previous_space = True
+            continue
+        previous_space = False
+        for c in _fold_char(ch):
+            chars.append(c)
+            origin.append(i)
+    return "".join(chars), origin
+
+
+class Blocklist:
+    """
+    Nombres prohibidos (uno por línea en 'path', '#' para comentarios) en un autómata
+    Aho-Corasick: el coste de buscar es lineal en el texto, no en el tamaño de la lista.
+
+    - Mayúsculas y acentos no cuentan ("Tocancipá" == "TOCANCIPA").
+    - Solo coinciden palabras completas ("RCI" no coincide en "commercial").
+    - Si el fichero cambia (mtime/tamaño) se recarga en la siguiente búsqueda,
+      como mucho una comprobación cada 'reload_interval' segundos; si la recarga
+      falla se sigue usando la lista anterior.
+    """
+
+    def __init__(self, path: Optional[str] = None, names: Iterable[str] = (),
+                 replacement: str = "[REDACTED_NAME]", reload_interval: float = 1.0):
+        self.path = path
+        self.replacement = replacement
+        self.reload_interval = reload_interval
+        self._seed = tuple(names)
+        self._lock = threading.Lock()
+        self._file_state: Optional[Tuple[float, int]] = None
+        self._checked_at = 0.0
+        self._automaton = self._build(())
+
+    def _build(self, names: Iterable[str]) -> KeywordAutomaton:
+        folded = {fold(name.strip())[0] for name in (*self._seed, *names)}
+        return KeywordAutomaton(n for n in folded if n and n != " ")
+
+    def _load(self) -> List[str]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+    def _current(self) -> KeywordAutomaton:
+        if not self.path:
+            return self._automaton
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return self._automaton
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return self._automaton
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+                state = (stat.st_mtime, stat.st_size)
+            except FileNotFoundError:
+                state = None
+            except OSError as e:
+                logger.warning(f"⚠️ Lista de bloqueo no accesible ({self.path}): {e}")
+                return self._automaton
+            if state != self._file_state:
+                try:
+                    names = self._load() if state is not None else []
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning(f"⚠️ No se pudo recargar la lista de bloqueo ({self.path}): {e}")
+                    return self._automaton
+                self._automaton = self._build(names)
+                self._file_state = state
+                logger.info(f"🔁 Lista de bloqueo cargada: {len(self._automaton.keywords)} nombres")
+        return self._automaton
+
+    def __len__(self) -> int:
+        return len(self._current().keywords)
+
+    @property
+    def max_length(self) -> int:
+        return self._current().max_length
+
+    @property
+    def fingerprint(self) -> str:
+        """Cambia con cada recarga que modifica la lista."""
+        return self._current().fingerprint
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        (inicio, fin, nombre plegado) en 'text' original: coincidencias de palabra
+        completa, sin solapes (la más a la izquierda y, a igualdad, la más larga).
+        """
+        spans = []
+        last_end = -1
+        for start, end, name in sorted(self.candidates(text), key=lambda c: (c[0], -c[1])):
+            if start < last_end:
+                continue
+            last_end = end
+            spans.append((start, end, name))
+        return spans
+
+    def candidates(self, text: str) -> List[Tuple[int, int, str]]:
+        """Todas las coincidencias de palabra completa, incluidas las solapadas."""
+        automaton = self._current()
+        if not text or not automaton.keywords:
+            return []
+        folded, origin = fold(text)
+        found = []
+        for end, name in automaton.iter_matches(folded):
+            start = end - len(name) + 1
+            if start > 0 and folded[start - 1].isalnum():
+                continue
+            if end + 1 < len(folded) and folded[end + 1].isalnum():
+                continue
+            if origin is None:
+                found.append((start, end + 1, name))
+            else:
+                found.append((origin[start], origin[end] + 1, name))
+        return found
+
+    def names_in(self, text: str) -> List[str]:
+        found = []
+        for _, _, name in self.find(text):
+            if name not in found:
+                found.append(name)
+        return found
+
+    def redact(self, text: str) -> Tuple[str, int]:
+        """(texto con cada nombre reemplazado por 'replacement', número de reemplazos)."""
+        spans = self.find(text)
+        if not spans:
+            return text, 0
+        pieces = []
+        last = 0
+        for start, end, _ in spans:
+            pieces.append(text[last:start])
+            pieces.append(self.replacement)
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces), len(spans)
+
+
+class Rule(NamedTuple):
+    """
+    Regla de redacción. action="redact" reemplaza cada coincidencia por 'replacement';
+    action="block" solo la detecta (kill-switch: el llamador decide regenerar o fallar).
+    """
+    name: str
+    pattern: str
+    replacement: str = REDACTED
+    action: str = "redact"
+
+
+class RuleSet(NamedTuple):
+    """
+    Conjunto de reglas con nombre.
+
+    drop_lines: además de redactar, elimina toda línea con una redacción o una palabra clave
+    (la sanitización del Agent 2). max_match_length acota la longitud de una coincidencia:
+    es lo que el modo streaming retiene entre chunks. blocklist: nombres que se redactan
+    (blocklist_action="redact") o que bloquean la respuesta ("block").
+    """
+    name: str
+    rules: Tuple[Rule, ...]
+    keywords: FrozenSet[str] = frozenset()
+    drop_lines: bool = False
+    flags: int = re.IGNORECASE
+    max_match_length: int = 256
+    blocklist: Optional[Blocklist] = None
+    blocklist_action: str = "redact"
+
+
+class ScanResult(NamedTuple):
+    violations: List[str]
+    text: str
+    removed_lines: List[str]
+    blocked: Tuple[str, ...] = ()
+
+
+def _alternation(rules: List[Rule], flags: int) -> Optional["re.Pattern"]:
+    if not rules:
+        return None
+    return re.compile("|".join(f"(?P<p{i}>{r.pattern})" for i, r in enumerate(rules)), flags)
+
+
+class RedactionEngine:
+    """
+    Un RuleSet compilado: regex combinada de redacción, regex combinada de bloqueo
+    y autómata de palabras clave.
+
+    Con drop_lines (reglas del Agent 2):
+      - cada coincidencia de un patrón se reemplaza por su marcador
+      - se elimina toda línea con un marcador o con alguna palabra clave
+    Las violaciones cuentan las coincidencias de cada patrón en la pasada combinada
+    (la más a la izquierda gana si dos patrones se solapan), así que un recuento puede
+    ser menor que con una regex por patrón; el texto sanitizado es el mismo.
+    """
+
+    def __init__(self, rule_set: RuleSet):
+        self.rule_set = rule_set
+        self.rules = [r for r in rule_set.rules if r.action == "redact"]
+        self.block_rules = [r for r in rule_set.rules if r.action == "block"]
+        self.patterns = [r.pattern for r in self.rules]
+        self._replacements = [r.replacement for r in self.rules]
+        self._markers = sorted(set(self._replacements))
+        self._regex = _alternation(self.rules, rule_set.flags)
+        self._block_regex = _alternation(self.block_rules, rule_set.flags)
+        self.automaton = KeywordPattern(rule_set.keywords)
+        self.blocklist = rule_set.blocklist
+        self._redact_names = self.blocklist is not None and rule_set.blocklist_action == "redact"
+        self._block_names = self.blocklist is not None and rule_set.blocklist_action == "block"
+        if self._redact_names:
+            self._markers = sorted({*self._markers, self.blocklist.replacement})
+        self._rules_hash = hashlib.sha256(json.dumps([
+            ENGINE_VERSION,
+            [list(rule) for rule in rule_set.rules],
+            sorted(self.automaton.keywords),
+            rule_set.drop_lines,
+            int(rule_set.flags),
+            rule_set.blocklist_action if self.blocklist is not None else None,
+            self.blocklist.replacement if self.blocklist is not None else None,
+        ]).encode("utf-8")).hexdigest()
+        for marker in self._markers:
+            # Un marcador que coincide consigo mismo haría que redact() no terminara
+            if self._regex is not None and self._regex.search(marker):
+                raise ValueError(f"El marcador {marker!r} de '{rule_set.name}' coincide con sus propias reglas")
+
+    @property
+    def version(self) -> str:
+        """
+        Versión del conjunto de reglas: cambia con las reglas, las palabras clave, el
+        algoritmo (ENGINE_VERSION) y cada recarga de la lista de bloqueo.
+        """
+        if self.blocklist is None:
+            return self._rules_hash[:16]
+        combined = f"{self._rules_hash}:{self.blocklist.fingerprint}"
+        return hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
+
+    def _replace(self, match: "re.Match") -> str:
+        return self._replacements[int(match.lastgroup[1:])]
+
+    def sub(self, text: str) -> str:
+        """
+        Reemplaza las coincidencias hasta el punto fijo: el resultado no contiene ninguna
+        coincidencia de las reglas (una redacción puede dejar al descubierto otra contigua,
+        p. ej. un email pegado a un teléfono).
+        """
+        if self._redact_names:
+            text, _ = self.blocklist.redact(text)
+        return self._sub_patterns(text)
+
+    def _sub_patterns(self, text: str) -> str:
+        if self._regex is None:
+            return text
+        out = self._regex.sub(self._replace, text)
+        while self._regex.search(out):
+            out = self._regex.sub(self._replace, out)
+        return out
+
+    def redact(self, text: str) -> str:
+        """Texto redactado (y sin las líneas eliminadas si el conjunto usa drop_lines)."""
+        if not text:
+            return text
+        if self.rule_set.drop_lines:
+            return self.scan(text).text
+        return self.sub(text)
+
+    def blocked_by(self, text: str) -> List[str]:
+        """Nombres de las reglas de bloqueo que coinciden con 'text' (vacía = permitido)."""
+        if not text:
+            return []
+        blocked = []
+        if self._block_regex is not None:
+            hits = {int(m.lastgroup[1:]) for m in self._block_regex.finditer(text)}
+            blocked = [self.block_rules[i].name for i in sorted(hits)]
+        if self._block_names and self.blocklist.find(text):
+            blocked.append("client_blocklist")
+        return blocked
+
+    def scan(self, text: str) -> ScanResult:
+        # 0. Nombres de la lista de bloqueo (antes que los patrones: el marcador marca la línea)
+        names_redacted = 0
+        if self._redact_names:
+            text, names_redacted = self.blocklist.redact(text)
+
+        # 1. Patrones: una pasada que cuenta y redacta
+        counts = [0] * len(self.rules)
+        spans: List[Tuple[int, int]] = []
+        pieces = []
+        last = 0
+        replacements = self._replacements
+        if self._regex is not None:
+            for match in self._regex.finditer(text):
+                index = int(match.lastgroup[1:])
+                counts[index] += 1
+                start, end = match.span()
+                spans.append((start, end))
+                pieces.append(text[last:start])
+                pieces.append(replacements[index])
+                last = end
+        redacted = "".join(pieces) + text[last:] if spans else text
+
+        # 2. Palabras clave: una pasada del autómata sobre el texto original.
+        # Cada coincidencia fuera de una redacción se traslada a su línea en el texto redactado
+        # (las que caen dentro de una redacción ya están en una línea con marcador).
+        drop_lines = self.rule_set.drop_lines
+        line_starts = _line_starts(redacted) if drop_lines else []
+        span_starts = [s for s, _ in spans]
+        shifts = [0]
+        if drop_lines:
+            for (s, e), piece in zip(spans, pieces[1::2]):
+                shifts.append(shifts[-1] + len(piece) - (e - s))
+        keywords_found: Set[str] = set()
+        flagged_lines: Set[int] = set()
+        for end, keyword in self.automaton.iter_matches(text.lower()):
+            keywords_found.add(keyword)
+            if not drop_lines:
+                continue
+            before = bisect.bisect_right(span_starts, end)
+            if before and spans[before - 1][1] > end - len(keyword) + 1:
+                continue
+            flagged_lines.add(bisect.bisect_right(line_starts, end + shifts[before]) - 1)
+
+        violations = [
+            f"Pattern: {rule.pattern[:30]}... (matches: {count})"
+            for rule, count in zip(self.rules, counts) if count
+        ]
+        violations.extend(f"Keyword: {kw}" for kw in sorted(keywords_found))
+        if names_redacted:
+            violations.append(f"Blocklist: (matches: {names_redacted})")
+        blocked = tuple(self.blocked_by(text))
+
+        if not spans and not flagged_lines and not (names_redacted and self.rule_set.drop_lines):
+            return ScanResult(violations, text, [], blocked)
+        if not drop_lines:
+            # Sin eliminación de líneas: solo falta llegar al punto fijo
+            if self._regex.search(redacted):
+                redacted = self._sub_patterns(redacted)
+            return ScanResult(violations, redacted, [], blocked)
+
+        # 3. Líneas: se conservan las que no tienen redacciones ni palabras clave
+        kept, removed = [], []
+        markers = self._markers
+        for i, line in enumerate(redacted.split("\n")):
+            has_marker = any(marker in line for marker in markers)
+            if i in flagged_lines or has_marker:
+                # Las líneas eliminadas van al audit log: segunda pasada por si una redacción
+                # dejó al descubierto otra coincidencia contigua (p. ej. "$1" pegado a un email)
+                removed.append(self._sub_patterns(line) if has_marker else line)
+            else:
+                kept.append(line)
+        return ScanResult(violations, "\n".join(kept), removed, blocked)
+
+    def is_clean(self, text: str) -> bool:
+        """
+        Verificación barata de un texto ya sanitizado (p. ej. del espejo de ingesta):
+        True si scan() no encontraría nada (sin patrones, palabras clave ni nombres).
+        Cada búsqueda termina en la primera coincidencia.
+        """
+        if not text:
+            return True
+        if self._regex is not None and self._regex.search(text):
+            return False
+        if self._block_regex is not None and self._block_regex.search(text):
+            return False
+        if self.automaton.keywords and next(self.automaton.iter_matches(text.lower()), None) is not None:
+            return False
+        if self.blocklist is not None and self.blocklist.candidates(text):
+            return False
+        return True
+
+    def scan_cached(self, text: str, name: str, cache: Optional[Any] = None) -> ScanResult:
+        """
+        scan() memoizado en 'cache' (sanitize_cache.SanitizeCache) por
+        (nombre del documento, hash del contenido, versión del conjunto de reglas).
+        """
+        if cache is None or not text:
+            return self.scan(text)
+        key = cache.key(name, text, self.version)
+        data = cache.get(key)
+        if data is not None:
+            return ScanResult(data["violations"], data["text"], data["removed_lines"], tuple(data["blocked"]))
+        result = self.scan(text)
+        cache.put(key, result._asdict(), name=name, version=self.version)
+        return result
+
+    # ---------- Modelos de respuesta ----------
+
+    def redact_model(self, value: Any, skip: Iterable[str] = ()) -> Any:
+        """
+        Copia de 'value' (modelo pydantic, dict, lista, tupla o str) con todos sus str
+        redactados en una sola pasada. Los campos/claves en 'skip' se dejan intactos.
+        """
+        return walk_strings(value, self.redact, frozenset(skip))
+
+    def blocked_in(self, value: Any, skip: Iterable[str] = ()) -> List[str]:
+        """Reglas de bloqueo (patrones o lista de bloqueo) que coinciden en algún str de 'value'."""
+        if self._block_regex is None and not self._block_names:
+            return []
+        hits: List[str] = []
+
+        def check(text: str) -> str:
+            for name in self.blocked_by(text):
+                if name not in hits:
+                    hits.append(name)
+            return text
+
+        walk_strings(value, check, frozenset(skip))
+        return hits
+
+
+def walk_strings(value: Any, fn: Callable[[str], str], skip: FrozenSet[str] = frozenset()) -> Any:
+    """
+    Aplica 'fn' a cada str dentro de 'value' y devuelve la copia resultante.
+    Recorre listas, tuplas, valores de dicts y campos de modelos pydantic (v2);
+    las claves de los dicts y los valores no str se conservan.
+    """
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, list):
+        return [walk_strings(v, fn, skip) for v in value]
+    if isinstance(value, tuple):
+        return tuple(walk_strings(v, fn, skip) for v in value)
+    if isinstance(value, dict):
+        return {k: v if k in skip else walk_strings(v, fn, skip) for k, v in value.items()}
+    fields = getattr(type(value), "model_fields", None)
+    if isinstance(fields, dict) and hasattr(value, "model_copy"):
+        update = {
+            name: walk_strings(getattr(value, name), fn, skip)
+            for name in fields if name not in skip
+        }
+        return value.model_copy(update=update)
+    return value
+
+
+class StreamRedactor:
+    """
+    Redacción incremental: feed(chunk) devuelve el texto que ya es seguro emitir y
+    close() el resto. Retiene las últimas max_match_length posiciones (más la palabra
+    clave o el nombre bloqueado más largo) y nunca corta dentro de una coincidencia, así una coincidencia
+    partida entre dos chunks se redacta igual que en el documento completo.
+    Con drop_lines solo corta en inicio de línea.
+
+    Tampoco corta dentro de una palabra, así los límites de palabra (\b, nombres de la
+    lista de bloqueo) se evalúan igual que en el documento completo.
+    """
+
+    def __init__(self, engine: RedactionEngine, hold: Optional[int] = None):
+        self.engine = engine
+        self._hold = hold
+        self._buffer = ""
+        self._emitted_lines = False
+        self.violations: List[str] = []
+        self.removed_lines: List[str] = []
+        self.blocked: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self._buffer += chunk
+        cut = self._safe_cut()
+        if cut <= 0:
+            return ""
+        block, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        if self.engine.rule_set.drop_lines:
+            # Bloque de líneas completas: el "\n" final separa del bloque siguiente
+            return self._process_lines(block[:-1])
+        return self._process(block)
+
+    def close(self) -> str:
+        block, self._buffer = self._buffer, ""
+        if self.engine.rule_set.drop_lines:
+            return self._process_lines(block)
+        return self._process(block) if block else ""
+
+    @property
+    def hold(self) -> int:
+        if self._hold is not None:
+            return self._hold
+        engine = self.engine
+        # La lista de bloqueo puede recargarse con nombres más largos: se calcula en cada corte
+        names = engine.blocklist.max_length + 1 if engine.blocklist is not None else 0
+        return engine.rule_set.max_match_length + max(engine.automaton.max_length, names)
+
+    def _safe_cut(self) -> int:
+        buffer = self._buffer
+        hold = self.hold
+        cut = len(buffer) - hold
+        engine = self.engine
+        while cut > 0:
+            previous = cut
+            if engine.rule_set.drop_lines:
+                cut = buffer.rfind("\n", 0, cut) + 1
+            # Nunca dentro de una palabra: el borde del bloque no inventa límites de palabra
+            while 0 < cut < len(buffer) and _is_word(buffer[cut - 1]) and _is_word(buffer[cut]):
+                cut -= 1
+            # Retroceder hasta antes de cualquier coincidencia (o palabra clave) que cruce el corte
+            window_start = max(0, cut - hold)
+            for regex in (engine._regex, engine._block_regex):
+                if regex is None:
+                    continue
+                for match in regex.finditer(buffer, window_start):
+                    if match.start() >= cut:
+                        break
+                    if match.end() > cut:
+                        cut = match.start()
+                        break
+            if engine.automaton.max_length:
+                lowered = buffer[window_start:cut + engine.automaton.max_length].lower()
+                for end, keyword in engine.automaton.iter_matches(lowered):
+                    start = window_start + end - len(keyword) + 1
+                    if start < cut <= window_start + end:
+                        cut = min(cut, start)
+            if engine.blocklist is not None:
+                for start, end, _ in engine.blocklist.candidates(buffer[window_start:cut + hold]):
+                    if window_start + start < cut < window_start + end:
+                        cut = window_start + start
+            if cut == previous:
+                break
+        return max(cut, 0)
+
+    def _scan(self, block: str) -> ScanResult:
+        result = self.engine.scan(block)
+        self.violations.extend(result.violations)
+        self.removed_lines.extend(result.removed_lines)
+        for name in result.blocked:
+            if name not in self.blocked:
+                self.blocked.append(name)
+        return result
+
+    def _process(self, block: str) -> str:
+        return self._scan(block).text
+
+    def _process_lines(self, lines: str) -> str:
+        result = self._scan(lines)
+        if lines.count("\n") + 1 == len(result.removed_lines):
+            return ""  # todas las líneas del bloque eliminadas
+        out = ("\n" if self._emitted_lines else "") + result.text
+        self._emitted_lines = True
+        return out
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def iter_redacted(chunks: Iterable[str], engine: RedactionEngine) -> Iterator[str]:
+    """Generador: redacta un flujo de chunks (p. ej. tokens de un LLM) sin esperar al final."""
+    stream = StreamRedactor(engine)
+    for chunk in chunks:
+        out = stream.feed(chunk)
+        if out:
+            yield out
+    tail = stream.close()
+    if tail:
+        yield tail
+
+
+# ---------- Registro de conjuntos de reglas ----------
+
+RULE_SETS: Dict[str, RuleSet] = {}
+_engines: Dict[str, RedactionEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def register_rule_set(rule_set: RuleSet):
+    """Registra (o reemplaza) un conjunto de reglas; el motor se recompila en el próximo uso."""
+    with _engines_lock:
+        RULE_SETS[rule_set.name] = rule_set
+        _engines.pop(rule_set.name, None)
+
+
+def get_engine(name: str) -> RedactionEngine:
+    """Motor compilado del conjunto 'name' (uno por proceso)."""
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if name not in _engines:
+            if name not in RULE_SETS:
+                raise KeyError(f"Conjunto de reglas de redacción desconocido: {name}")
+            _engines[name] = RedactionEngine(RULE_SETS[name])
+        return _engines[name]
+
+
+_PII_RULES = (
+    Rule("email", EMAIL_PATTERN, "[REDACTED_EMAIL]"),
+    Rule("phone", PHONE_PATTERN, "[REDACTED_PHONE]"),
+)
+
+CLIENT_BLOCKLIST = Blocklist(
+    path=os.getenv("CLIENT_BLOCKLIST_PATH", DEFAULT_BLOCKLIST_PATH),
+    names=DEFAULT_CLIENT_NAMES,
+    reload_interval=float(os.getenv("CLIENT_BLOCKLIST_RELOAD_SECONDS", "5")),
+)
+
+register_rule_set(RuleSet(
+    name="privacy_guardian",
+    rules=tuple(Rule(f"forbidden_{i}", p) for i, p in enumerate(FORBIDDEN_PATTERNS)),
+    keywords=frozenset(SENSITIVE_KEYWORDS),
+    drop_lines=True,
+    blocklist=CLIENT_BLOCKLIST,
+))
+register_rule_set(RuleSet(name="pii_standard", rules=_PII_RULES, blocklist=CLIENT_BLOCKLIST))
+register_rule_set(RuleSet(
+    name="pii_strict",
+    rules=_PII_RULES + (Rule("id", ID_PATTERN, "[REDACTED_ID]"),),
+    blocklist=CLIENT_BLOCKLIST,
+))
+register_rule_set(RuleSet(
+    name="kill_switch",
+    rules=tuple(Rule(p, p, action="block") for p in KILL_SWITCH_PATTERNS),
+    blocklist=CLIENT_BLOCKLIST,
+    blocklist_action="block",
+))
+
+
+def _line_starts(text: str) -> List[int]:
+    starts = [0]
+    pos = text.find("\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = text.find("\n", pos + 1)
+    return starts
+
+
+# ---------- Micro-benchmark ----------
+
+def _legacy_scan(patterns: List[str], keywords: Set[str], text: str) -> ScanResult:
+    """Implementación anterior del Agent 2 (una regex por patrón, keywords por línea)."""
+    violations = []
+    for pattern in patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            violations.append(f"Pattern: {pattern[:30]}... (matches: {len(matches)})")
+    text_lower = text.lower()
+    violations.extend(f"Keyword: {kw}" for kw in sorted(keywords) if kw in text_lower)
+
+    sanitized = text
+    for pattern in patterns:
+        sanitized = re.sub(pattern, REDACTED, sanitized, flags=re.IGNORECASE)
+    kept, removed = [], []
+    for line in sanitized.split("\n"):
+        line_lower = line.lower()
+        if not any(kw in line_lower for kw in keywords) and REDACTED not in line:
+            kept.append(line)
+        else:
+            removed.append(line)
+    return ScanResult(violations, "\n".join(kept), removed)
+
+
+def _benchmark(rounds: int = 5):
+    import random
+    import time
+
+    patterns = FORBIDDEN_PATTERNS
+    keywords = SENSITIVE_KEYWORDS
+    rng = random.Random(42)
+    technical = [
+        "The pump operates at 1450 rpm with a net positive suction head of 4.2 m.",
+        "Cavitation appears when NPSH available drops below NPSH required.",
+        "Los variadores de frecuencia reducen el consumo energético del bombeo.",
+        "Head losses follow the Darcy-Weisbach equation with friction factor f.",
+        "La eficiencia hidráulica cae entre 3 y 5 puntos con el desgaste del impulsor.",
+    ]
+    sensitive = [
+        "Client Acme requested the retrofit under Contract #4471.",
+        "Budget approved: $ 125,000.00 for phase two.",
+        "Contact: j.perez@example.com or 305-555-0199.",
+        "Site at 1200 Ocean Avenue, coordinates 25.7617 N, 80.1918 W.",
+        "Este informe es confidencial y propiedad del cliente.",
+    ]
+    docs = []
+    for _ in range(2000):
+        lines = [rng.choice(technical) for _ in range(rng.randint(3, 12))]
+        if rng.random() < 0.4:
+            lines.insert(rng.randrange(len(lines)), rng.choice(sensitive))
+        docs.append("\n".join(lines))
+    total_mb = sum(len(d.encode("utf-8")) for d in docs) / 1e6
+
+    engine = get_engine("privacy_guardian")
+    mismatches = sum(
+        1 for d in docs
+        if engine.scan(d).text != _legacy_scan(patterns, keywords, d).text
+    )
+
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for d in docs:
+                fn(d)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    legacy_s = timed(lambda d: _legacy_scan(patterns, keywords, d))
+    engine_s = timed(engine.scan)
+    print(f"Corpus: {len(docs)} documentos, {total_mb:.2f} MB")
+    print(f"Anterior (regex por patrón): {total_mb / legacy_s:8.2f} MB/s")
+    print(f"RedactionEngine (una pasada): {total_mb / engine_s:8.2f} MB/s  ({legacy_s / engine_s:.2f}x)")
+    print(f"Textos sanitizados distintos: {mismatches}")
+
+    # Lista de bloqueo realista: miles de razones sociales sobre el mismo corpus
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    names = {
+        "".join(rng.choice(letters) for _ in range(rng.randint(5, 14))) + rng.choice([" sa", " sas", " ltda", " inc"])
+        for _ in range(5000)
+    }
+    sample = "\n".join(docs[:200]).lower()
+    sample_mb = len(sample.encode("utf-8")) / 1e6
+    automaton, alternation = KeywordAutomaton(names), KeywordPattern(names)
+    same = sorted(automaton.iter_matches(sample)) == sorted(alternation.iter_matches(sample))
+    started = time.perf_counter()
+    list(automaton.iter_matches(sample))
+    automaton_s = time.perf_counter() - started
+    started = time.perf_counter()
+    list(alternation.iter_matches(sample))
+    alternation_s = time.perf_counter() - started
+    print(f"Lista de bloqueo ({len(names)} nombres, {sample_mb:.2f} MB):")
+    print(f"  Alternancia (KeywordPattern): {sample_mb / alternation_s:8.2f} MB/s")
+    print(f"  Aho-Corasick (KeywordAutomaton): {sample_mb / automaton_s:8.2f} MB/s  ({alternation_s / automaton_s:.0f}x)")
+    print(f"  Mismas coincidencias: {'sí' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,161 @@
+"""
+Replay: capa de grabación/reproducción de llamadas externas (Vertex AI, Discovery Engine).
+
+    REPLAY_MODE=off     llamadas reales (por defecto)
+    REPLAY_MODE=record  llamadas reales + se guarda cada respuesta como fixture
+    REPLAY_MODE=replay  sin red: se sirven las fixtures con latencia simulada
+
+Fixtures: <REPLAY_FIXTURES_DIR>/<tipo>/<hash de la petición>.json
+Latencia en replay: REPLAY_LATENCY_MS ("recorded" = la grabada, o un valor fijo en ms)
+multiplicada por REPLAY_LATENCY_SCALE.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+from agents.v3.stage_cache import canonical_hash
+
+logger = logging.getLogger("replay")
+
+DEFAULT_FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks", "fixtures"
+)
+
+MODES = ("off", "record", "replay")
+
+
+class ReplayMiss(LookupError):
+    """No hay fixture grabada para la petición en modo replay."""
+
+
+def replay_mode() -> str:
+    mode = os.getenv("REPLAY_MODE", "off").lower()
+    return mode if mode in MODES else "off"
+
+
+def fixtures_dir() -> str:
+    return os.path.abspath(os.getenv("REPLAY_FIXTURES_DIR", DEFAULT_FIXTURES_DIR))
+
+
+def _fixture_path(kind: str, key: str) -> str:
+    return os.path.join(fixtures_dir(), kind, f"{key}.json")
+
+
+def _simulated_latency(recorded_ms: float) -> float:
+    setting = os.getenv("REPLAY_LATENCY_MS", "recorded")
+    base_ms = recorded_ms if setting == "recorded" else float(setting)
+    return max(base_ms, 0.0) * float(os.getenv("REPLAY_LATENCY_SCALE", "1.0")) / 1000.0
+
+
+def _write_fixture(path: str, fixture: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=1, default=str)
+    os.replace(tmp_path, path)
+
+
+def replay_call(
+    kind: str,
+    request: Dict,
+    func: Callable[[], Any],
+    encode: Optional[Callable[[Any], Any]] = None,
+    decode: Optional[Callable[[Any], Any]] = None
+) -> Any:
+    """
+    Ejecuta 'func' según el modo de replay.
+
+    Args:
+        kind: Tipo de llamada (p. ej. "vertex.generate_content", "discovery.search")
+        request: Parámetros que identifican la petición (se hashean como clave)
+        func: Llamada real
+        encode: Respuesta real -> JSON serializable (por defecto identidad)
+        decode: JSON grabado -> objeto equivalente a la respuesta (por defecto identidad)
+    """
+    mode = replay_mode()
+    if mode == "off":
+        return func()
+
+    key = canonical_hash({"kind": kind, **request})
+    path = _fixture_path(kind, key)
+
+    if mode == "replay":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            raise ReplayMiss(f"Sin fixture para {kind} ({key[:12]}): grabar con REPLAY_MODE=record")
+        delay = _simulated_latency(fixture.get("latency_ms", 0.0))
+        if delay:
+            time.sleep(delay)
+        response = fixture["response"]
+        return decode(response) if decode else response
+
+    started = time.monotonic()
+    result = func()
+    latency_ms = round((time.monotonic() - started) * 1000, 2)
+    try:
+        _write_fixture(path, {
+            "kind": kind,
+            "request": request,
+            "response": encode(result) if encode else result,
+            "latency_ms": latency_ms,
+            "recorded_at": time.time()
+        })
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"⚠️ No se pudo grabar fixture {kind} ({key[:12]}): {e}")
+    return result
+
+
+def replayable(kind: str, encode: Optional[Callable] = None, decode: Optional[Callable] = None) -> Callable:
+    """Decorador: replay_call con los argumentos de la función (con defaults) como petición."""
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return replay_call(kind, dict(bound.arguments), lambda: func(*args, **kwargs), encode, decode)
+        return wrapper
+    return decorator
+
+
+# ---------- Respuestas de modelos generativos (Vertex / Gemini) ----------
+
+_USAGE_FIELDS = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+
+def encode_generation(response) -> Dict:
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "text": response.text,
+        "usage_metadata": {f: getattr(usage, f, None) for f in _USAGE_FIELDS} if usage is not None else None
+    }
+
+
+def decode_generation(data: Dict):
+    """Objeto con la misma forma que usan los agentes: .text y .usage_metadata."""
+    usage = data.get("usage_metadata")
+    return SimpleNamespace(
+        text=data["text"],
+        usage_metadata=SimpleNamespace(**usage) if usage else None
+    )
+
+
+def generate_content(model, model_name: str, prompt: str, generation_config: Optional[Dict] = None):
+    """model.generate_content bajo la capa de replay."""
+    return replay_call(
+        "vertex.generate_content",
+        {"model": model_name, "prompt": prompt, "generation_config": generation_config},
+        lambda: model.generate_content(prompt, generation_config=generation_config),
+        encode=encode_generation,
+        decode=decode_generation
+    )
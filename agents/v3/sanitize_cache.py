@@ -0,0 +1,178 @@
+"""
+Sanitize Cache: resultados de sanitización por documento, compartidos entre workers.
+
+Clave: (nombre del documento, hash del contenido, versión del conjunto de reglas).
+Un cambio en las reglas o en la lista de bloqueo cambia la versión (RedactionEngine.version),
+así las entradas anteriores dejan de encontrarse y salen por antigüedad.
+
+    cache = get_sanitize_cache()
+    scan = engine.scan_cached(text, name=doc_id, cache=cache)
+
+Dos niveles: LRU en memoria por proceso (documentos calientes sin tocar disco) y
+SQLite (WAL) acotado a SANITIZE_CACHE_MAX_ENTRIES, compartido por los workers.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger("sanitize_cache")
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pipeline_outputs", "sanitize_cache.db"
+)
+
+# Frecuencia de la poda (cada N escrituras) y de la actualización de last_used en lecturas
+PRUNE_EVERY = 200
+TOUCH_INTERVAL_SECONDS = 300
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SanitizeCache:
+    """
+    Caché acotada de resultados de sanitización (dicts JSON) con expulsión LRU.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None,
+                 memory_entries: Optional[int] = None):
+        self.db_path = os.path.abspath(db_path or os.getenv("SANITIZE_CACHE_PATH", DEFAULT_DB_PATH))
+        self.max_entries = max_entries or int(os.getenv("SANITIZE_CACHE_MAX_ENTRIES", "20000"))
+        self.memory_entries = (
+            memory_entries if memory_entries is not None
+            else int(os.getenv("SANITIZE_CACHE_MEMORY_ENTRIES", "2000"))
+        )
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sanitized (
+                    key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_sanitized_last_used ON sanitized (last_used);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por operación: seguro entre hilos y entre workers.
+        # Es una caché: sin fsync por escritura (WAL + synchronous=NORMAL)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def key(name: str, text: str, version: str) -> str:
+        return hashlib.sha256(f"{name}\0{content_hash(text)}\0{version}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: Dict):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT payload, last_used FROM sanitized WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] > TOUCH_INTERVAL_SECONDS:
+                    conn.execute("UPDATE sanitized SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Caché de sanitización no disponible: {e}")
+            row = None
+
+        with self._lock:
+            self.stats["disk_hits" if row is not None else "misses"] += 1
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Dict, name: str = "", version: str = ""):
+        self._remember(key, value)
+        payload = json.dumps(value, ensure_ascii=False)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sanitized (key, name, version, payload, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, name, version, payload, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ No se pudo guardar en la caché de sanitización: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Elimina las entradas menos usadas por encima de max_entries."""
+        try:
+            with self._connect() as conn:
+                deleted = conn.execute(
+                    "DELETE FROM sanitized WHERE key IN "
+                    "(SELECT key FROM sanitized ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ No se pudo podar la caché de sanitización: {e}")
+            return 0
+        if deleted:
+            logger.info(f"🧹 Caché de sanitización: {deleted} entradas expulsadas")
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sanitized")
+
+
+_default_cache: Optional[SanitizeCache] = None
+_default_failed = False
+_default_lock = threading.Lock()
+
+
+def get_sanitize_cache() -> Optional[SanitizeCache]:
+    """Caché compartida del proceso (None si SANITIZE_CACHE_ENABLED=0 o no se pudo abrir)."""
+    global _default_cache, _default_failed
+    if os.getenv("SANITIZE_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    with _default_lock:
+        if _default_cache is None and not _default_failed:
+            try:
+                _default_cache = SanitizeCache()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"⚠️ Caché de sanitización desactivada: {e}")
+                _default_failed = True
+        return _default_cache
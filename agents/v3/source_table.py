@@ -0,0 +1,102 @@
+"""
+Source Table: representación compacta de las fuentes del pipeline V3.
+Las fuentes se numeran una sola vez y los prompts las referencian por ID.
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Alias de campos habituales en las fuentes crudas -> campo canónico
+FIELD_ALIASES = {
+    "title": ("title", "name", "heading"),
+    "url": ("url", "link", "uri"),
+    "date": ("date", "year", "published", "published_date"),
+    "publisher": ("publisher", "source", "domain", "author"),
+    "content": ("extracted_content", "snippet", "content", "summary", "description"),
+}
+
+# Máximo de caracteres de contenido por fuente en los prompts
+DEFAULT_CONTENT_CHARS = 600
+
+
+def compact_json(data) -> str:
+    """JSON sin indentación ni espacios para incluir en prompts."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _first(source: Dict, aliases: Sequence[str]) -> str:
+    for key in aliases:
+        value = source.get(key)
+        if value not in (None, "", [], {}):
+            return " ".join(str(value).split())
+    return ""
+
+
+class SourceTable:
+    """
+    Tabla compacta de fuentes, construida una vez por ejecución del pipeline V3.
+    Cada fuente tiene un ID numérico estable; las etapas la referencian por ID
+    e incluyen solo los campos que necesitan.
+    """
+
+    def __init__(self, sources: Iterable[Dict]):
+        self.rows: Dict[int, Dict] = {}
+        seen = set()
+        next_id = 1
+        for source in sources:
+            row = {field: _first(source, aliases) for field, aliases in FIELD_ALIASES.items()}
+            dedup_key = (row["url"] or row["title"]).lower()
+            if dedup_key and dedup_key in seen:
+                continue
+            seen.add(dedup_key)
+
+            source_id = source.get("source_number") or source.get("id")
+            if not isinstance(source_id, int) or source_id in self.rows:
+                while next_id in self.rows:
+                    next_id += 1
+                source_id = next_id
+            self.rows[source_id] = row
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def ids(self) -> List[int]:
+        return sorted(self.rows)
+
+    def find(self, url: str = "", title: str = "") -> Optional[int]:
+        """ID de la fila con la misma url (o, si no, el mismo título); None si no hay."""
+        for field, value in (("url", url), ("title", title)):
+            value = " ".join(str(value or "").split()).lower()
+            if not value:
+                continue
+            for source_id in self.ids:
+                if self.rows[source_id][field].lower() == value:
+                    return source_id
+        return None
+
+    def restrict(self, ids: Iterable[int]) -> "SourceTable":
+        """Sub-tabla con los IDs dados (conserva la numeración original)."""
+        subset = SourceTable([])
+        for source_id in ids:
+            if source_id in self.rows:
+                subset.rows[source_id] = self.rows[source_id]
+        return subset
+
+    def render(self, fields: Sequence[str] = ("title",), max_content_chars: Optional[int] = DEFAULT_CONTENT_CHARS) -> str:
+        """
+        Formato corto y estable, una fuente por línea:
+            ID | title | url
+            [1] Bombas centrífugas | https://...
+        """
+        lines = ["ID | " + " | ".join(fields)]
+        for source_id in self.ids:
+            row = self.rows[source_id]
+            values = []
+            for field in fields:
+                value = row.get(field, "")
+                if field == "content" and max_content_chars and len(value) > max_content_chars:
+                    value = value[:max_content_chars] + "..."
+                values.append(value or "-")
+            lines.append(f"[{source_id}] " + " | ".join(values))
+        return "\n".join(lines)
@@ -0,0 +1,74 @@
+"""
+Stage Cache: memoización por contenido de las etapas del pipeline v4.
+La clave es un hash canónico de las entradas de la etapa (tema, dossier, modelo, versión de prompt).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("stage_cache")
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pipeline_outputs", "stage_cache"
+)
+
+
+def canonical_hash(data: Any) -> str:
+    """SHA-256 de la serialización JSON canónica (claves ordenadas, sin espacios)."""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dossier_fingerprint(dossier: Dict) -> Dict:
+    """
+    Parte del dossier que determina el resultado de una etapa.
+    Excluye auditoría y campos variables entre ejecuciones.
+    """
+    return {
+        "topic": dossier.get("topic"),
+        "knowledge_base": dossier.get("knowledge_base", {}),
+    }
+
+
+class StageCache:
+    """
+    Almacén direccionado por contenido: <cache_dir>/<hash[:2]>/<hash>.json
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("STAGE_CACHE_DIR", DEFAULT_CACHE_DIR))
+
+    def key(self, stage: str, inputs: Dict) -> str:
+        return canonical_hash({"stage": stage, **inputs})
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"⚠️ Entrada de caché ilegible {key[:12]}: {e}")
+            return None
+
+    def put(self, key: str, value: Dict):
+        """Escritura atómica (archivo temporal + rename) segura entre procesos."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
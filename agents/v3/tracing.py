@@ -0,0 +1,301 @@
+"""
+Tracing: spans jerárquicos (traza -> etapa -> agente -> llamada LLM) para el pipeline.
+Los spans terminados se exportan a un JSONL local; el CLI dibuja el waterfall de una
+ejecución y los agregados por etapa:
+
+    python agents/v3/tracing.py waterfall [--trace TRACE_ID]
+    python agents/v3/tracing.py stats [--trace TRACE_ID]
+"""
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_TRACE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pipeline_outputs", "traces.jsonl"
+)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("semhys_current_span", default=None)
+
+
+class Span:
+    """
+    Un tramo de trabajo con tiempos, padre y atributos (tokens, cache hits, reintentos...).
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start = time.time()
+        self._start_monotonic = time.monotonic()
+        self.duration_ms: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def increment(self, key: str, amount: float = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def finish(self):
+        self.duration_ms = round((time.monotonic() - self._start_monotonic) * 1000, 2)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+
+
+class JsonlExporter:
+    """
+    Exportador append-only: una línea JSON por span terminado. Seguro entre hilos;
+    cada línea se escribe con una sola llamada, así que varios procesos pueden compartir archivo.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.abspath(path or os.getenv("TRACE_EXPORT_PATH", DEFAULT_TRACE_PATH))
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_exporter: Optional[JsonlExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def tracing_enabled() -> bool:
+    return os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def get_exporter() -> JsonlExporter:
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = JsonlExporter()
+        return _exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any):
+    """Atributo en el span activo (no-op fuera de una traza)."""
+    active = _current_span.get()
+    if active is not None:
+        active.set_attribute(key, value)
+
+
+def increment(key: str, amount: float = 1):
+    active = _current_span.get()
+    if active is not None:
+        active.increment(key, amount)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Abre un span hijo del span activo (o una traza nueva si no hay ninguno).
+
+        with span("agent_3.write_section", heading=title) as s:
+            ...
+            s.set_attribute("words", n)
+    """
+    active = Span(name, parent=_current_span.get(), attributes=attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.status = "error"
+        active.error = str(e)[:500]
+        raise
+    finally:
+        _current_span.reset(token)
+        active.finish()
+        if tracing_enabled():
+            try:
+                get_exporter().export(active)
+            except OSError:
+                pass
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorador: ejecuta la función dentro de un span."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_in_context(executor, func: Callable, *args, **kwargs):
+    """
+    executor.submit conservando el span activo en el hilo del worker
+    (los ContextVar no se propagan solos a un ThreadPoolExecutor).
+    """
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, func, *args, **kwargs)
+
+
+def record_usage(response):
+    """Tokens de la respuesta de Vertex/Gemini (usage_metadata) en el span activo."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for attr, key in (
+        ("prompt_token_count", "prompt_tokens"),
+        ("candidates_token_count", "output_tokens"),
+        ("total_token_count", "total_tokens"),
+    ):
+        value = getattr(usage, attr, None)
+        if isinstance(value, int):
+            set_attribute(key, value)
+
+
+# ---------- CLI: waterfall y agregados ----------
+
+def load_spans(path: str) -> List[Dict]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+
+def _select_trace(spans: List[Dict], trace_id: Optional[str]) -> List[Dict]:
+    if not trace_id:
+        roots = [s for s in spans if s["parent_id"] is None]
+        if not roots:
+            return []
+        trace_id = max(roots, key=lambda s: s["start"])["trace_id"]
+    return [s for s in spans if s["trace_id"].startswith(trace_id)]
+
+
+def render_waterfall(spans: List[Dict], width: int = 50) -> str:
+    if not spans:
+        return "(sin spans)"
+    t0 = min(s["start"] for s in spans)
+    total_ms = max((s["start"] - t0) * 1000 + (s["duration_ms"] or 0) for s in spans) or 1.0
+
+    children: Dict[Optional[str], List[Dict]] = {}
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    lines = [f"trace {spans[0]['trace_id']}  total {total_ms / 1000:.2f}s"]
+
+    def walk(parent_id: Optional[str], depth: int):
+        for s in sorted(children.get(parent_id, []), key=lambda x: x["start"]):
+            offset_ms = (s["start"] - t0) * 1000
+            duration = s["duration_ms"] or 0
+            begin = int(offset_ms / total_ms * width)
+            length = max(1, int(duration / total_ms * width))
+            bar = " " * begin + "█" * min(length, width - begin)
+            label = ("  " * depth + s["name"])[:44]
+            attrs = ", ".join(f"{k}={v}" for k, v in s["attributes"].items() if not isinstance(v, (dict, list)))
+            flag = " ✗" if s["status"] != "ok" else ""
+            lines.append(f"{label:<44} {duration / 1000:>8.2f}s |{bar:<{width}}|{flag} {attrs[:80]}")
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def aggregate(spans: List[Dict]) -> List[Dict]:
+    """Agregados por nombre de span: llamadas, total, media, p50, p95, máximo y errores."""
+    groups: Dict[str, List[Dict]] = {}
+    for s in spans:
+        groups.setdefault(s["name"], []).append(s)
+    rows = []
+    for name, group in groups.items():
+        durations = [s["duration_ms"] or 0 for s in group]
+        rows.append({
+            "name": name,
+            "count": len(group),
+            "total_s": round(sum(durations) / 1000, 2),
+            "mean_ms": round(sum(durations) / len(durations), 1),
+            "p50_ms": round(_percentile(durations, 50), 1),
+            "p95_ms": round(_percentile(durations, 95), 1),
+            "max_ms": round(max(durations), 1),
+            "errors": sum(1 for s in group if s["status"] != "ok"),
+            "tokens": sum(s["attributes"].get("total_tokens") or 0 for s in group),
+        })
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def render_stats(rows: List[Dict]) -> str:
+    header = f"{'span':<40} {'n':>5} {'total_s':>9} {'mean_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9} {'err':>4} {'tokens':>8}"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(
+            f"{r['name'][:40]:<40} {r['count']:>5} {r['total_s']:>9} {r['mean_ms']:>9} "
+            f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['max_ms']:>9} {r['errors']:>4} {r['tokens']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visor de trazas del pipeline SEMHYS")
+    parser.add_argument("command", choices=["waterfall", "stats", "list"])
+    parser.add_argument("--file", default=os.getenv("TRACE_EXPORT_PATH", DEFAULT_TRACE_PATH))
+    parser.add_argument("--trace", help="trace_id (o prefijo); por defecto la última traza")
+    parser.add_argument("--all", action="store_true", help="stats: agregar todas las trazas")
+    args = parser.parse_args()
+
+    spans = load_spans(args.file)
+
+    if args.command == "list":
+        for root in sorted((s for s in spans if s["parent_id"] is None), key=lambda s: s["start"]):
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(root["start"]))
+            print(f"{root['trace_id']}  {started}  {(root['duration_ms'] or 0) / 1000:>8.2f}s  {root['name']}")
+    elif args.command == "waterfall":
+        print(render_waterfall(_select_trace(spans, args.trace)))
+    else:
+        selected = spans if args.all else _select_trace(spans, args.trace)
+        print(render_stats(aggregate(selected)))
+
+
+if __name__ == "__main__":
+    main()
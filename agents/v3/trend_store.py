@@ -0,0 +1,146 @@
+"""
+Trend Store: historial persistente (SQLite) de tendencias escaneadas por Market Intelligence.
+Permite re-escanear solo las áreas obsoletas y penalizar temas ya publicados.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "pipeline_outputs", "trend_store.db"
+)
+
+# Similitud (Jaccard de tokens) a partir de la cual un tema se considera ya publicado
+PUBLISHED_SIMILARITY = 0.6
+
+
+def title_tokens(title: str) -> Set[str]:
+    """Tokens normalizados (minúsculas, sin acentos) de un título."""
+    folded = unicodedata.normalize("NFKD", (title or "").lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return {t for t in re.findall(r"[a-z0-9]+", folded) if len(t) > 2}
+
+
+def title_key(title: str) -> str:
+    return " ".join(sorted(title_tokens(title)))
+
+
+class TrendStore:
+    """
+    Almacén local de tendencias por área de enfoque con marca temporal.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = os.path.abspath(db_path or os.getenv("TREND_STORE_PATH", DEFAULT_DB_PATH))
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS scans (
+                    focus_area TEXT PRIMARY KEY,
+                    scanned_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS trends (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    focus_area TEXT NOT NULL,
+                    title_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    scanned_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_trends_area ON trends (focus_area, scanned_at);
+                CREATE TABLE IF NOT EXISTS published (
+                    title_key TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    published_at REAL NOT NULL
+                );
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Una conexión por operación: seguro entre hilos y entre workers.
+        # "with conn" solo confirma la transacción; la conexión se cierra aquí.
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def stale_areas(self, areas: Iterable[str], max_age_seconds: float, now: Optional[float] = None) -> List[str]:
+        """
+        Áreas nunca escaneadas o con último escaneo más antiguo que max_age_seconds.
+        """
+        now = now or time.time()
+        with self._connect() as conn:
+            scanned = dict(conn.execute("SELECT focus_area, scanned_at FROM scans").fetchall())
+        return [a for a in areas if a not in scanned or now - scanned[a] > max_age_seconds]
+
+    def record_scan(self, focus_area: str, topics: List[Dict], now: Optional[float] = None):
+        """
+        Reemplaza las tendencias de un área con el resultado del último escaneo.
+        """
+        now = now or time.time()
+        rows = [
+            (focus_area, title_key(t.get("title") or t.get("research_area", "")),
+             json.dumps(t, ensure_ascii=False), now)
+            for t in topics
+        ]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM trends WHERE focus_area = ?", (focus_area,))
+            conn.executemany(
+                "INSERT INTO trends (focus_area, title_key, payload, scanned_at) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO scans (focus_area, scanned_at) VALUES (?, ?)", (focus_area, now)
+            )
+
+    def load_trends(self, areas: Iterable[str]) -> List[Dict]:
+        """
+        Tendencias almacenadas de las áreas dadas, con su 'scanned_at' (epoch).
+        """
+        areas = list(areas)
+        if not areas:
+            return []
+        placeholders = ",".join("?" for _ in areas)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT payload, scanned_at FROM trends WHERE focus_area IN ({placeholders})", areas
+            ).fetchall()
+        trends = []
+        for payload, scanned_at in rows:
+            trend = json.loads(payload)
+            trend["scanned_at"] = scanned_at
+            trends.append(trend)
+        return trends
+
+    def mark_published(self, title: str, now: Optional[float] = None):
+        """Registra un tema como publicado para no volver a seleccionarlo."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO published (title_key, title, published_at) VALUES (?, ?, ?)",
+                (title_key(title), title, now or time.time()),
+            )
+
+    def published_titles(self) -> List[Set[str]]:
+        """Tokens de todos los temas publicados."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT title_key FROM published").fetchall()
+        return [set(key.split()) for (key,) in rows]
+
+
+def published_similarity(title: str, published: List[Set[str]]) -> float:
+    """Máxima similitud Jaccard entre un título y los temas ya publicados."""
+    tokens = title_tokens(title)
+    if not tokens:
+        return 0.0
+    return max((len(tokens & p) / len(tokens | p) for p in published if p), default=0.0)
+
+
+def decayed_score(score: float, age_seconds: float, half_life_hours: float) -> float:
+    """Score con decaimiento exponencial según la antigüedad del escaneo."""
+    return score * 0.5 ** (max(age_seconds, 0.0) / 3600.0 / half_life_hours)
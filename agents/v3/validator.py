@@ -2,6 +2,8 @@
 from typing import List, Dict
 import json
 from agents.base import SemhysAgent
+from agents.v3.tracing import traced
+from agents.v3.source_table import SourceTable
 
 class SourceValidator(SemhysAgent):
     """
@@ -26,25 +28,27 @@ class SourceValidator(SemhysAgent):
         NOTA: Si la fuente parece técnica y relevante, ACEPTALA. No seas demasiado estricto con fechas si es un ejemplo.
         """
 
-    def validate(self, topic: str, sources: List[Dict]) -> Dict:
+    @traced("v3.validate")
+    def validate(self, topic: str, sources: List[Dict], source_table: SourceTable = None) -> Dict:
         """
         Valida una lista de fuentes.
+        'source_table' (opcional) es la tabla compacta compartida por el pipeline;
+        'source_number' de la respuesta corresponde a sus IDs.
         """
         print(f"[{self.name}] Validando {len(sources)} fuentes para: {topic}")
         
-        sources_text = json.dumps(sources, indent=2, ensure_ascii=False)
+        table = source_table or SourceTable(sources)
+        sources_text = table.render(("title", "url", "date", "publisher", "content"))
         
         prompt = (
             f"Analiza las siguientes fuentes para el tema: '{topic}'.\n"
-            f"Aplica el criterio CRAAP a cada una.\n\n"
+            f"Aplica el criterio CRAAP a cada una. 'source_number' es el ID [n] de la tabla.\n\n"
             f"FUENTES:\n{sources_text}\n\n"
             f"Devuelve UNICAMENTE un JSON válido con este formato:\n"
             f"{{\n"
             f"  \"validation_table\": [\n"
             f"    {{\n"
             f"      \"source_number\": 1,\n"
-            f"      \"url\": \"...\",\n"
-            f"      \"title\": \"...\",\n"
             f"      \"craap_score\": 4.2,\n"
             f"      \"decision\": \"ACCEPTED\" o \"REJECTED\",\n"
             f"      \"analysis\": \"Currency: 5 (2024), Authority: 4...\"\n"
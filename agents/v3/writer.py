@@ -2,6 +2,8 @@
 from typing import List, Dict
 import json
 from agents.base import SemhysAgent
+from agents.v3.tracing import traced
+from agents.v3.source_table import SourceTable, compact_json
 
 class GroundedWriter(SemhysAgent):
     """
@@ -56,14 +58,16 @@ class GroundedWriter(SemhysAgent):
         response = self.generate(prompt)
         return response.strip()
 
-    def write_full_article_one_shot(self, topic: str, outline: Dict, sources: List[Dict]) -> str:
+    @traced("v3.write_full_article")
+    def write_full_article_one_shot(self, topic: str, outline: Dict, sources: List[Dict], source_table: SourceTable = None) -> str:
         """
         Genera el artículo COMPLETO en una sola llamada (Optimización para Free Tier).
         """
         print(f"[{self.name}] Generando artículo completo (Draft Mode)...")
         
-        sources_text = json.dumps(sources, indent=2, ensure_ascii=False)
-        structure_text = json.dumps(outline, indent=2, ensure_ascii=False)
+        table = source_table or SourceTable(sources)
+        sources_text = table.render(("title", "url", "content"))
+        structure_text = compact_json(outline)
         
         prompt = (
             f"Escribe un artículo técnico COMPLETO sobre: '{topic}'.\n\n"
@@ -71,7 +75,7 @@ class GroundedWriter(SemhysAgent):
             f"FUENTES DISPONIBLES:\n{sources_text}\n\n"
             f"INSTRUCCIONES CRÍTICAS:\n"
             f"1. Escribe TODAS las secciones en formato Markdown.\n"
-            f"2. Cita OBLIGATORIAMENTE cada dato con `[#]` usando el 'source_number' del JSON.\n"
+            f"2. Cita OBLIGATORIAMENTE cada dato con `[#]` usando el ID [n] de la tabla de fuentes.\n"
             f"3. Si una sección no tiene info en las fuentes, escribe un breve párrafo general sin inventar datos.\n"
             f"4. Mantén un tono técnico y profesional.\n"
             f"5. NO uses placeholders. Escribe el contenido final.\n"
@@ -0,0 +1,355 @@
+"""
+API ASGI: mismos endpoints y autenticación que api_wrapper.py, con handlers asíncronos.
+
+Las llamadas bloqueantes de los SDK (Vertex, Discovery Engine) se ejecutan en carriles
+de hilos acotados: los agentes interactivos (/agentN/run) no compiten con los pipelines,
+así un solo proceso atiende muchas consultas de Agent 2 mientras corren pipelines.
+Si un carril está lleno la petición recibe 503 (el cliente reintenta) en lugar de encolarse sin límite.
+
+    uvicorn api_asgi:app --host 0.0.0.0 --port 8080 --workers 2 --timeout-graceful-shutdown 60
+
+Si el cliente se desconecta, su ejecución se cancela (solo aquí: api_wrapper.py
+con gunicorn no detecta desconexiones). Es el servidor por defecto de deploy_to_vps.sh.
+
+Apagado ordenado: uvicorn deja de aceptar conexiones y espera las peticiones en curso;
+después se drenan los carriles y los trabajos de la cola (hasta ASGI_DRAIN_SECONDS).
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from agent_service import (
+    API_KEY, LOCATION, PROJECT_ID, PROGRESS_STREAM_SECONDS, REQUEST_DEADLINE_SECONDS, REQUIRED_FIELDS,
+    agent_pool, execute_agent_1, execute_agent_2, execute_agent_3, execute_agent_4, execute_pipeline,
+    job_accepted, job_queue
+)
+from agents.v3.deadline import Deadline, DeadlineExceeded, deadline_scope
+from agents.v3.progress import TERMINAL_EVENTS, progress_scope, read_events
+from job_queue import CallbackNotAllowed
+from response_encoding import encode_json
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("agent_api")
+
+# Cada cuánto se comprueba si el cliente cortó la conexión (cancela el deadline de la ejecución)
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class ExecutorLane:
+    """
+    Pool de hilos acotado para llamadas bloqueantes, con admisión limitada
+    (workers en ejecución + queue_limit en espera).
+    """
+
+    def __init__(self, name: str, workers: int, queue_limit: int):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"asgi-{name}")
+        self.capacity = workers + queue_limit
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def run(self, fn, *args):
+        # Solo se modifica desde el event loop: sin lock
+        if self.in_flight >= self.capacity:
+            raise ServiceBusy(f"{self.name}: {self.in_flight} ejecuciones en curso")
+        self.in_flight += 1
+        self.idle.clear()
+        try:
+            ctx = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self.executor, ctx.run, fn, *args)
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self.idle.set()
+
+
+AGENT_LANE = ExecutorLane(
+    "agents", int(os.getenv("ASGI_AGENT_WORKERS", "32")), int(os.getenv("ASGI_AGENT_QUEUE", "64"))
+)
+PIPELINE_LANE = ExecutorLane(
+    "pipelines", int(os.getenv("ASGI_PIPELINE_WORKERS", "4")), int(os.getenv("ASGI_PIPELINE_QUEUE", "4"))
+)
+DRAIN_SECONDS = float(os.getenv("ASGI_DRAIN_SECONDS", "60"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    job_queue.start()
+    try:
+        await loop.run_in_executor(None, agent_pool.start)
+    except Exception as e:
+        # Sin agentes calientes el proceso sigue sirviendo: el pool se reintenta en la primera petición
+        logger.error(f"❌ No se pudo inicializar el pool de agentes: {e}")
+    yield
+    # Apagado: esperar las ejecuciones en curso y los trabajos de la cola
+    started = time.monotonic()
+    logger.info(
+        f"⏳ Drenando: {AGENT_LANE.in_flight} agentes, {PIPELINE_LANE.in_flight} pipelines en curso"
+    )
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(AGENT_LANE.idle.wait(), PIPELINE_LANE.idle.wait()), timeout=DRAIN_SECONDS
+        )
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Ejecuciones sin terminar al agotar ASGI_DRAIN_SECONDS")
+    remaining = max(0.0, DRAIN_SECONDS - (time.monotonic() - started))
+    if not await loop.run_in_executor(None, job_queue.stop, remaining):
+        logger.warning("⚠️ Trabajos de la cola sin terminar: se marcarán como fallidos al reiniciar")
+    for lane in (AGENT_LANE, PIPELINE_LANE):
+        lane.executor.shutdown(wait=False)
+    logger.info(f"👋 Apagado completado en {time.monotonic() - started:.1f}s")
+
+
+app = FastAPI(title="SEMHYS Agents API", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+@app.middleware("http")
+async def authenticate(request: Request, call_next):
+    """Valida API key en headers"""
+    if request.url.path != "/health" and request.headers.get("X-API-Key") != API_KEY:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return await call_next(request)
+
+
+def _scoped(fn, data, deadline, run_id=None):
+    """En el hilo del carril: deadline de la petición y, si se pide, eventos de progreso."""
+    with ExitStack() as stack:
+        stack.enter_context(deadline_scope(deadline))
+        if run_id:
+            stack.enter_context(progress_scope(run_id, manual_topic=data.get('manual_topic')))
+        return fn(data)
+
+
+async def _run(request: Request, lane: ExecutorLane, fn, data, run_id=None):
+    """
+    Ejecuta 'fn(data)' en el carril con el deadline de la petición; si el cliente
+    se desconecta se cancela el deadline y la ejecución se detiene en la siguiente llamada externa.
+    """
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS)
+    task = asyncio.ensure_future(lane.run(_scoped, fn, data, deadline, run_id))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if not deadline.cancelled and await request.is_disconnected():
+            logger.info(f"🔌 Cliente desconectado: cancelando {request.url.path}")
+            deadline.cancel("client disconnected")
+
+
+def _json(request: Request, data, status_code: int = 200) -> Response:
+    """JSON con orjson y compresión negociada; ?fields= se aplica solo a respuestas 200"""
+    body, headers = encode_json(
+        data,
+        fields=request.query_params.get("fields") if status_code == 200 else None,
+        accept_encoding=request.headers.get("accept-encoding")
+    )
+    return Response(content=body, status_code=status_code, headers=headers)
+
+
+def _error(e, agent):
+    """503 si el carril está lleno, 400 si el callback_url no está permitido, 504 si se agotó el deadline, 500 en otro caso"""
+    if isinstance(e, ServiceBusy):
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
+    if isinstance(e, CallbackNotAllowed):
+        return JSONResponse({"error": str(e)}, status_code=400)
+    logger.error(f"Error en {agent}: {e}")
+    return JSONResponse({"error": str(e)}, status_code=504 if isinstance(e, DeadlineExceeded) else 500)
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@app.get("/health")
+async def health(request: Request):
+    """Health check endpoint"""
+    return _json(request, {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "project_id": PROJECT_ID,
+        "location": LOCATION,
+        "agents_warm": agent_pool.warm,
+        "in_flight": {"agents": AGENT_LANE.in_flight, "pipelines": PIPELINE_LANE.in_flight}
+    })
+
+
+@app.post("/agent1/run")
+async def run_agent_1(request: Request):
+    """Ejecuta Agent 1: Market Intelligence. Body: {"manual_topic": "optional topic override"}"""
+    data = await _json_body(request)
+    logger.info(f"🔍 Ejecutando Agent 1 (manual_topic={data.get('manual_topic')})")
+    try:
+        return _json(request, await _run(request, AGENT_LANE, execute_agent_1, data))
+    except Exception as e:
+        return _error(e, "Agent 1")
+
+
+@app.post("/agent2/run")
+async def run_agent_2(request: Request):
+    """Ejecuta Agent 2: Privacy Guardian. Body: {"topic": "topic to search"}"""
+    data = await _json_body(request)
+    if not data.get('topic'):
+        return JSONResponse({"error": "topic is required"}, status_code=400)
+    logger.info(f"🛡️ Ejecutando Agent 2 (topic={data['topic']})")
+    try:
+        return _json(request, await _run(request, AGENT_LANE, execute_agent_2, data))
+    except Exception as e:
+        return _error(e, "Agent 2")
+
+
+@app.post("/agent3/run")
+async def run_agent_3(request: Request):
+    """Ejecuta Agent 3: Notebook Synthesizer. Body: {"topic", "dossier", "force"}"""
+    data = await _json_body(request)
+    if not data.get('topic') or not data.get('dossier'):
+        return JSONResponse({"error": "topic and dossier are required"}, status_code=400)
+    logger.info(f"📝 Ejecutando Agent 3 (topic={data['topic']})")
+    try:
+        return _json(request, await _run(request, AGENT_LANE, execute_agent_3, data))
+    except Exception as e:
+        return _error(e, "Agent 3")
+
+
+@app.post("/agent4/run")
+async def run_agent_4(request: Request):
+    """Ejecuta Agent 4: Auditor. Body: {"article", "dossier", "force"}"""
+    data = await _json_body(request)
+    if not data.get('article') or not data.get('dossier'):
+        return JSONResponse({"error": "article and dossier are required"}, status_code=400)
+    logger.info("🔍 Ejecutando Agent 4")
+    try:
+        return _json(request, await _run(request, AGENT_LANE, execute_agent_4, data))
+    except Exception as e:
+        return _error(e, "Agent 4")
+
+
+@app.post("/pipeline/run")
+async def run_full_pipeline(request: Request):
+    """
+    Ejecuta el pipeline completo (mismo body que api_wrapper: manual_topic, save_output,
+    force, async, callback_url, run_id). Con "async": true responde 202 con el job_id.
+    """
+    data = await _json_body(request)
+    try:
+        if data.get('async'):
+            job_id = job_queue.submit("pipeline", data, callback_url=data.get('callback_url'))
+            return _json(request, job_accepted(job_id), 202)
+
+        logger.info(f"🚀 Ejecutando pipeline completo (manual_topic={data.get('manual_topic')})")
+        result = await _run(request, PIPELINE_LANE, execute_pipeline, data, run_id=data.get('run_id'))
+        return _json(request, result, 504 if result.get("reason") == "deadline_exceeded" else 200)
+    except Exception as e:
+        return _error(e, "pipeline")
+
+
+@app.post("/jobs")
+async def submit_job(request: Request):
+    """Encola una ejecución larga. Body: {"kind", "payload", "callback_url"}"""
+    data = await _json_body(request)
+    kind = data.get('kind')
+    payload = data.get('payload') or {}
+
+    if kind not in job_queue.runners:
+        return JSONResponse({"error": f"kind must be one of {sorted(job_queue.runners)}"}, status_code=400)
+
+    missing = [f for f in REQUIRED_FIELDS.get(kind, ()) if not payload.get(f)]
+    if missing:
+        return JSONResponse({"error": f"{' and '.join(missing)} required in payload"}, status_code=400)
+
+    try:
+        job_id = job_queue.submit(kind, payload, callback_url=data.get('callback_url'))
+    except Exception as e:
+        return _error(e, "cola de trabajos")
+    return _json(request, job_accepted(job_id), 202)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """Estado y resultado de un trabajo: queued | running | completed | failed | cancelled"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "job not found"}, status_code=404)
+    return _json(request, job)
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, request: Request):
+    """Cancela un trabajo en cola o en ejecución"""
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return JSONResponse({"error": "job not found"}, status_code=404)
+    return _json(request, {"job_id": job_id, "status": status})
+
+
+@app.get("/runs/{run_id}/events")
+async def get_run_events(run_id: str, request: Request, after: int = 0):
+    """Eventos de progreso de una ejecución (polling). Query: ?after=<seq>"""
+    try:
+        events = read_events(run_id, after=after)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return _json(request, {
+        "run_id": run_id,
+        "events": events,
+        "last_seq": events[-1]["seq"] if events else after,
+        "finished": any(e["type"] in TERMINAL_EVENTS for e in events)
+    })
+
+
+@app.get("/runs/{run_id}/events/stream")
+async def stream_run_events(run_id: str, request: Request, after: int = 0):
+    """
+    Eventos de progreso en vivo (Server-Sent Events). Reanuda desde Last-Event-ID o ?after=<seq>;
+    se cierra tras el evento final, al desconectarse el cliente o a los PROGRESS_STREAM_SECONDS.
+    """
+    try:
+        after = int(request.headers.get('Last-Event-ID') or after)
+        read_events(run_id, after=after)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def generate():
+        # Equivalente asíncrono de progress.follow: sondeo sin bloquear el event loop
+        last_seq, started = after, time.monotonic()
+        while time.monotonic() - started < PROGRESS_STREAM_SECONDS:
+            for event in read_events(run_id, after=last_seq):
+                last_seq = event["seq"]
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8080)), timeout_graceful_shutdown=int(DRAIN_SECONDS))
@@ -1,23 +1,28 @@
 """
 API Wrapper: Flask API para exponer los agentes a n8n
+
+Con WSGI no hay aviso de desconexión del cliente: una petición abandonada sigue
+ejecutándose hasta terminar o agotar REQUEST_DEADLINE_SECONDS. La cancelación al
+desconectarse solo existe en api_asgi.py (servidor por defecto en deploy_to_vps.sh);
+aquí, para ejecuciones largas cancelables, usar la cola (POST /jobs y /jobs/<job_id>/cancel).
 """
 
 import os
 import json
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
-import sys
-
-# Agregar path para imports
-sys.path.append(os.path.join(os.path.dirname(__file__), 'agents', 'v3'))
 
-from agents.v3.agent_1_market_intelligence import MarketIntelligenceAgent
-from agents.v3.agent_2_privacy_guardian import PrivacyGuardianAgent
-from agents.v3.agent_3_notebook_synthesizer import NotebookSynthesizerAgent
-from agents.v3.agent_4_auditor import AuditorAgent
-from agents.v3.orchestrator_v4 import AgentOrchestrator
+from agent_service import (
+    API_KEY, LOCATION, PROJECT_ID, PROGRESS_STREAM_SECONDS, REQUEST_DEADLINE_SECONDS, REQUIRED_FIELDS,
+    agent_pool, execute_agent_1, execute_agent_2, execute_agent_3, execute_agent_4, execute_pipeline,
+    job_accepted, job_queue
+)
+from agents.v3.deadline import Deadline, DeadlineExceeded, reset_deadline, set_deadline
+from agents.v3.progress import follow, progress_scope, read_events
+from job_queue import CallbackNotAllowed
+from response_encoding import encode_json
 
 # Configuración
 logging.basicConfig(level=logging.INFO)
@@ -26,10 +31,39 @@ logger = logging.getLogger("agent_api")
 app = Flask(__name__)
 CORS(app)
 
-# Variables de entorno
-PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gen-lang-client-0585991170")
-LOCATION = os.getenv("VERTEX_LOCATION", "us-central1")
-API_KEY = os.getenv("AGENT_API_KEY", "your-secret-api-key")
+@app.before_request
+def start_job_workers():
+    """Respaldo idempotente: con gunicorn la cola ya arranca en post_worker_init"""
+    job_queue.start()
+
+@app.before_request
+def start_request_deadline():
+    """Activa el deadline de la petición para todas las llamadas externas que dispare"""
+    g.deadline_token = set_deadline(Deadline(REQUEST_DEADLINE_SECONDS))
+
+@app.teardown_request
+def end_request_deadline(exc=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        reset_deadline(token)
+
+def json_response(data, status=200):
+    """
+    JSON con orjson, comprimido según Accept-Encoding; en respuestas 200 se aplica
+    ?fields= (p. ej. ?fields=topic,knowledge_base.title) para bajar solo lo que se usa.
+    """
+    body, headers = encode_json(
+        data,
+        fields=request.args.get('fields') if status == 200 else None,
+        accept_encoding=request.headers.get('Accept-Encoding')
+    )
+    return Response(body, status=status, headers=headers)
+
+def _error_status(e):
+    """400 si el callback_url no está permitido, 504 si se agotó el deadline, 500 en cualquier otro error"""
+    if isinstance(e, CallbackNotAllowed):
+        return 400
+    return 504 if isinstance(e, DeadlineExceeded) else 500
 
 # Middleware de autenticación
 @app.before_request
@@ -40,16 +74,17 @@ def authenticate():
     
     auth_header = request.headers.get('X-API-Key')
     if auth_header != API_KEY:
-        return jsonify({"error": "Unauthorized"}), 401
+        return json_response({"error": "Unauthorized"}, 401)
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
+    return json_response({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "project_id": PROJECT_ID,
-        "location": LOCATION
+        "location": LOCATION,
+        "agents_warm": agent_pool.warm
     })
 
 @app.route('/agent1/run', methods=['POST'])
@@ -68,14 +103,13 @@ def run_agent_1():
         
         logger.info(f"🔍 Ejecutando Agent 1 (manual_topic={manual_topic})")
         
-        agent = MarketIntelligenceAgent(project_id=PROJECT_ID, location=LOCATION)
-        result = agent.run(override_topic=manual_topic)
+        result = execute_agent_1(data)
         
-        return jsonify(result), 200
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Error en Agent 1: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, _error_status(e))
 
 @app.route('/agent2/run', methods=['POST'])
 def run_agent_2():
@@ -92,18 +126,17 @@ def run_agent_2():
         topic = data.get('topic')
         
         if not topic:
-            return jsonify({"error": "topic is required"}), 400
+            return json_response({"error": "topic is required"}, 400)
         
         logger.info(f"🛡️ Ejecutando Agent 2 (topic={topic})")
         
-        agent = PrivacyGuardianAgent(project_id=PROJECT_ID, location="global")
-        result = agent.run(topic)
+        result = execute_agent_2(data)
         
-        return jsonify(result), 200
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Error en Agent 2: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, _error_status(e))
 
 @app.route('/agent3/run', methods=['POST'])
 def run_agent_3():
@@ -113,7 +146,8 @@ def run_agent_3():
     Body:
     {
         "topic": "article topic",
-        "dossier": {...}
+        "dossier": {...},
+        "force": false
     }
     """
     try:
@@ -122,18 +156,17 @@ def run_agent_3():
         dossier = data.get('dossier')
         
         if not topic or not dossier:
-            return jsonify({"error": "topic and dossier are required"}), 400
+            return json_response({"error": "topic and dossier are required"}, 400)
         
         logger.info(f"📝 Ejecutando Agent 3 (topic={topic})")
         
-        agent = NotebookSynthesizerAgent(project_id=PROJECT_ID, location=LOCATION)
-        result = agent.run(topic, dossier)
+        result = execute_agent_3(data)
         
-        return jsonify(result), 200
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Error en Agent 3: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, _error_status(e))
 
 @app.route('/agent4/run', methods=['POST'])
 def run_agent_4():
@@ -143,7 +176,8 @@ def run_agent_4():
     Body:
     {
         "article": {...},
-        "dossier": {...}
+        "dossier": {...},
+        "force": false
     }
     """
     try:
@@ -152,18 +186,17 @@ def run_agent_4():
         dossier = data.get('dossier')
         
         if not article or not dossier:
-            return jsonify({"error": "article and dossier are required"}), 400
+            return json_response({"error": "article and dossier are required"}, 400)
         
         logger.info(f"🔍 Ejecutando Agent 4")
         
-        agent = AuditorAgent(project_id=PROJECT_ID, location=LOCATION)
-        result = agent.run(article, dossier)
+        result = execute_agent_4(data)
         
-        return jsonify(result), 200
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Error en Agent 4: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, _error_status(e))
 
 @app.route('/pipeline/run', methods=['POST'])
 def run_full_pipeline():
@@ -173,28 +206,136 @@ def run_full_pipeline():
     Body:
     {
         "manual_topic": "optional topic override",
-        "save_output": true/false
+        "save_output": true/false,
+        "force": true/false (ignora la caché de etapas),
+        "async": true/false,
+        "callback_url": "optional webhook (solo async)",
+        "run_id": "optional id para seguir el progreso de la ejecución síncrona"
     }
+    
+    Con "async": true responde 202 con el job_id (ver /jobs/<job_id>).
+    El progreso se sigue en /runs/<run_id>/events (run_id = job_id en async).
     """
     try:
         data = request.get_json()
         manual_topic = data.get('manual_topic')
-        save_output = data.get('save_output', True)
+        
+        if data.get('async'):
+            job_id = job_queue.submit("pipeline", data, callback_url=data.get('callback_url'))
+            return json_response(job_accepted(job_id), 202)
         
         logger.info(f"🚀 Ejecutando pipeline completo (manual_topic={manual_topic})")
         
-        orchestrator = AgentOrchestrator(project_id=PROJECT_ID, location=LOCATION)
-        result = orchestrator.run_pipeline(
-            manual_topic=manual_topic,
-            save_output=save_output
-        )
+        if data.get('run_id'):
+            with progress_scope(data['run_id'], manual_topic=manual_topic):
+                result = execute_pipeline(data)
+        else:
+            result = execute_pipeline(data)
         
-        return jsonify(result), 200
+        if result.get("reason") == "deadline_exceeded":
+            return json_response(result, 504)
+        return json_response(result, 200)
         
     except Exception as e:
         logger.error(f"Error en pipeline: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, _error_status(e))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Encola una ejecución larga y devuelve el job_id de inmediato.
+    
+    Body:
+    {
+        "kind": "pipeline" | "batch" | "agent1" | "agent2" | "agent3" | "agent4",
+        "payload": {... mismo body que el endpoint síncrono ...},
+        "callback_url": "optional webhook (n8n) notificado al terminar"
+    }
+    """
+    try:
+        data = request.get_json()
+        kind = data.get('kind')
+        payload = data.get('payload') or {}
+        
+        if kind not in job_queue.runners:
+            return json_response({"error": f"kind must be one of {sorted(job_queue.runners)}"}, 400)
+        
+        missing = [f for f in REQUIRED_FIELDS.get(kind, ()) if not payload.get(f)]
+        if missing:
+            return json_response({"error": f"{' and '.join(missing)} required in payload"}, 400)
+        
+        job_id = job_queue.submit(kind, payload, callback_url=data.get('callback_url'))
+        return json_response(job_accepted(job_id), 202)
+        
+    except Exception as e:
+        logger.error(f"Error encolando trabajo: {e}")
+        return json_response({"error": str(e)}, _error_status(e))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Estado y resultado de un trabajo: queued | running | completed | failed | cancelled
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return json_response({"error": "job not found"}, 404)
+    return json_response(job, 200)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    Cancela un trabajo: en cola se descarta; en ejecución se detiene en la
+    siguiente llamada externa o etapa del pipeline (estado 'cancelling').
+    """
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return json_response({"error": "job not found"}, 404)
+    return json_response({"job_id": job_id, "status": status}, 200)
+
+@app.route('/runs/<run_id>/events', methods=['GET'])
+def get_run_events(run_id):
+    """
+    Eventos de progreso de una ejecución (polling).
+    
+    Query: ?after=<seq> devuelve solo los eventos posteriores.
+    Response: {"run_id", "events": [...], "last_seq", "finished"}
+    """
+    try:
+        events = read_events(run_id, after=int(request.args.get('after', 0)))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response({
+        "run_id": run_id,
+        "events": events,
+        "last_seq": events[-1]["seq"] if events else int(request.args.get('after', 0)),
+        "finished": any(e["type"] in ("run_finished", "run_failed") for e in events)
+    })
+
+@app.route('/runs/<run_id>/events/stream', methods=['GET'])
+def stream_run_events(run_id):
+    """
+    Eventos de progreso en vivo (Server-Sent Events). Reanuda desde Last-Event-ID
+    o ?after=<seq>; se cierra tras run_finished/run_failed o a los PROGRESS_STREAM_SECONDS.
+    """
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+        read_events(run_id, after=after)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    
+    def generate():
+        for event in follow(run_id, after=after, timeout=PROGRESS_STREAM_SECONDS):
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == '__main__':
+    # Con gunicorn el pool se calienta en post_worker_init (gunicorn.conf.py)
+    job_queue.start()
+    agent_pool.start()
     port = int(os.getenv('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,172 @@
+"""
+Presupuesto de tiempo de importación por punto de entrada (arranque en frío).
+
+    python benchmarks/check_import_time.py                  # todos (código 1 si alguno se pasa)
+    python benchmarks/check_import_time.py --entries main api_asgi --repeat 5
+    python benchmarks/check_import_time.py --scale 2        # máquina lenta: presupuestos x2
+
+Cada punto de entrada se importa en un intérprete nuevo con `python -X importtime` y se
+suma el tiempo acumulado de los imports de primer nivel (se toma la pasada más rápida).
+Además se verifica que ningún SDK pesado (vertexai, Discovery Engine, googleapiclient,
+google.generativeai, streamlit) se cargue al importar: deben importarse en la función
+que los usa. Esa comprobación no depende de la máquina; el presupuesto en ms sí
+(IMPORT_BUDGET_SCALE o --scale).
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Set
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# SDK que no deben cargarse al importar un punto de entrada
+HEAVY_MODULES = (
+    "vertexai",
+    "google.cloud.discoveryengine",
+    "google.cloud.discoveryengine_v1",
+    "google.cloud.aiplatform",
+    "google.generativeai",
+    "googleapiclient",
+    "streamlit",
+)
+
+# nombre -> módulo a importar, directorio de trabajo y presupuesto (ms)
+ENTRY_POINTS = {
+    "main": {"module": "main", "cwd": ROOT, "budget_ms": 800},
+    "api_wrapper": {"module": "api_wrapper", "cwd": ROOT, "budget_ms": 800},
+    "api_asgi": {"module": "api_asgi", "cwd": ROOT, "budget_ms": 1000},
+    "agents_base": {"module": "agents.base", "cwd": ROOT, "budget_ms": 300},
+    "orchestrator_v4": {"module": "agents.v3.orchestrator_v4", "cwd": ROOT, "budget_ms": 400},
+    "semhys_agents": {"module": "app.main", "cwd": os.path.join(ROOT, "semhys-agents"), "budget_ms": 1200},
+}
+
+# "import time: self [us] | cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Entradas de -X importtime: módulo, self/cumulative (us) y nivel de anidamiento."""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": (len(match.group(3)) - 1) // 2,
+            })
+    return entries
+
+
+def _importtime(code: str, cwd: str, env: Dict) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+
+
+def startup_modules(env: Dict) -> Set[str]:
+    """Módulos que el intérprete carga antes de ejecutar nada (site, encodings...)."""
+    return {e["module"] for e in parse_importtime(_importtime("pass", ROOT, env).stderr)}
+
+
+def measure_once(entry: Dict, env: Dict, startup: Set[str]) -> Dict:
+    proc = _importtime(f"import {entry['module']}", entry["cwd"], env)
+    entries = [e for e in parse_importtime(proc.stderr) if e["module"] not in startup]
+    if proc.returncode != 0:
+        error = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        return {"status": "error", "error": error[-1] if error else f"exit {proc.returncode}"}
+
+    top_level = [e for e in entries if e["depth"] == 0]
+    loaded = {e["module"] for e in entries}
+    return {
+        "status": "success",
+        "total_ms": round(sum(e["cumulative_us"] for e in top_level) / 1000, 1),
+        "modules": len(entries),
+        "heaviest": [
+            (e["module"], round(e["cumulative_us"] / 1000, 1))
+            for e in sorted(top_level, key=lambda e: e["cumulative_us"], reverse=True)[:5]
+        ],
+        "heavy_loaded": sorted(m for m in HEAVY_MODULES if m in loaded),
+    }
+
+
+def measure(name: str, repeat: int, env: Dict, startup: Set[str]) -> Dict:
+    """Pasada más rápida de 'repeat' intérpretes nuevos."""
+    best: Optional[Dict] = None
+    for _ in range(repeat):
+        result = measure_once(ENTRY_POINTS[name], env, startup)
+        if result["status"] != "success":
+            return result
+        if best is None or result["total_ms"] < best["total_ms"]:
+            best = result
+    return best
+
+
+def check(name: str, result: Dict, scale: float) -> List[str]:
+    if result["status"] != "success":
+        return [f"{name}: no se pudo importar ({result['error']})"]
+    problems = []
+    budget = ENTRY_POINTS[name]["budget_ms"] * scale
+    if result["total_ms"] > budget:
+        problems.append(f"{name}: {result['total_ms']:.0f} ms > presupuesto {budget:.0f} ms")
+    if result["heavy_loaded"]:
+        problems.append(f"{name}: SDK cargados al importar: {', '.join(result['heavy_loaded'])}")
+    return problems
+
+
+def print_report(results: Dict[str, Dict], scale: float):
+    print(f"\n{'Entrada':<18}{'ms':>9}{'presup.':>9}{'módulos':>9}  más pesados")
+    for name, result in results.items():
+        if result["status"] != "success":
+            print(f"{name:<18}{'error':>9}  {result['error']}")
+            continue
+        heaviest = ", ".join(f"{module} {ms:.0f}" for module, ms in result["heaviest"])
+        budget = ENTRY_POINTS[name]["budget_ms"] * scale
+        print(f"{name:<18}{result['total_ms']:>9.0f}{budget:>9.0f}{result['modules']:>9}  {heaviest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importación por punto de entrada")
+    parser.add_argument("--entries", nargs="+", choices=list(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    parser.add_argument("--repeat", type=int, default=3, help="Intérpretes por entrada (se toma el más rápido)")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", "1")),
+                        help="Multiplicador de los presupuestos (máquinas lentas / CI)")
+    parser.add_argument("--json", help="Escribe los resultados en este archivo")
+    args = parser.parse_args()
+
+    # Bases de datos y estado del proceso en un directorio temporal, no en el repo
+    workdir = tempfile.mkdtemp(prefix="semhys_importtime_")
+    env = dict(os.environ)
+    env.update({
+        "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "AUDIT_STORE_PATH": os.path.join(workdir, "audit.db"),
+        "MODEL_STATE_PATH": os.path.join(workdir, "model_state.json"),
+    })
+    env.pop("PYTHONPATH", None)
+
+    startup = startup_modules(env)
+    results = {name: measure(name, max(1, args.repeat), env, startup) for name in args.entries}
+    print_report(results, args.scale)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    problems = [p for name, result in results.items() for p in check(name, result, args.scale)]
+    if problems:
+        print("\n❌ Fuera de presupuesto:")
+        for problem in problems:
+            print(f"    {problem}")
+        sys.exit(1)
+    print("\n✅ Todos los puntos de entrada dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
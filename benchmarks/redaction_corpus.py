@@ -0,0 +1,244 @@
+"""
+Corpus sintético para medir la redacción: texto de ingeniería en español/inglés con
+datos sensibles sembrados (ground truth) y señuelos técnicos que NO deben redactarse.
+
+    python benchmarks/redaction_corpus.py --size 50MB --density 2 --output /tmp/pii_corpus.jsonl
+
+Cada línea del JSONL es un documento:
+    {"id": ..., "text": ..., "entities": [{"category": ..., "value": ...}], "decoys": [...]}
+
+Categorías sembradas: email, phone, id, money, gps, contract, client, gs_uri, filename.
+La generación es determinista para (seed, tamaño, densidad, idioma): la línea base
+solo se compara sobre el mismo corpus.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+from typing import Dict, Iterator, Optional
+
+CATEGORIES = ("email", "phone", "id", "money", "gps", "contract", "client", "gs_uri", "filename")
+
+# Referencias internas que activan los kill switches (bloquean la respuesta entera)
+KILL_SWITCH_CATEGORIES = ("gs_uri", "filename", "client")
+
+CLIENT_NAMES = [
+    "BAVARIA", "RCI", "Cervecería Andina", "Hidroeléctrica del Sinú", "Textiles Medellín",
+    "Acueducto Regional del Norte", "Minera Los Andes", "Agroindustrias La Esperanza",
+    "Northwind Utilities", "Blue River Chemicals", "Orinoco Power", "Grupo Cementero Caribe",
+]
+
+DECOYS = [
+    "NTC 2050", "RETIE", "IEC 60364-5-54", "IEEE 80-2013", "ASME B31.3", "NFPA 70E", "ISO 50001",
+    "13.2 kV", "440 V", "34.5 kV", "125 m³/h", "2.5 mm²", "4/0 AWG", "60 Hz", "1.15 FS",
+    "NPSH 3.5 m", "IP65", "Clase 150", "DN 200", "Schedule 40", "IE3",
+]
+
+TECHNICAL = {
+    "es": [
+        "El diseño del sistema de puesta a tierra sigue {d} con una resistencia objetivo inferior a 10 ohmios.",
+        "La bomba centrífuga opera a {d} con un margen de cavitación adecuado para servicio continuo.",
+        "Se verificó la coordinación de protecciones del tablero principal conforme a {d}.",
+        "El conductor seleccionado para el alimentador es de {d} con aislamiento XLPE.",
+        "La caída de tensión calculada no supera el 3 % en los circuitos ramales según {d}.",
+        "El variador de frecuencia reduce el consumo energético del sistema de bombeo en un 18 %.",
+        "La tubería de descarga es {d} en acero al carbono con soportes cada 3 m.",
+        "El motor trifásico de eficiencia {d} trabaja con un factor de potencia de 0.88.",
+        "Las pruebas de aislamiento se realizaron con megóhmetro a 1000 V durante un minuto.",
+        "El análisis de armónicos muestra un THD de corriente dentro de los límites de {d}.",
+    ],
+    "en": [
+        "The grounding grid design follows {d} with a target resistance below 10 ohms.",
+        "The centrifugal pump runs at {d} with an adequate cavitation margin for continuous duty.",
+        "Protection coordination of the main switchboard was verified against {d}.",
+        "The feeder conductor is {d} with XLPE insulation rated for wet locations.",
+        "Calculated voltage drop stays under 3 % on branch circuits per {d}.",
+        "The variable frequency drive cuts pumping energy use by roughly 18 %.",
+        "Discharge piping is {d} carbon steel supported every 3 m.",
+        "The {d} premium-efficiency motor runs at a 0.88 power factor.",
+        "Insulation resistance tests used a 1000 V megohmmeter for one minute.",
+        "Harmonic analysis shows current THD within the limits of {d}.",
+    ],
+}
+
+ENTITY_SENTENCES = {
+    "es": {
+        "email": "Enviar observaciones a {v} antes del cierre.",
+        "phone": "Coordinación en sitio: {v}.",
+        "id": "Responsable de la firma: {v}.",
+        "money": "El presupuesto aprobado asciende a {v}.",
+        "gps": "La subestación se ubica en {v}.",
+        "contract": "Trabajo ejecutado bajo {v}.",
+        "client": "Proyecto desarrollado para {v} en la planta principal.",
+        "gs_uri": "Planos de referencia en {v}.",
+        "filename": "Ver el detalle en {v}.",
+    },
+    "en": {
+        "email": "Send comments to {v} before closing.",
+        "phone": "Site coordination: {v}.",
+        "id": "Signing engineer: {v}.",
+        "money": "The approved budget is {v}.",
+        "gps": "The substation is located at {v}.",
+        "contract": "Work performed under {v}.",
+        "client": "Project delivered for {v} at the main plant.",
+        "gs_uri": "Reference drawings at {v}.",
+        "filename": "See details in {v}.",
+    },
+}
+
+_FIRST = ["ana", "carlos", "maria", "jorge", "laura", "pedro", "sofia", "john", "emily", "david"]
+_LAST = ["gomez", "rodriguez", "martinez", "lopez", "smith", "garcia", "torres", "ramirez"]
+_DOMAINS = ["ingenieria.com.co", "example.com", "planta.co", "utility.org"]
+
+
+def _entity_value(category: str, rng: random.Random) -> str:
+    if category == "email":
+        return f"{rng.choice(_FIRST)}.{rng.choice(_LAST)}{rng.randint(1, 99)}@{rng.choice(_DOMAINS)}"
+    if category == "phone":
+        n = [rng.randint(300, 350), rng.randint(100, 999), rng.randint(1000, 9999)]
+        return rng.choice([
+            f"{n[0]}{n[1]}{n[2]}", f"{n[0]}-{n[1]}-{n[2]}", f"{n[0]} {n[1]} {n[2]}",
+            f"+57 {n[0]} {n[1]} {n[2]}", f"(601) {n[1]} {n[2]}",
+        ])
+    if category == "id":
+        return rng.choice([
+            f"C.C. {rng.randint(10_000_000, 1_199_999_999)}",
+            f"NIT 900.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(0, 9)}",
+            f"MP {rng.randint(10000, 99999)}-{rng.randint(100000, 999999)}",
+        ])
+    if category == "money":
+        millions = rng.randint(1, 950)
+        return rng.choice([
+            f"$ {millions}.{rng.randint(100, 999)}.000 COP",
+            f"USD {rng.randint(1, 999)},{rng.randint(100, 999)}.00",
+            f"COP {millions}.{rng.randint(100, 999)}.{rng.randint(100, 999)}",
+        ])
+    if category == "gps":
+        lat, lon = rng.uniform(-4, 12), rng.uniform(-79, -67)
+        return rng.choice([
+            f"{lat:.5f}, {lon:.5f}",
+            f"{int(abs(lat))}°{rng.randint(0, 59)}'{rng.randint(0, 59)}\"N {int(abs(lon))}°{rng.randint(0, 59)}'W",
+        ])
+    if category == "contract":
+        return rng.choice([
+            f"Contrato No. SEM-{rng.randint(2018, 2025)}-{rng.randint(1, 9999):04d}",
+            f"OC-{rng.randint(10000, 99999)}",
+            f"PO #{rng.randint(10000, 99999)}",
+        ])
+    if category == "client":
+        return rng.choice(CLIENT_NAMES)
+    if category == "gs_uri":
+        return f"gs://semhys-data-2025/proyectos/{rng.choice(_LAST)}_{rng.randint(1, 999)}/planos"
+    if category == "filename":
+        ext = rng.choice(["pdf", "docx", "xlsx", "pptx"])
+        return f"Memoria_Calculo_{rng.randint(1, 9999)}.{ext}"
+    raise ValueError(f"Categoría desconocida: {category}")
+
+
+def parse_size(size: str) -> int:
+    """'512KB', '10MB', '1.5GB' o bytes."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?B?)\s*", size.upper())
+    if not match:
+        raise ValueError(f"Tamaño inválido: {size}")
+    unit = {"": 1, "B": 1, "K": 1 << 10, "KB": 1 << 10, "M": 1 << 20, "MB": 1 << 20, "G": 1 << 30, "GB": 1 << 30}
+    return int(float(match.group(1)) * unit[match.group(2)])
+
+
+def generate_document(doc_id: str, rng: random.Random, doc_bytes: int, density: float, lang: str) -> Dict:
+    """
+    Un documento de ~doc_bytes con 'density' entidades por KB (0 = documento limpio).
+    Tres oraciones por línea, párrafos separados por línea en blanco.
+    """
+    lines, sentences, entities, decoys = [], [], [], []
+    size = 0
+    while size < doc_bytes:
+        language = rng.choice(("es", "en")) if lang == "mix" else lang
+        if density and rng.random() < density * 120 / 1024:
+            category = rng.choice(CATEGORIES)
+            value = _entity_value(category, rng)
+            sentence = ENTITY_SENTENCES[language][category].format(v=value)
+            entities.append({"category": category, "value": value})
+        else:
+            template = rng.choice(TECHNICAL[language])
+            decoy = rng.choice(DECOYS)
+            sentence = template.format(d=decoy)
+            if "{d}" in template:
+                decoys.append(decoy)
+        sentences.append(sentence)
+        size += len(sentence.encode("utf-8")) + 1
+        if len(sentences) == 3:
+            lines.append(" ".join(sentences))
+            sentences = []
+            if rng.random() < 0.25:
+                lines.append("")
+    if sentences:
+        lines.append(" ".join(sentences))
+    return {"id": doc_id, "text": "\n".join(lines), "entities": entities, "decoys": decoys}
+
+
+def generate(path: str, size_bytes: int, density: float = 2.0, seed: int = 7, lang: str = "mix",
+             clean_ratio: float = 0.3, doc_bytes: int = 4096) -> Dict:
+    """
+    Escribe el corpus en 'path' (JSONL) sin tenerlo entero en memoria, y su firma
+    en '<path>.meta.json'. Devuelve la firma.
+    """
+    rng = random.Random(seed)
+    written, count = 0, 0
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        while written < size_bytes:
+            doc_density = 0 if rng.random() < clean_ratio else density
+            doc = generate_document(f"doc-{count:07d}", rng, min(doc_bytes, size_bytes - written), doc_density, lang)
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            written += len(doc["text"].encode("utf-8"))
+            count += 1
+    signature = corpus_signature(size_bytes, density, seed, lang, clean_ratio, doc_bytes)
+    with open(f"{path}.meta.json", "w", encoding="utf-8") as f:
+        json.dump(signature, f)
+    return signature
+
+
+def corpus_signature(size_bytes: int, density: float, seed: int, lang: str, clean_ratio: float, doc_bytes: int) -> Dict:
+    return {
+        "size_bytes": size_bytes, "density": density, "seed": seed, "lang": lang,
+        "clean_ratio": clean_ratio, "doc_bytes": doc_bytes,
+    }
+
+
+def load_signature(path: str) -> Optional[Dict]:
+    try:
+        with open(f"{path}.meta.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def iter_corpus(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera el corpus sintético de PII/redacción")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--size", default="10MB", help="Tamaño del texto: 512KB, 10MB, 300MB...")
+    parser.add_argument("--density", type=float, default=2.0, help="Entidades sembradas por KB")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--lang", choices=["es", "en", "mix"], default="mix")
+    parser.add_argument("--clean-ratio", type=float, default=0.3, help="Fracción de documentos sin entidades")
+    parser.add_argument("--doc-kb", type=float, default=4, help="Tamaño de cada documento (KB)")
+    args = parser.parse_args()
+
+    signature = generate(
+        args.output, parse_size(args.size), args.density, args.seed, args.lang,
+        args.clean_ratio, int(args.doc_kb * 1024)
+    )
+    print(f"✅ Corpus generado en {args.output}: {json.dumps(signature)}")
+
+
+if __name__ == "__main__":
+    main()
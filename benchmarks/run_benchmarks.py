@@ -0,0 +1,251 @@
+"""
+Benchmark de rendimiento de los pipelines V3 y V4 sobre fixtures grabadas (record/replay).
+
+Grabar las fixtures y la línea base (una vez, con credenciales de GCP):
+    python benchmarks/run_benchmarks.py --record --update-baseline
+
+Chequeo opcional: no lo ejecuta ningún camino por defecto (pytest, arranque, despliegue)
+y el repositorio no incluye fixtures grabadas, porque grabarlas requiere GCP. Sin
+fixtures o sin línea base avisa y sale con código 0; --require-fixtures lo convierte
+en error (para activarlo en CI una vez grabadas).
+
+Reproducir offline y comparar con la línea base (sale con código 1 si hay regresión
+o si algún pipeline no se pudo medir):
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --require-fixtures   # falla si faltan fixtures/línea base
+    python benchmarks/run_benchmarks.py --latency 0          # solo CPU, sin latencia simulada
+    python benchmarks/run_benchmarks.py --pipelines v4 --scale 0.5
+
+Las métricas salen de las trazas (agents/v3/tracing.py): duración total, tiempo por
+span/etapa, número de llamadas LLM y de búsqueda, y tokens.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+sys.path.insert(0, ROOT)
+
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gen-lang-client-0585991170")
+
+V4_TOPIC = "Energy efficiency in hydraulic pumping systems"
+
+V3_TOPIC = "Cavitación en bombas centrífugas"
+V3_SOURCES = [
+    {
+        "title": "Cavitation in centrifugal pumps: causes and NPSH margins",
+        "url": "https://www.pumpsandsystems.com/cavitation-centrifugal-pumps",
+        "date": "2023",
+        "snippet": "Cavitation occurs when the NPSH available falls below the NPSH required. "
+                   "A margin of 1.1 to 1.3 is recommended for most water services."
+    },
+    {
+        "title": "ANSI/HI 9.6.1 Rotodynamic Pumps Guideline for NPSH Margin",
+        "url": "https://www.pumps.org/standards/9-6-1",
+        "date": "2017",
+        "snippet": "Recommended NPSH margin ratios by application and suction energy level."
+    },
+    {
+        "title": "Efficiency losses from cavitation damage",
+        "url": "https://doi.org/10.1016/j.energy.2022.123456",
+        "date": "2022",
+        "snippet": "Impeller erosion from sustained cavitation reduced hydraulic efficiency by 3-5%."
+    }
+]
+
+# Tolerancia absoluta para tiempos muy pequeños (ms)
+ABSOLUTE_SLACK_MS = 50.0
+
+
+def configure_environment(args, workdir: str):
+    """Modo replay/record y estado aislado (cachés, historial, trazas) en un directorio temporal."""
+    os.environ["REPLAY_MODE"] = "record" if args.record else "replay"
+    os.environ.setdefault("REPLAY_FIXTURES_DIR", os.path.join(BENCH_DIR, "fixtures"))
+    os.environ["REPLAY_LATENCY_MS"] = args.latency
+    os.environ["REPLAY_LATENCY_SCALE"] = str(args.scale)
+    os.environ["TRACING_ENABLED"] = "1"
+    os.environ["TRACE_EXPORT_PATH"] = os.path.join(workdir, "traces.jsonl")
+    os.environ["STAGE_CACHE_DIR"] = os.path.join(workdir, "stage_cache")
+    os.environ["TREND_STORE_PATH"] = os.path.join(workdir, "trend_store.db")
+    os.environ["SANITIZE_CACHE_PATH"] = os.path.join(workdir, "sanitize_cache.db")
+    os.environ["AUDIT_STORE_PATH"] = os.path.join(workdir, "audit_store.db")
+
+
+def run_v4():
+    from agents.v3.orchestrator_v4 import AgentOrchestrator
+    orchestrator = AgentOrchestrator(project_id=PROJECT_ID)
+    result = orchestrator.run_pipeline(manual_topic=V4_TOPIC, save_output=False, force=True)
+    return result.get("status")
+
+
+def run_agent1_scan():
+    from agents.v3.agent_1_market_intelligence import MarketIntelligenceAgent
+    agent = MarketIntelligenceAgent(PROJECT_ID, early_exit_score=None)
+    result = agent.select_top_topic()
+    return "success" if result.get("selected_topic") else "empty"
+
+
+def run_v3():
+    from agents.v3.orchestrator import BloggerV3Agent
+    result = BloggerV3Agent().run_pipeline(V3_TOPIC, V3_SOURCES)
+    return "error" if result.get("error") else "success"
+
+
+PIPELINES = {
+    "v4": run_v4,
+    "agent1_scan": run_agent1_scan,
+    "v3": run_v3,
+}
+
+
+def measure(name: str, trace_path: str) -> dict:
+    from agents.v3 import tracing
+    runner = PIPELINES[name]
+
+    started = time.monotonic()
+    try:
+        with tracing.span(f"benchmark.{name}") as root:
+            status = runner()
+    except ImportError as e:
+        return {"status": "skipped", "reason": f"dependencia no disponible: {e}"}
+    except Exception as e:
+        return {"status": "error", "reason": str(e)}
+    wall_ms = round((time.monotonic() - started) * 1000, 1)
+
+    spans = [s for s in tracing.load_spans(trace_path) if s["trace_id"] == root.trace_id]
+    llm_spans = [s for s in spans if s["name"] == "llm.generate"]
+    stages = {
+        row["name"]: {"count": row["count"], "total_ms": round(row["total_s"] * 1000, 1)}
+        for row in tracing.aggregate(spans) if not row["name"].startswith("benchmark.")
+    }
+    return {
+        "status": status,
+        "wall_ms": wall_ms,
+        "llm_calls": len(llm_spans),
+        "search_calls": sum(1 for s in spans if s["name"] == "vertex.search"),
+        "tokens": sum(s["attributes"].get("total_tokens") or 0 for s in llm_spans),
+        # Incluye fixtures ausentes (ReplayMiss): los agentes capturan la excepción y siguen
+        "span_errors": sum(1 for s in spans if s["status"] != "ok"),
+        "stages": stages
+    }
+
+
+def has_fixtures(path: str) -> bool:
+    return any(name.endswith(".json") for _, _, files in os.walk(path) for name in files)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regresiones: tiempos por encima de la tolerancia o más llamadas/tokens que la línea base.
+    Un pipeline sin medir (skipped/error) o sin línea base también cuenta: el chequeo no lo cubre.
+    """
+    problems = []
+    for name, metrics in current.items():
+        base = baseline.get(name)
+        if metrics.get("status") in ("skipped", "error"):
+            problems.append(f"{name}: {metrics['status']} ({metrics.get('reason', '')})")
+            continue
+        if not base or "wall_ms" not in base:
+            problems.append(f"{name}: sin línea base (ejecutar con --record --update-baseline)")
+            continue
+
+        def slower(now_ms, base_ms):
+            return now_ms > base_ms * (1 + tolerance) + ABSOLUTE_SLACK_MS
+
+        if slower(metrics["wall_ms"], base["wall_ms"]):
+            problems.append(f"{name}: wall {metrics['wall_ms']}ms > {base['wall_ms']}ms")
+        for counter in ("llm_calls", "search_calls", "tokens", "span_errors"):
+            if metrics[counter] > base.get(counter, 0):
+                problems.append(f"{name}: {counter} {metrics[counter]} > {base.get(counter, 0)}")
+        for stage, stats in metrics["stages"].items():
+            base_stage = base.get("stages", {}).get(stage)
+            if base_stage and slower(stats["total_ms"], base_stage["total_ms"]):
+                problems.append(f"{name}/{stage}: {stats['total_ms']}ms > {base_stage['total_ms']}ms")
+    return problems
+
+
+def print_report(results: dict, baseline: dict):
+    for name, metrics in results.items():
+        print(f"\n=== {name} ({metrics['status']})")
+        if "wall_ms" not in metrics:
+            print(f"    {metrics.get('reason', '')}")
+            continue
+        base = baseline.get(name, {})
+        print(f"    wall: {metrics['wall_ms']} ms (base {base.get('wall_ms', '-')})")
+        print(
+            f"    llm_calls: {metrics['llm_calls']}  search_calls: {metrics['search_calls']}  "
+            f"tokens: {metrics['tokens']}  span_errors: {metrics['span_errors']}"
+        )
+        for stage, stats in sorted(metrics["stages"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+            base_ms = base.get("stages", {}).get(stage, {}).get("total_ms", "-")
+            print(f"    {stage:<40} n={stats['count']:<4} {stats['total_ms']:>10} ms  (base {base_ms})")
+
+
+def skip(args, reason: str):
+    """Chequeo no disponible: error solo con --require-fixtures."""
+    if args.require_fixtures:
+        print(f"\n❌ {reason}")
+        sys.exit(1)
+    print(f"\n⏭️ Benchmark omitido. {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de pipelines SEMHYS (record/replay)")
+    parser.add_argument("--pipelines", nargs="+", choices=list(PIPELINES), default=list(PIPELINES))
+    parser.add_argument("--record", action="store_true", help="Llamadas reales + grabar fixtures")
+    parser.add_argument("--latency", default="recorded", help="'recorded' o latencia fija en ms (replay)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador de la latencia simulada")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Regresión permitida en tiempos (0.2 = 20%%)")
+    parser.add_argument("--require-fixtures", action="store_true",
+                        help="Código 1 si faltan las fixtures o la línea base (por defecto se omite el chequeo)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="semhys_bench_")
+    configure_environment(args, workdir)
+
+    fixtures = os.environ["REPLAY_FIXTURES_DIR"]
+    if not args.record and not has_fixtures(fixtures):
+        # En replay cada llamada fallaría con ReplayMiss: los números no significarían nada
+        skip(args, f"Sin fixtures en {fixtures}: grabarlas con --record --update-baseline (requiere GCP)")
+        return
+
+    results = {name: measure(name, os.environ["TRACE_EXPORT_PATH"]) for name in args.pipelines}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print_report(results, baseline)
+
+    if args.update_baseline:
+        baseline.update({k: v for k, v in results.items() if v.get("status") not in ("skipped", "error")})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"\n💾 Línea base actualizada: {args.baseline}")
+        return
+
+    if not baseline:
+        skip(args, f"Sin línea base en {args.baseline}: ejecutar con --record --update-baseline")
+        return
+
+    problems = compare(results, baseline, args.tolerance)
+    if problems:
+        print("\n❌ Regresiones o pipelines sin medir:")
+        for problem in problems:
+            print(f"    {problem}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Benchmark de redacción: throughput (MB/s) y completitud (precisión/recall) sobre el
+corpus sintético de benchmarks/redaction_corpus.py.
+
+    python benchmarks/run_redaction_benchmark.py --size 20MB --update-baseline
+    python benchmarks/run_redaction_benchmark.py --size 20MB                 # compara (código 1 si hay regresión)
+    python benchmarks/run_redaction_benchmark.py --corpus /tmp/pii_300mb.jsonl --targets redact_text_strict
+
+Objetivos medidos:
+  - redact_text_strict / redact_text_standard: semhys-agents/app/services/redaction.py
+  - privacy_guardian: PrivacyGuardianAgent._sanitize_text (modo replay, sin credenciales)
+  - kill_switch: kill_switch_scan por documento (detección, no redacción)
+
+Métricas de texto: una entidad sembrada cuenta como capturada si su valor ya no aparece
+literal en la salida; un señuelo técnico (norma, tensión, calibre...) destruido cuenta
+como falso positivo. clean_modified_pct: documentos sin entidades que salen modificados.
+El kill switch se mide por documento: ¿se bloquea si y solo si contiene referencias internas?
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "redaction_baseline.json")
+
+# semhys-agents primero: su paquete "app" no debe confundirse con app.py de la raíz
+sys.path.insert(0, os.path.join(ROOT, "semhys-agents"))
+sys.path.insert(0, BENCH_DIR)
+sys.path.append(ROOT)
+
+import redaction_corpus  # noqa: E402
+from redaction_corpus import CATEGORIES, CLIENT_NAMES, KILL_SWITCH_CATEGORIES, iter_corpus  # noqa: E402
+
+PROJECT_ID = os.getenv("GCP_PROJECT_ID", "gen-lang-client-0585991170")
+
+# Caída permitida de precisión/recall antes de considerarla regresión
+QUALITY_SLACK = 0.0005
+
+
+def configure_environment(workdir: str, blocklist: Optional[str]):
+    """Estado aislado: sin cachés ni almacén de auditoría, lista de bloqueo del corpus."""
+    if not blocklist:
+        blocklist = os.path.join(workdir, "client_blocklist.txt")
+        with open(blocklist, "w", encoding="utf-8") as f:
+            f.write("\n".join(CLIENT_NAMES) + "\n")
+    os.environ["CLIENT_BLOCKLIST_PATH"] = blocklist
+    os.environ["SANITIZE_CACHE_ENABLED"] = "0"
+    os.environ["AUDIT_STORE_ENABLED"] = "0"
+    os.environ["REPLAY_MODE"] = "replay"
+    os.environ["TRACING_ENABLED"] = "0"
+
+
+def target_redact_strict() -> Callable[[str], str]:
+    from app.services.redaction import redact_text
+    return lambda text: redact_text(text, mode="strict")
+
+
+def target_redact_standard() -> Callable[[str], str]:
+    from app.services.redaction import redact_text
+    return lambda text: redact_text(text, mode="standard")
+
+
+def target_privacy_guardian() -> Callable[[str], str]:
+    from agents.v3.agent_2_privacy_guardian import PrivacyGuardianAgent
+    return PrivacyGuardianAgent(PROJECT_ID)._sanitize_text
+
+
+def target_kill_switch() -> Callable[[str], List[str]]:
+    from app.services.redaction import kill_switch_scan
+    return kill_switch_scan
+
+
+# Objetivo -> (constructor, tipo de medida)
+TARGETS = {
+    "redact_text_strict": (target_redact_strict, "text"),
+    "redact_text_standard": (target_redact_standard, "text"),
+    "privacy_guardian": (target_privacy_guardian, "text"),
+    "kill_switch": (target_kill_switch, "detect"),
+}
+
+
+def _timed_pass(fn: Callable, corpus: str, score: Optional[Callable]) -> float:
+    elapsed = 0.0
+    for doc in iter_corpus(corpus):
+        started = time.perf_counter()
+        output = fn(doc["text"])
+        elapsed += time.perf_counter() - started
+        if score:
+            score(doc, output)
+    return elapsed
+
+
+def measure_text(fn: Callable[[str], str], corpus: str, repeat: int) -> Dict:
+    planted, caught = Counter(), Counter()
+    stats = {"bytes": 0, "decoys": 0, "decoys_destroyed": 0, "clean": 0, "clean_modified": 0}
+
+    def score(doc: Dict, output: str):
+        stats["bytes"] += len(doc["text"].encode("utf-8"))
+        values = Counter((e["category"], e["value"]) for e in doc["entities"])
+        for (category, value), n in values.items():
+            planted[category] += n
+            caught[category] += n - min(n, output.count(value))
+        for decoy, n in Counter(doc["decoys"]).items():
+            stats["decoys"] += n
+            stats["decoys_destroyed"] += max(0, n - output.count(decoy))
+        if not doc["entities"]:
+            stats["clean"] += 1
+            stats["clean_modified"] += output != doc["text"]
+
+    elapsed = min([_timed_pass(fn, corpus, score)] + [_timed_pass(fn, corpus, None) for _ in range(repeat - 1)])
+    total_planted, total_caught = sum(planted.values()), sum(caught.values())
+    return {
+        "status": "success",
+        "mb": round(stats["bytes"] / 1e6, 2),
+        "seconds": round(elapsed, 3),
+        "mb_s": round(stats["bytes"] / 1e6 / elapsed, 2) if elapsed else None,
+        "recall": round(total_caught / total_planted, 4) if total_planted else None,
+        "precision": round(total_caught / (total_caught + stats["decoys_destroyed"]), 4) if total_caught else None,
+        "decoys_destroyed": stats["decoys_destroyed"],
+        "clean_modified_pct": round(100 * stats["clean_modified"] / stats["clean"], 2) if stats["clean"] else None,
+        "recall_by_category": {
+            c: round(caught[c] / planted[c], 4) for c in CATEGORIES if planted[c]
+        },
+    }
+
+
+def measure_detect(fn: Callable[[str], List[str]], corpus: str, repeat: int) -> Dict:
+    counts = Counter()
+    by_category, planted = Counter(), Counter()
+    size = {"bytes": 0}
+
+    def score(doc: Dict, blocked: List[str]):
+        size["bytes"] += len(doc["text"].encode("utf-8"))
+        categories = {e["category"] for e in doc["entities"]} & set(KILL_SWITCH_CATEGORIES)
+        positive, flagged = bool(categories), bool(blocked)
+        counts["tp" if positive and flagged else "fp" if flagged else "fn" if positive else "tn"] += 1
+        for category in categories:
+            planted[category] += 1
+            by_category[category] += flagged
+
+    elapsed = min([_timed_pass(fn, corpus, score)] + [_timed_pass(fn, corpus, None) for _ in range(repeat - 1)])
+    return {
+        "status": "success",
+        "mb": round(size["bytes"] / 1e6, 2),
+        "seconds": round(elapsed, 3),
+        "mb_s": round(size["bytes"] / 1e6 / elapsed, 2) if elapsed else None,
+        "recall": round(counts["tp"] / (counts["tp"] + counts["fn"]), 4) if counts["tp"] + counts["fn"] else None,
+        "precision": round(counts["tp"] / (counts["tp"] + counts["fp"]), 4) if counts["tp"] + counts["fp"] else None,
+        "documents": dict(counts),
+        "recall_by_category": {c: round(by_category[c] / planted[c], 4) for c in KILL_SWITCH_CATEGORIES if planted[c]},
+    }
+
+
+def measure(name: str, corpus: str, repeat: int) -> Dict:
+    build, kind = TARGETS[name]
+    try:
+        fn = build()
+    except ImportError as e:
+        return {"status": "skipped", "reason": f"dependencia no disponible: {e}"}
+    measure_fn = measure_text if kind == "text" else measure_detect
+    return measure_fn(fn, corpus, repeat)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regresiones: throughput por debajo de la tolerancia o pérdida de precisión/recall."""
+    problems = []
+    for name, metrics in current.items():
+        base = baseline.get(name)
+        if not base or metrics.get("status") != "success":
+            continue
+        if base.get("mb_s") and metrics["mb_s"] < base["mb_s"] * (1 - tolerance):
+            problems.append(f"{name}: {metrics['mb_s']} MB/s < {base['mb_s']} MB/s")
+        for metric in ("recall", "precision"):
+            now, before = metrics.get(metric), base.get(metric)
+            if now is not None and before is not None and now < before - QUALITY_SLACK:
+                problems.append(f"{name}: {metric} {now} < {before}")
+        now, before = metrics.get("clean_modified_pct"), base.get("clean_modified_pct")
+        if now is not None and before is not None and now > before + 100 * QUALITY_SLACK:
+            problems.append(f"{name}: clean_modified_pct {now}% > {before}%")
+        for category, before in base.get("recall_by_category", {}).items():
+            now = metrics.get("recall_by_category", {}).get(category)
+            if now is not None and now < before - QUALITY_SLACK:
+                problems.append(f"{name}/{category}: recall {now} < {before}")
+    return problems
+
+
+def print_report(results: Dict, baseline: Dict):
+    for name, metrics in results.items():
+        print(f"\n=== {name} ({metrics['status']})")
+        if metrics["status"] != "success":
+            print(f"    {metrics.get('reason', '')}")
+            continue
+        base = baseline.get(name, {})
+        print(f"    {metrics['mb']} MB en {metrics['seconds']} s -> {metrics['mb_s']} MB/s (base {base.get('mb_s', '-')})")
+        print(
+            f"    recall: {metrics['recall']} (base {base.get('recall', '-')})  "
+            f"precision: {metrics['precision']} (base {base.get('precision', '-')})"
+        )
+        if "clean_modified_pct" in metrics:
+            print(
+                f"    señuelos destruidos: {metrics['decoys_destroyed']}  "
+                f"documentos limpios modificados: {metrics['clean_modified_pct']}%"
+            )
+        if "documents" in metrics:
+            print(f"    documentos: {metrics['documents']}")
+        for category, value in metrics["recall_by_category"].items():
+            base_value = base.get("recall_by_category", {}).get(category, "-")
+            print(f"    {category:<12} recall {value:<8} (base {base_value})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de redacción (throughput y precisión/recall)")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--corpus", help="Corpus JSONL existente (o ruta donde generarlo si no existe)")
+    parser.add_argument("--size", default="10MB", help="Tamaño del corpus generado: 512KB, 10MB, 300MB...")
+    parser.add_argument("--density", type=float, default=2.0, help="Entidades sembradas por KB")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--lang", choices=["es", "en", "mix"], default="mix")
+    parser.add_argument("--blocklist", help="Lista de bloqueo (por defecto: los clientes del corpus)")
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas por objetivo (se toma la más rápida)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Caída de MB/s permitida (0.2 = 20%%)")
+    parser.add_argument("--json", help="Escribe los resultados en este archivo")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="semhys_redaction_bench_")
+    configure_environment(workdir, args.blocklist)
+
+    corpus = args.corpus or os.path.join(workdir, "corpus.jsonl")
+    if os.path.exists(corpus):
+        signature = redaction_corpus.load_signature(corpus)
+    else:
+        print(f"🧪 Generando corpus ({args.size}, {args.density} entidades/KB) en {corpus}")
+        signature = redaction_corpus.generate(
+            corpus, redaction_corpus.parse_size(args.size), args.density, args.seed, args.lang
+        )
+
+    results = {name: measure(name, corpus, max(1, args.repeat)) for name in args.targets}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    same_corpus = signature is not None and baseline.get("corpus") == signature
+
+    print(f"\n📚 Corpus: {json.dumps(signature)}")
+    print_report(results, baseline.get("targets", {}) if same_corpus else {})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus": signature, "targets": results}, f, indent=2, ensure_ascii=False)
+
+    if args.update_baseline:
+        targets = baseline.get("targets", {}) if same_corpus else {}
+        targets.update({k: v for k, v in results.items() if v.get("status") == "success"})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"corpus": signature, "targets": targets}, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"\n💾 Línea base actualizada: {args.baseline}")
+        return
+
+    if not baseline:
+        print("\n⚠️ Sin línea base: ejecutar con --update-baseline")
+        return
+    if not same_corpus:
+        print("\n⚠️ La línea base es de otro corpus (seed/tamaño/densidad): no se compara")
+        return
+
+    problems = compare(results, baseline["targets"], args.tolerance)
+    if problems:
+        print("\n❌ Regresiones:")
+        for problem in problems:
+            print(f"    {problem}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
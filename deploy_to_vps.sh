@@ -12,6 +12,9 @@ echo "=========================================="
 PROJECT_DIR="/opt/semhys-agents"
 VENV_DIR="$PROJECT_DIR/venv"
 SERVICE_NAME="semhys-api"
+# Servidor de la API: "asgi" (api_asgi.py, uvicorn) o "gunicorn" (api_wrapper.py, Flask).
+# Solo ASGI cancela la ejecución cuando el cliente se desconecta.
+API_SERVER="${API_SERVER:-asgi}"
 
 # Colores
 GREEN='\033[0;32m'
@@ -34,14 +37,15 @@ source $VENV_DIR/bin/activate
 echo -e "${YELLOW}4. Instalando dependencias de Python...${NC}"
 pip install --upgrade pip
 pip install vertexai google-cloud-discoveryengine google-cloud-storage \
-    google-auth google-api-python-client flask flask-cors gunicorn
+    google-auth google-api-python-client flask flask-cors gunicorn \
+    fastapi "uvicorn[standard]" orjson brotli
 
 echo -e "${YELLOW}5. Copiando archivos del proyecto...${NC}"
 # Los archivos ya deben estar en el directorio (subidos vía SCP o Git)
-if [ ! -f "$PROJECT_DIR/api_wrapper.py" ]; then
+if [ ! -f "$PROJECT_DIR/api_wrapper.py" ] || [ ! -f "$PROJECT_DIR/response_encoding.py" ]; then
     echo -e "${RED}ERROR: Archivos no encontrados en $PROJECT_DIR${NC}"
     echo "Por favor, sube los archivos primero usando:"
-    echo "scp -r agents/ api_wrapper.py .env.agents root@76.13.116.120:$PROJECT_DIR/"
+    echo "scp -r agents/ api_wrapper.py api_asgi.py agent_service.py job_queue.py response_encoding.py ingest_sanitized.py gunicorn.conf.py .env.agents root@76.13.116.120:$PROJECT_DIR/"
     exit 1
 fi
 
@@ -51,7 +55,13 @@ if [ ! -f "$PROJECT_DIR/.env" ]; then
     echo -e "${YELLOW}IMPORTANTE: Edita $PROJECT_DIR/.env con tus credenciales${NC}"
 fi
 
-echo -e "${YELLOW}7. Creando servicio systemd...${NC}"
+echo -e "${YELLOW}7. Creando servicio systemd ($API_SERVER)...${NC}"
+if [ "$API_SERVER" = "asgi" ]; then
+    # Un proceso atiende muchas peticiones concurrentes; al parar drena las ejecuciones en curso
+    EXEC_START="$VENV_DIR/bin/uvicorn api_asgi:app --host 0.0.0.0 --port 8080 --workers 2 --timeout-graceful-shutdown 60"
+else
+    EXEC_START="$VENV_DIR/bin/gunicorn --config $PROJECT_DIR/gunicorn.conf.py --bind 0.0.0.0:8080 --workers 2 --threads 8 --timeout 300 api_wrapper:app"
+fi
 sudo tee /etc/systemd/system/$SERVICE_NAME.service > /dev/null <<EOF
 [Unit]
 Description=SEMHYS Agents API
@@ -63,9 +73,11 @@ User=$USER
 WorkingDirectory=$PROJECT_DIR
 Environment="PATH=$VENV_DIR/bin"
 EnvironmentFile=$PROJECT_DIR/.env
-ExecStart=$VENV_DIR/bin/gunicorn --bind 0.0.0.0:8080 --workers 2 --timeout 300 api_wrapper:app
+ExecStart=$EXEC_START
 Restart=always
 RestartSec=10
+# Margen para el drenado ordenado (ASGI_DRAIN_SECONDS + timeout-graceful-shutdown)
+TimeoutStopSec=150
 
 [Install]
 WantedBy=multi-user.target
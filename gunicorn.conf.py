@@ -0,0 +1,21 @@
+"""
+Configuración de gunicorn para api_wrapper (se carga desde el directorio de trabajo).
+
+Cada worker inicializa su pool de agentes al arrancar, antes de aceptar peticiones:
+las peticiones no pagan vertexai.init, modelos ni clientes de Discovery Engine.
+También arranca los workers de la cola: los trabajos pendientes de un proceso
+anterior se retoman sin esperar a la primera petición.
+"""
+
+import logging
+
+
+def post_worker_init(worker):
+    from agent_service import agent_pool, job_queue
+
+    job_queue.start()
+    try:
+        agent_pool.start()
+    except Exception as e:
+        # Sin agentes calientes el worker sigue sirviendo: el pool se reintenta en la primera petición
+        logging.getLogger("agent_api").error(f"❌ No se pudo inicializar el pool de agentes: {e}")
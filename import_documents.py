@@ -8,8 +8,13 @@ DATA_STORE_ID = "semhys-investigacion"
 # Importante: Usar wildcard para todos los PDFs
 GCS_URI = "gs://semhys-data-2025/*" # IMPORTAR TODO (Cualquier extensión) 
 
-def import_documents():
-    print(f"🚀 Iniciando importación para: {DATA_STORE_ID}")
+def import_documents(input_uri: str = GCS_URI, data_schema: str = "content"):
+    """
+    data_schema="content": documentos no estructurados (PDFs) tal cual.
+    data_schema="document": JSONL de documentos, p. ej. el espejo sanitizado de
+    ingest_sanitized.py (documents.jsonl, subido al bucket).
+    """
+    print(f"🚀 Iniciando importación para: {DATA_STORE_ID} ({input_uri})")
     
     client_options = (
         ClientOptions(api_endpoint=f"{LOCATION}-discoveryengine.googleapis.com")
@@ -23,8 +28,8 @@ def import_documents():
     request = discoveryengine.ImportDocumentsRequest(
         parent=parent,
         gcs_source=discoveryengine.GcsSource(
-            input_uris=[GCS_URI],
-            data_schema="content" # Esquema para documentos no estructurados (PDFs)
+            input_uris=[input_uri],
+            data_schema=data_schema
         ),
         reconciliation_mode=discoveryengine.ImportDocumentsRequest.ReconciliationMode.INCREMENTAL
     )
@@ -49,4 +54,9 @@ def import_documents():
         print(f"❌ Error en la importación: {e}")
 
 if __name__ == "__main__":
-    import_documents()
+    import sys
+    if len(sys.argv) > 1:
+        # Espejo sanitizado: python import_documents.py gs://<bucket>/<espejo>/documents.jsonl
+        import_documents(sys.argv[1], data_schema="document")
+    else:
+        import_documents()
@@ -0,0 +1,291 @@
+r"""
+Ingesta sanitizada: espejo pre-redactado y troceado del corpus para la búsqueda.
+
+Lee el corpus fuente (un directorio local como sustituto del bucket de GCS), aplica en
+procesos paralelos las mismas reglas que el Guardián de Privacidad (redacción, palabras
+clave, lista de bloqueo de clientes y descarte de fragmentos sin contenido técnico) y
+escribe un espejo sanitizado:
+
+    <salida>/chunks/<doc_id>/<n>.txt   texto sanitizado de cada fragmento
+    <salida>/documents.jsonl           documentos para Discovery Engine (data_schema="document")
+    <salida>/violations.jsonl          violaciones por fragmento (sin el texto original)
+    <salida>/manifest.json             estado incremental: hash de la fuente + versión de reglas
+
+violations.jsonl y manifest.json conservan las rutas de origen (pueden nombrar clientes):
+se quedan en local y no se suben con el espejo.
+
+Uso:
+    python ingest_sanitized.py --source ./corpus --output ./pipeline_outputs/sanitized_mirror \
+        --mirror-uri gs://semhys-data-sanitized/mirror
+    gsutil -m rsync -r -x 'manifest\.json$|violations\.jsonl$' ./pipeline_outputs/sanitized_mirror \
+        gs://semhys-data-sanitized/mirror
+    python import_documents.py gs://semhys-data-sanitized/mirror/documents.jsonl
+
+En consulta, Agent 2 reconoce los fragmentos del espejo (struct_data.sanitized) y solo
+ejecuta una verificación (RedactionEngine.is_clean) en lugar de la sanitización completa.
+Los documentos ya ingeridos con la misma versión de reglas se reutilizan del manifiesto.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from agents.v3.redaction import get_engine
+
+RULE_SET = "privacy_guardian"
+
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".json"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+
+# Tamaño objetivo de cada fragmento (caracteres) y mínimo de contenido técnico tras sanitizar
+# (el mismo umbral que Agent 2 usa para descartar documentos)
+CHUNK_CHARS = 2000
+MIN_TECHNICAL_CHARS = 50
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def doc_id_for(rel_path: str) -> str:
+    """Id estable y válido para Discovery Engine ([a-zA-Z0-9-_], máx. 63)."""
+    return "doc-" + hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:24]
+
+
+def read_text(path: str) -> Optional[str]:
+    """Texto del archivo, o None si el formato no está soportado en este entorno."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TEXT_EXTENSIONS or ext in HTML_EXTENSIONS:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        return _TAG_RE.sub(" ", text) if ext in HTML_EXTENSIONS else text
+    if ext in PDF_EXTENSIONS:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return None
+        reader = PdfReader(path)
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    return None
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Fragmentos por párrafos de hasta ~max_chars (un párrafo más largo se parte por líneas)."""
+    chunks, current = [], ""
+    for paragraph in _PARAGRAPH_SPLIT_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph]
+        if len(paragraph) > max_chars:
+            pieces, piece = [], ""
+            for line in paragraph.split("\n"):
+                if piece and len(piece) + len(line) + 1 > max_chars:
+                    pieces.append(piece)
+                    piece = ""
+                piece = f"{piece}\n{line}" if piece else line
+            if piece:
+                pieces.append(piece)
+        for piece in pieces:
+            if current and len(current) + len(piece) + 2 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def process_file(task: Dict) -> Dict:
+    """
+    Trabajo de un proceso: lee, trocea y sanitiza un documento.
+    Devuelve los fragmentos sanitizados y sus metadatos (nunca el texto original).
+    """
+    engine = get_engine(RULE_SET)
+    rel_path = task["rel_path"]
+    result = {
+        "rel_path": rel_path,
+        "doc_id": doc_id_for(rel_path),
+        "source_hash": task["source_hash"],
+        "ruleset_version": engine.version,
+        "chunks": [],
+        "rejected_chunks": 0,
+        "error": None,
+    }
+    try:
+        text = read_text(task["path"])
+    except Exception as e:
+        result["error"] = f"lectura fallida: {e}"
+        return result
+    if text is None:
+        result["error"] = "formato no soportado"
+        return result
+
+    # El título (nombre de archivo) también pasa por las reglas: puede contener clientes o proyectos
+    stem = os.path.splitext(os.path.basename(rel_path))[0].replace("_", " ")
+    title = engine.scan(stem).text.strip() or "Documento técnico"
+    parts = rel_path.replace("\\", "/").split("/")
+
+    for index, chunk in enumerate(chunk_text(text)):
+        scan = engine.scan(chunk)
+        if len(scan.text.strip()) < MIN_TECHNICAL_CHARS:
+            result["rejected_chunks"] += 1
+            continue
+        result["chunks"].append({
+            "index": index,
+            "text": scan.text,
+            "violations": scan.violations,
+            "lines_removed": len(scan.removed_lines),
+        })
+    result["title"] = title
+    result["discipline"] = parts[0] if len(parts) > 1 else "general"
+    result["doc_type"] = os.path.splitext(rel_path)[1].lstrip(".").lower() or "unknown"
+    return result
+
+
+def discover(source: str) -> List[Dict]:
+    tasks = []
+    supported = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in supported:
+                continue
+            tasks.append({
+                "path": path,
+                "rel_path": os.path.relpath(path, source).replace(os.sep, "/"),
+            })
+    return tasks
+
+
+def _write_text(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def document_records(entry: Dict, mirror_uri: str) -> List[Dict]:
+    """Registros de Discovery Engine (uno por fragmento) de una entrada del manifiesto."""
+    records = []
+    for chunk in entry["chunks"]:
+        chunk_id = f"{entry['doc_id']}-{chunk['index']:04d}"
+        records.append({
+            "id": chunk_id,
+            "structData": {
+                "title": entry["title"],
+                "discipline": entry["discipline"],
+                "doc_type": entry["doc_type"],
+                "chunk": chunk["index"],
+                "source_doc": entry["doc_id"],
+                "sanitized": True,
+                "sanitized_version": entry["ruleset_version"],
+                "violations_detected": chunk["violations"],
+                "lines_removed": chunk["lines_removed"],
+            },
+            "content": {
+                "mimeType": "text/plain",
+                "uri": f"{mirror_uri.rstrip('/')}/chunks/{entry['doc_id']}/{chunk['index']}.txt",
+            },
+        })
+    return records
+
+
+def ingest(source: str, output: str, mirror_uri: str, workers: Optional[int] = None, force: bool = False) -> Dict:
+    manifest_path = os.path.join(output, "manifest.json")
+    manifest: Dict[str, Dict] = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    version = get_engine(RULE_SET).version
+    tasks = discover(source)
+    pending = []
+    for task in tasks:
+        task["source_hash"] = file_hash(task["path"])
+        previous = manifest.get(task["rel_path"])
+        if previous and previous["source_hash"] == task["source_hash"] and previous["ruleset_version"] == version:
+            continue
+        pending.append(task)
+
+    print(f"📚 Documentos: {len(tasks)} | a procesar: {len(pending)} | reglas {RULE_SET}@{version}")
+    started = time.monotonic()
+    stats = {"processed": 0, "chunks": 0, "rejected_chunks": 0, "errors": 0}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(process_file, pending, chunksize=4):
+            if result["error"]:
+                stats["errors"] += 1
+                print(f"   ⚠️ {result['rel_path']}: {result['error']}")
+                continue
+            for chunk in result["chunks"]:
+                _write_text(os.path.join(output, "chunks", result["doc_id"], f"{chunk['index']}.txt"), chunk["text"])
+            result["chunks"] = [{k: v for k, v in c.items() if k != "text"} for c in result["chunks"]]
+            manifest[result["rel_path"]] = result
+            stats["processed"] += 1
+            stats["chunks"] += len(result["chunks"])
+            stats["rejected_chunks"] += result["rejected_chunks"]
+
+    # Documentos eliminados de la fuente: fuera del espejo
+    present = {t["rel_path"] for t in tasks}
+    for rel_path in [p for p in manifest if p not in present]:
+        manifest.pop(rel_path)
+
+    os.makedirs(output, exist_ok=True)
+    records, violations = [], []
+    for entry in manifest.values():
+        records.extend(document_records(entry, mirror_uri))
+        for chunk in entry["chunks"]:
+            if chunk["violations"] or chunk["lines_removed"]:
+                violations.append({
+                    "doc_id": entry["doc_id"],
+                    "source": entry["rel_path"],
+                    "chunk": chunk["index"],
+                    "violations": chunk["violations"],
+                    "lines_removed": chunk["lines_removed"],
+                })
+    _write_text(os.path.join(output, "documents.jsonl"), "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+    _write_text(os.path.join(output, "violations.jsonl"), "".join(json.dumps(v, ensure_ascii=False) + "\n" for v in violations))
+    _write_text(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    stats["elapsed_s"] = round(time.monotonic() - started, 2)
+    stats["documents_in_mirror"] = len(records)
+    print(
+        f"✅ Espejo actualizado en {stats['elapsed_s']}s: {stats['processed']} documentos, "
+        f"{stats['chunks']} fragmentos, {stats['rejected_chunks']} descartados, {stats['errors']} errores"
+    )
+    print("📤 Siguiente paso:")
+    print(f"   gsutil -m rsync -r -x 'manifest\\.json$|violations\\.jsonl$' {output} {mirror_uri}")
+    print(f"   python import_documents.py {mirror_uri.rstrip('/')}/documents.jsonl")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Espejo sanitizado del corpus de SEMHYS")
+    parser.add_argument("--source", required=True, help="Directorio del corpus (copia local del bucket)")
+    parser.add_argument("--output", default=os.path.join("pipeline_outputs", "sanitized_mirror"))
+    parser.add_argument("--mirror-uri", default=os.getenv("SANITIZED_MIRROR_URI", "gs://semhys-data-sanitized/mirror"),
+                        help="Ubicación en GCS donde se sube el espejo (para las URIs de documents.jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto: CPUs)")
+    parser.add_argument("--force", action="store_true", help="Reprocesar todo aunque no haya cambios")
+    args = parser.parse_args()
+
+    ingest(args.source, args.output, args.mirror_uri, workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
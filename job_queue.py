@@ -0,0 +1,378 @@
+"""
+Job Queue: cola persistente (SQLite) + pool de workers para ejecuciones largas
+(pipeline completo y agentes) fuera del ciclo request/response de la API.
+
+Cancelación: cancel(job_id) descarta un trabajo en cola o marca uno en ejecución;
+el proceso que lo ejecuta lo detecta por sondeo y activa su threading.Event, que
+el runner observa a través de 'job_scope' (p. ej. un Deadline con ese evento).
+
+Trabajos huérfanos: cada proceso actualiza 'heartbeat_at' de los trabajos que
+ejecuta; uno 'running' sin latido durante 'stale_after' segundos (proceso caído,
+contenedor reiniciado) se marca como fallido desde cualquier worker. No se usa el pid:
+tras reiniciar un contenedor el mismo pid puede estar vivo en otro proceso.
+
+Callbacks: el resultado completo solo se envía a hosts de la lista blanca
+(allowed_callback_hosts + el host de default_callback_url); submit rechaza el resto.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("job_queue")
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_outputs", "jobs.db")
+
+
+class CallbackNotAllowed(ValueError):
+    """callback_url con un host fuera de la lista blanca (o con esquema distinto de http/https)."""
+
+
+class JobQueue:
+    """
+    Cola de trabajos compartida entre procesos (workers de gunicorn) vía SQLite.
+
+    Cada proceso arranca su propio pool de hilos; los trabajos se reclaman
+    de forma atómica, así que cada uno se ejecuta una sola vez.
+    """
+
+    def __init__(
+        self,
+        runners: Dict[str, Callable[[Dict], Dict]],
+        db_path: Optional[str] = None,
+        workers: int = 1,
+        poll_interval: float = 1.0,
+        default_callback_url: Optional[str] = None,
+        allowed_callback_hosts: Optional[Iterable[str]] = None,
+        job_scope: Optional[Callable[[str, threading.Event], ContextManager]] = None,
+        stale_after: Optional[float] = None
+    ):
+        self.runners = runners
+        self.job_scope = job_scope
+        self.db_path = os.path.abspath(db_path or DEFAULT_DB_PATH)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        # Segundos sin latido tras los que un trabajo 'running' se da por interrumpido
+        self.stale_after = stale_after or max(60.0, 10 * poll_interval)
+        self.default_callback_url = default_callback_url
+        # Hosts ('n8n.example.com' o 'n8n.example.com:5678') a los que se envían resultados
+        self.allowed_callback_hosts = {h.strip().lower() for h in allowed_callback_hosts or () if h.strip()}
+        if default_callback_url:
+            self.allowed_callback_hosts.add(_callback_hosts(default_callback_url)[2])
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+        # Eventos de cancelación de los trabajos que ejecuta este proceso
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._cancel_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    callback_url TEXT,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "cancel_requested" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+            if "heartbeat_at" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    # ---------- API pública ----------
+
+    def submit(self, kind: str, payload: Dict, callback_url: Optional[str] = None) -> str:
+        """
+        Encola un trabajo y devuelve su id inmediatamente.
+        """
+        if kind not in self.runners:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        if callback_url and not self.callback_allowed(callback_url):
+            raise CallbackNotAllowed(f"callback_url no permitido: {callback_url}")
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, payload, status, callback_url, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False),
+                 callback_url or self.default_callback_url, datetime.now().isoformat())
+            )
+        logger.info(f"📥 Trabajo encolado: {job_id} ({kind})")
+        return job_id
+
+    def callback_allowed(self, callback_url: str) -> bool:
+        """
+        True si el esquema es http/https y el host (con o sin puerto) está en la lista blanca.
+        """
+        scheme, hostname, host_port = _callback_hosts(callback_url)
+        if scheme not in ("http", "https") or not hostname:
+            return False
+        return hostname in self.allowed_callback_hosts or host_port in self.allowed_callback_hosts
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Estado del trabajo (incluye el resultado si terminó).
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancela un trabajo. Devuelve el estado resultante ('cancelled' si estaba en cola,
+        'cancelling' si está en ejecución, o el estado final si ya terminó); None si no existe.
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            queued = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (now, job_id)
+            ).rowcount
+            if queued:
+                logger.info(f"🚫 Trabajo cancelado antes de ejecutarse: {job_id}")
+                return "cancelled"
+            running = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,)
+            ).rowcount
+            if running:
+                logger.info(f"🚫 Cancelación solicitada: {job_id}")
+                self._signal_cancel(job_id)
+                return "cancelling"
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def start(self):
+        """
+        Arranca el pool de workers de este proceso (idempotente, seguro tras fork).
+        """
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._stopping.clear()
+            self._fail_interrupted()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop, name=f"job-worker-{os.getpid()}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            threading.Thread(
+                target=self._watch_loop, name=f"job-watch-{os.getpid()}", daemon=True
+            ).start()
+            logger.info(f"👷 {self.workers} workers de trabajos iniciados (pid {os.getpid()})")
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        Apagado ordenado: los workers dejan de reclamar trabajos y se espera a que
+        terminen los que están en curso (hasta 'timeout'), que siguen latiendo mientras
+        tanto. Devuelve False si alguno sigue en ejecución; si el proceso muere, otro
+        worker lo marca como fallido cuando deja de latir.
+        """
+        self._stopping.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        drained = not any(thread.is_alive() for thread in self._threads)
+        with self._start_lock:
+            self._started_pid = None
+        return drained
+
+    # ---------- Internos ----------
+
+    def _fail_interrupted(self):
+        """
+        Marca como fallidos los trabajos 'running' sin latido reciente: su proceso ya
+        no existe (reinicio del servicio a mitad de una ejecución).
+        """
+        with self._connect() as conn:
+            failed = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                ("Worker interrumpido", datetime.now().isoformat(), time.time() - self.stale_after)
+            ).rowcount
+        if failed:
+            logger.warning(f"⚠️ {failed} trabajos sin latido marcados como fallidos")
+
+    def _heartbeat(self, job_ids: List[str]):
+        placeholders = ",".join("?" * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND job_id IN ({placeholders})",
+                [time.time(), *job_ids]
+            )
+
+    def _claim(self) -> Optional[Dict]:
+        worker = f"{os.getpid()}:{threading.current_thread().name}"
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id, kind, payload, callback_url FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                (worker, datetime.now().isoformat(), time.time(), row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return {"job_id": row[0], "kind": row[1], "payload": json.loads(row[2]), "callback_url": row[3]}
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, datetime.now().isoformat(), job_id)
+            )
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"Error reclamando trabajo: {e}")
+                job = None
+            if job is None:
+                self._stopping.wait(self.poll_interval)
+                continue
+            self._execute(job)
+
+    def _signal_cancel(self, job_id: str):
+        with self._cancel_lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+
+    def _watch_loop(self):
+        """
+        Latido de los trabajos de este proceso, cancelaciones pedidas desde cualquier
+        worker y trabajos huérfanos. Durante el apagado sigue latiendo hasta que
+        terminan los trabajos en curso.
+        """
+        while True:
+            if self._stopping.is_set():
+                time.sleep(self.poll_interval)
+            else:
+                self._stopping.wait(self.poll_interval)
+            with self._cancel_lock:
+                local_jobs = list(self._cancel_events)
+            if self._stopping.is_set() and not local_jobs:
+                return
+            try:
+                if local_jobs:
+                    self._heartbeat(local_jobs)
+                if not self._stopping.is_set():
+                    self._fail_interrupted()
+                if not local_jobs:
+                    continue
+                placeholders = ",".join("?" * len(local_jobs))
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({placeholders})",
+                        local_jobs
+                    ).fetchall()
+            except Exception as e:
+                logger.error(f"Error en el latido/cancelaciones de trabajos: {e}")
+                continue
+            for (job_id,) in rows:
+                self._signal_cancel(job_id)
+
+    def _execute(self, job: Dict):
+        job_id = job["job_id"]
+        logger.info(f"▶️ Ejecutando trabajo {job_id} ({job['kind']})")
+        cancel_event = threading.Event()
+        with self._cancel_lock:
+            self._cancel_events[job_id] = cancel_event
+        try:
+            if self.job_scope is not None:
+                with self.job_scope(job_id, cancel_event):
+                    result = self.runners[job["kind"]](job["payload"])
+            else:
+                result = self.runners[job["kind"]](job["payload"])
+            if cancel_event.is_set():
+                self._finish(job_id, "cancelled", result=result, error="Cancelado por el usuario")
+                logger.info(f"🚫 Trabajo cancelado: {job_id}")
+            else:
+                self._finish(job_id, "completed", result=result)
+                logger.info(f"✅ Trabajo completado: {job_id}")
+        except Exception as e:
+            if cancel_event.is_set():
+                logger.info(f"🚫 Trabajo cancelado: {job_id}")
+                self._finish(job_id, "cancelled", error=str(e))
+            else:
+                logger.error(f"❌ Trabajo fallido {job_id}: {e}")
+                self._finish(job_id, "failed", error=str(e))
+        finally:
+            with self._cancel_lock:
+                self._cancel_events.pop(job_id, None)
+
+        if job.get("callback_url"):
+            self._notify(job["callback_url"], self.get(job_id))
+
+    def _notify(self, callback_url: str, job: Dict):
+        """
+        Notifica la finalización al webhook (p. ej. n8n).
+        """
+        # Trabajos encolados antes de configurar la lista blanca (o con la lista ya cambiada)
+        if not self.callback_allowed(callback_url):
+            logger.warning(f"⚠️ Callback omitido, host no permitido: {callback_url}")
+            return
+        try:
+            body = json.dumps(job, ensure_ascii=False).encode("utf-8")
+            req = urllib.request.Request(
+                callback_url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+            )
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                logger.info(f"📣 Callback {callback_url}: {resp.status}")
+        except Exception as e:
+            logger.warning(f"⚠️ Callback falló ({callback_url}): {e}")
+
+
+def _callback_hosts(url: str):
+    """(esquema, host, host:puerto) de una URL; vacíos si no se puede analizar."""
+    try:
+        parts = urlsplit(url)
+        hostname = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return "", "", ""
+    return parts.scheme.lower(), hostname, f"{hostname}:{port}" if port else hostname
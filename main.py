@@ -1,14 +1,19 @@
 import os
+import json
+import time
 import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import List, Optional, Dict, Any
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import vertexai
-from vertexai.generative_models import GenerativeModel, Content, Part
-from google.cloud import discoveryengine_v1 as discoveryengine
-from google.api_core.client_options import ClientOptions
+
+from static_site import StaticSite
 
 # --- CONFIGURACIÓN ---
 # --- CONFIGURACIÓN ---
@@ -24,6 +29,10 @@ logger = logging.getLogger("semhys-backend")
 def search_data_store(query: str):
     """Busca documentos en el Data Store de Vertex AI."""
     try:
+        # SDK importado en la primera búsqueda: el arranque en frío no lo paga
+        from google.cloud import discoveryengine_v1 as discoveryengine
+        from google.api_core.client_options import ClientOptions
+        
         # Configurar cliente (Global required for Discovery Engine mostly)
         client_options = (
             ClientOptions(api_endpoint=f"global-discoveryengine.googleapis.com")
@@ -74,38 +83,113 @@ class OfflineModel:
         return type('obj', (object,), {'text': "OFFLINE_RESPONSE_MARKER"})
 
 # --- GESTOR DE MODELOS INTELIGENTE ---
+# Orden de preferencia: se usa el primer candidato disponible
+MODEL_CANDIDATES = ["gemini-1.5-flash", "gemini-1.0-pro", "gemini-pro", "chat-bison@002"]
+# Resultado del sondeo en disco: los reinicios en caliente no vuelven a sondear
+MODEL_STATE_PATH = os.getenv("MODEL_STATE_PATH", os.path.join(tempfile.gettempdir(), "semhys_model_state.json"))
+MODEL_STATE_TTL_SECONDS = float(os.getenv("MODEL_STATE_TTL_SECONDS", "21600"))
+MODEL_PROBE_TIMEOUT_SECONDS = float(os.getenv("MODEL_PROBE_TIMEOUT_SECONDS", "20"))
+
 ACTIVE_MODEL = None
 ACTIVE_MODEL_NAME = "offline"
+# Readiness (distinta de liveness): False hasta que termina la inicialización
+MODEL_STATUS: Dict[str, Any] = {"ready": False, "source": None, "initialized_at": None}
+_model_lock = threading.Lock()
 
-def initialize_vertex():
-    global ACTIVE_MODEL, ACTIVE_MODEL_NAME
-    
-    candidates = ["gemini-1.5-flash", "gemini-1.0-pro", "gemini-pro", "chat-bison@002"]
+def _state_key() -> Dict[str, Any]:
+    return {"project": PROJECT_ID, "location": LOCATION, "candidates": MODEL_CANDIDATES}
+
+def _load_model_state() -> Optional[str]:
+    """Modelo del último sondeo si el archivo es reciente y de la misma configuración."""
+    try:
+        with open(MODEL_STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("key") != _state_key() or time.time() - state.get("probed_at", 0) > MODEL_STATE_TTL_SECONDS:
+        return None
+    return state.get("model")
+
+def _save_model_state(name: str):
+    try:
+        tmp_path = f"{MODEL_STATE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": _state_key(), "model": name, "probed_at": time.time()}, f)
+        os.replace(tmp_path, MODEL_STATE_PATH)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el estado del modelo: {e}")
+
+def _probe(name: str):
+    """Verifica acceso al modelo con count_tokens (sin generar: no consume cuota de generación)."""
+    from vertexai.generative_models import GenerativeModel
     
+    model = GenerativeModel(name)
+    model.count_tokens("Ping")
+    return model
+
+def _probe_candidates():
+    """Sondea todos los candidatos en paralelo; devuelve el primero disponible en orden de preferencia."""
+    executor = ThreadPoolExecutor(max_workers=len(MODEL_CANDIDATES), thread_name_prefix="model-probe")
+    futures = [executor.submit(_probe, name) for name in MODEL_CANDIDATES]
     try:
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        for name in candidates:
+        for name, future in zip(MODEL_CANDIDATES, futures):
             try:
-                model = GenerativeModel(name)
-                model.generate_content("Ping")
-                ACTIVE_MODEL = model
-                ACTIVE_MODEL_NAME = name
-                logger.info(f"✅ CONECTADO A: {name}")
-                return
+                return name, future.result(timeout=MODEL_PROBE_TIMEOUT_SECONDS)
             except Exception as e:
                 logger.warning(f"❌ {name} falló: {e}")
-    except Exception as e:
-        logger.error(f"Vertex Init falló: {e}")
+        return None, None
+    finally:
+        # No esperar a los sondeos de menor preferencia que sigan en curso
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def initialize_vertex():
+    global ACTIVE_MODEL, ACTIVE_MODEL_NAME
     
-    # 3. Si todo falla, usar Offline
-    logger.error("⚠️ ACTIVANDO MODELO OFFLINE DE EMERGENCIA")
-    ACTIVE_MODEL = OfflineModel()
-    ACTIVE_MODEL_NAME = "offline-mode"
+    with _model_lock:
+        if MODEL_STATUS["ready"]:
+            return
+        started = time.monotonic()
+        source = "offline"
+        try:
+            # vertexai se importa aquí (hilo de arranque o primer uso), no al importar main
+            import vertexai
+            from vertexai.generative_models import GenerativeModel
+            
+            vertexai.init(project=PROJECT_ID, location=LOCATION)
+            cached = _load_model_state()
+            if cached:
+                ACTIVE_MODEL, ACTIVE_MODEL_NAME, source = GenerativeModel(cached), cached, "cache"
+            else:
+                name, model = _probe_candidates()
+                if model is not None:
+                    ACTIVE_MODEL, ACTIVE_MODEL_NAME, source = model, name, "probe"
+                    _save_model_state(name)
+        except Exception as e:
+            logger.error(f"Vertex Init falló: {e}")
+        
+        if source == "offline":
+            # Si todo falla, usar Offline
+            logger.error("⚠️ ACTIVANDO MODELO OFFLINE DE EMERGENCIA")
+            ACTIVE_MODEL = OfflineModel()
+            ACTIVE_MODEL_NAME = "offline-mode"
+        else:
+            logger.info(f"✅ CONECTADO A: {ACTIVE_MODEL_NAME} ({source}, {time.monotonic() - started:.2f}s)")
+        MODEL_STATUS.update(ready=True, source=source, initialized_at=datetime.now().isoformat())
+
+def get_active_model():
+    """Modelo activo; si la inicialización en segundo plano no terminó, se completa aquí."""
+    if not MODEL_STATUS["ready"]:
+        initialize_vertex()
+    return ACTIVE_MODEL
 
-# Inicializar al arranque
-initialize_vertex()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sondeo en segundo plano: el servidor acepta peticiones (liveness) sin esperar a Vertex
+    threading.Thread(target=initialize_vertex, name="model-init", daemon=True).start()
+    static_site.load()
+    yield
 
-app = FastAPI(title="Semhys Chat API (Unkillable)", version="3.1.0")
+app = FastAPI(title="Semhys Chat API (Unkillable)", version="3.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -130,13 +214,22 @@ class ChatResponse(BaseModel):
 
 @app.get("/api/health")
 async def root():
+    # Liveness: siempre "ok" si el proceso responde; readiness en "ready"
     return {
         "status": "ok", 
         "service": "Semhys AI Backend", 
-        "model": ACTIVE_MODEL_NAME,
+        "ready": MODEL_STATUS["ready"],
+        "model": ACTIVE_MODEL_NAME if MODEL_STATUS["ready"] else None,
+        "model_source": MODEL_STATUS["source"],
         "data_store": DATA_STORE_ID
     }
 
+@app.get("/api/ready")
+async def ready():
+    """Readiness probe: 503 mientras el modelo se inicializa."""
+    status_code = 200 if MODEL_STATUS["ready"] else 503
+    return JSONResponse({"ready": MODEL_STATUS["ready"], "model": ACTIVE_MODEL_NAME}, status_code=status_code)
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     try:
@@ -153,4 +246,15 @@ async def chat_endpoint(request: ChatRequest):
             metadata={"status": "crash"}
         )
 
-app.mount("/", StaticFiles(directory=".", html=True), name="static")
+# Sitio estático: solo la lista blanca de static_site.py, precomprimido y con huella.
+# Debe ser la última ruta (captura todo lo que no es API).
+static_site = StaticSite()
+
+@app.api_route("/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_files(path: str, request: Request):
+    status_code, body, headers = static_site.respond(
+        f"/{path}",
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match")
+    )
+    return Response(content=body, status_code=status_code, headers=headers)
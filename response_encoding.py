@@ -0,0 +1,133 @@
+"""
+Codificación de respuestas HTTP: JSON rápido (orjson), proyección de campos (?fields=)
+y compresión negociada (br > gzip) por encima de un umbral.
+
+La usan api_wrapper (Flask), api_asgi, semhys-agents (app/services/responses.py) y
+static_site (build precomprimido). No depende de ningún framework:
+
+    body, headers = encode_json(result, fields="topic,dossier.audit_summary",
+                                accept_encoding="gzip, br")
+
+?fields= son rutas separadas por comas; las listas se proyectan elemento a elemento
+("verifications.claim" deja solo 'claim' en cada verificación). Un campo inexistente
+se omite sin error.
+"""
+
+import gzip
+import json
+import os
+import re
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Respuestas más pequeñas se envían sin comprimir (la cabecera y la CPU no compensan)
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+# Niveles para respuestas dinámicas; static_site usa los máximos en su build
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+# Orden de preferencia de la negociación
+ENCODINGS = ("br", "gzip")
+
+
+def dumps(data: Any) -> bytes:
+    """JSON en bytes UTF-8; orjson si está instalado (datetime en ISO 8601, sin ordenar claves)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def parse_fields(raw: Optional[str]) -> Optional[Dict]:
+    """
+    'topic,dossier.audit_summary' -> {'topic': None, 'dossier': {'audit_summary': None}}
+    (None = el valor completo). None si no se pidió proyección.
+    """
+    if not raw or not raw.strip():
+        return None
+    tree: Dict = {}
+    for path in raw.split(","):
+        keys = [key for key in path.strip().split(".") if key]
+        node = tree
+        for i, key in enumerate(keys):
+            if i == len(keys) - 1:
+                node[key] = None
+            elif node.get(key, {}) is None:
+                # Ya se pidió el valor completo (p. ej. "dossier" y "dossier.topic")
+                break
+            else:
+                node = node.setdefault(key, {})
+    return tree or None
+
+
+def project(data: Any, tree: Optional[Dict]) -> Any:
+    """Aplica el árbol de parse_fields; las listas se proyectan elemento a elemento."""
+    if tree is None:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: project(data[key], sub) for key, sub in tree.items() if key in data}
+
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Codificaciones con q > 0 en Accept-Encoding ('*' acepta las no rechazadas con q=0)."""
+    accepted, rejected = set(), set()
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        (accepted if q > 0 else rejected).add(token)
+    if "*" in accepted:
+        accepted.update(e for e in ENCODINGS if e not in rejected)
+    return accepted
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> Optional[bytes]:
+    """None si la codificación no está disponible (brotli es opcional)."""
+    if encoding == "gzip":
+        # mtime=0: misma salida para el mismo contenido
+        return gzip.compress(data, compresslevel=level or GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        try:
+            import brotli
+        except ImportError:
+            return None
+        return brotli.compress(data, quality=level or BROTLI_QUALITY)
+    return None
+
+
+def compress_body(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    """Comprime con la mejor codificación aceptada si body >= COMPRESS_MIN_BYTES."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, {}
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            compressed = compress(body, encoding)
+            if compressed is not None:
+                return compressed, {"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+    return body, {"Vary": "Accept-Encoding"}
+
+
+def encode_json(
+    data: Any,
+    fields: Optional[str] = None,
+    accept_encoding: Optional[str] = None
+) -> Tuple[bytes, Dict[str, str]]:
+    """Cuerpo y cabeceras de una respuesta JSON proyectada y comprimida."""
+    body, headers = compress_body(dumps(project(data, parse_fields(fields))), accept_encoding)
+    headers["Content-Type"] = "application/json"
+    return body, headers
@@ -2,32 +2,26 @@
 from fastapi import APIRouter, HTTPException
 from app.api.types import BlogRequest, BlogResponse
 from app.core.config import settings
-from app.services.redaction import redact_text
+from app.services.deadline import DeadlineExceeded
+from app.services.redaction import kill_switch_scan, redact_documents, redact_model, redact_text
 from app.services.vertex_search import search_vertex
 from app.services.llm_router import generate_structured_response
 from app.api.research_routes import build_context
-import re
 import logging
 
 logger = logging.getLogger("semhys-blog")
 
 router = APIRouter()
 
-def kill_switch_scan(text: str) -> bool:
+def blocked_patterns(resp: BlogResponse) -> list:
     """
     Layer 2: Hard Filter.
-    Returns True if sensitive content detected (gs:// or internal filenames).
+    Kill-switch rules (gs:// or internal filenames/client names) matched in any field.
     """
-    bad_patterns = [
-        r"gs://",
-        r"\.pdf\b", r"\.docx\b", r"\.xlsx\b",
-        r"BAVARIA", r"RCI", # Add dynamic blocking if needed
-    ]
-    for p in bad_patterns:
-        if re.search(p, text, re.IGNORECASE):
-            logger.warning(f"Blocking blog output due to pattern match: {p}")
-            return True
-    return False
+    blocked = kill_switch_scan(resp)
+    if blocked:
+        logger.warning(f"Blocking blog output due to pattern match: {', '.join(blocked)}")
+    return blocked
 
 @router.post("/generate", response_model=BlogResponse, tags=["blog"])
 def generate_blog(req: BlogRequest):
@@ -45,7 +39,7 @@ def generate_blog(req: BlogRequest):
         )
         if docs:
             # We build context but instruct to NOT cite it explicitly
-            context = build_context(docs)
+            context = build_context(redact_documents(docs, mode=settings.redaction_mode))
     
     # 2. Build Prompt (Layer 1: System Instruction)
     schema_hint = BlogResponse.model_json_schema()
@@ -94,6 +88,8 @@ def generate_blog(req: BlogRequest):
             google_api_key=settings.google_api_key,
             gemini_model=settings.gemini_model
         )
+    except DeadlineExceeded:
+        raise
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"Blog generation failed: {str(e)}")
          
@@ -103,7 +99,7 @@ def generate_blog(req: BlogRequest):
     # If content contains restricted patterns, we could retry or fail.
     # Simple strategy: Fail safe (or remove sentences, but stripping is risky).
     # MVP: Check and Fail/Blank
-    if kill_switch_scan(resp_obj.content_markdown) or kill_switch_scan(resp_obj.title):
+    if blocked_patterns(resp_obj):
         logger.error("Kill-Switch triggered on blog content.")
         # Optional: Retry logic could go here. For now, strict fail-safe.
         # Let's try to redact locally just in case instead of hard error, 
@@ -131,15 +127,15 @@ def generate_blog(req: BlogRequest):
             )
              resp_obj = result["parsed"]
              # Check again
-             if kill_switch_scan(resp_obj.content_markdown):
+             if blocked_patterns(resp_obj):
                  raise HTTPException(status_code=400, detail="Privacy Violation: Unable to generate safe content.")
+        except DeadlineExceeded:
+            raise
         except Exception as e:
              raise HTTPException(status_code=500, detail=f"Regeneration failed: {e}")
 
     # 5. Layer 3: Strict Redaction (Blind Sanitize)
-    resp_obj.content_markdown = redact_text(resp_obj.content_markdown, mode="strict")
-    resp_obj.title = redact_text(resp_obj.title, mode="strict")
-    resp_obj.meta_description = redact_text(resp_obj.meta_description, mode="strict")
+    resp_obj = redact_model(resp_obj, mode="strict")
     
     resp_obj.provider = result["provider"]
     return resp_obj
@@ -2,24 +2,16 @@
 from fastapi import APIRouter, HTTPException
 from app.api.types import CommercialRequest, CommercialResponse
 from app.core.config import settings
-from app.services.redaction import redact_text
+from app.services.deadline import DeadlineExceeded
+from app.services.redaction import kill_switch_scan, redact_documents, redact_model, redact_text
 from app.services.vertex_search import search_vertex
 from app.api.research_routes import build_context
 from app.services.llm_router import generate_structured_response
-import re
 import logging
 
 logger = logging.getLogger("semhys-commercial")
 router = APIRouter()
 
-def kill_switch_scan(text: str) -> bool:
-    # Block internal references even if "internal intelligence"
-    bad_patterns = [
-        r"gs://",
-        r"\.pdf\b", r"\.docx\b", r"\.xlsx\b", r"\.pptx\b",
-    ]
-    return any(re.search(p, text, re.IGNORECASE) for p in bad_patterns)
-
 @router.post("/analyze", response_model=CommercialResponse, tags=["commercial"])
 def commercial_analyze(req: CommercialRequest):
     topic_redacted = redact_text(req.topic, mode=settings.redaction_mode)
@@ -36,7 +28,7 @@ def commercial_analyze(req: CommercialRequest):
     if not docs:
         raise HTTPException(status_code=404, detail="No internal documents found for commercial analysis.")
 
-    context = build_context(docs)
+    context = build_context(redact_documents(docs, mode=settings.redaction_mode))
 
     # 2) Prompt
     schema_hint = CommercialResponse.model_json_schema()
@@ -91,15 +83,18 @@ Generate JSON now:
             google_api_key=settings.google_api_key,
             gemini_model=settings.gemini_model,
         )
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Commercial generation failed: {str(e)}")
 
     resp: CommercialResponse = result["parsed"]
 
     # 4) Kill-switch (hard safety)
-    raw_blob = (resp.model_dump_json() if hasattr(resp, "model_dump_json") else str(resp))
-    if kill_switch_scan(raw_blob):
-        logger.error("Kill-switch triggered: internal reference detected in CommercialResponse.")
+    # Block internal references even if "internal intelligence"
+    blocked = kill_switch_scan(resp)
+    if blocked:
+        logger.error(f"Kill-switch triggered: internal reference detected in CommercialResponse ({', '.join(blocked)}).")
         # attempt one regeneration
         messages.append({"role": "assistant", "content": result.get("raw_text", "")})
         messages.append({"role": "user", "content": "Privacy violation. Regenerate. Remove ALL internal URIs/file names/client names. JSON only."})
@@ -116,24 +111,18 @@ Generate JSON now:
                 max_retries=0,
             )
             resp = result2["parsed"]
-            raw_blob2 = (resp.model_dump_json() if hasattr(resp, "model_dump_json") else str(resp))
-            if kill_switch_scan(raw_blob2):
+            if kill_switch_scan(resp):
                 raise HTTPException(status_code=400, detail="Privacy violation: unable to generate safe commercial output.")
             result = result2
         except HTTPException:
             raise
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Commercial regeneration failed: {str(e)}")
 
     # 5) Final sanitize (belt & suspenders)
-    # NOTE: keep it simple for MVP; sanitize key fields only
-    for op in resp.opportunities:
-        op.category = redact_text(op.category, mode="strict")
-        op.problem_detected = redact_text(op.problem_detected, mode="strict")
-        op.product_or_service = redact_text(op.product_or_service, mode="strict")
-        op.why_now = redact_text(op.why_now, mode="strict")
-        op.target_client_type = redact_text(op.target_client_type, mode="strict")
-        op.recommended_action = redact_text(op.recommended_action, mode="strict")
+    resp = redact_model(resp, mode="strict")
 
     resp.provider = result["provider"]
     return resp
@@ -2,7 +2,8 @@
 from fastapi import APIRouter, HTTPException
 from app.api.types import ReportRequest, ReportResponse, Citation
 from app.core.config import settings
-from app.services.redaction import redact_text
+from app.services.deadline import DeadlineExceeded
+from app.services.redaction import redact_documents, redact_model, redact_text
 from app.services.vertex_search import search_vertex
 from app.services.llm_router import generate_structured_response
 from app.api.research_routes import build_context # Reuse context builder if appropriate
@@ -29,6 +30,7 @@ def generate_report(req: ReportRequest):
     if not docs:
          raise HTTPException(status_code=404, detail="No internal documents found for report.")
 
+    docs = redact_documents(docs, mode=settings.redaction_mode)
     context = build_context(docs)
     
     # 2. Build Prompt
@@ -72,17 +74,15 @@ def generate_report(req: ReportRequest):
             google_api_key=settings.google_api_key,
             gemini_model=settings.gemini_model
         )
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
-    # 4. Final Security Pass (Redaction on output strings)
-    # Pydantic is already validated, but we should redact strings within it.
-    # Ideally iterate fields, but for MVP we rely on input redaction + trusting LLM on findings,
-    # OR we apply redaction to specific string fields.
-    # Let's apply on executive_summary and findings for safety.
-    
+    # 4. Final Security Pass (Redaction on every output string)
+    # citations_internal is replaced below with the actual search docs.
     resp_obj: ReportResponse = result["parsed"]
-    resp_obj.executive_summary = redact_text(resp_obj.executive_summary, mode=settings.redaction_mode)
+    resp_obj = redact_model(resp_obj, mode=settings.redaction_mode, skip=("provider", "citations_internal"))
     
     # Clean up citations: Ensure they are from our context
     # (LLM might hallucinate citations, but our schema asks for Citation objects. 
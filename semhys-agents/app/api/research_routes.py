@@ -2,7 +2,8 @@
 from fastapi import APIRouter, HTTPException
 from app.api.types import ResearchRequest, ResearchResponse, Citation
 from app.core.config import settings
-from app.services.redaction import redact_text
+from app.services.deadline import DeadlineExceeded
+from app.services.redaction import redact_documents, redact_text
 from app.services.vertex_search import search_vertex
 from app.services.llm_router import generate_response
 
@@ -47,6 +48,7 @@ def research(req: ResearchRequest):
     if not docs:
         raise HTTPException(status_code=404, detail="No documents found for query.")
 
+    docs = redact_documents(docs, mode=settings.redaction_mode)
     context = build_context(docs)
 
     user_prompt = f"""Consulta del usuario (redactada si aplica):
@@ -75,6 +77,8 @@ Tarea:
             google_api_key=settings.google_api_key,
             gemini_model=settings.gemini_model,
         )
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
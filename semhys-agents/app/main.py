@@ -1,11 +1,35 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.api.research_routes import router as research_router
 from app.api.report_routes import router as report_router
 from app.api.blog_routes import router as blog_router
 from app.api.commercial_routes import router as commercial_router
+from app.services.deadline import DeadlineExceeded, DeadlineMiddleware
+from app.services.responses import FastJSONResponse, ResponseOptionsMiddleware
+from app.services.tracing import span
 
-app = FastAPI(title="Semhys Agents Backend", version="0.1.0")
+# orjson + ?fields= projection + compression for every route (app/services/responses.py)
+app = FastAPI(title="Semhys Agents Backend", version="0.1.0", default_response_class=FastJSONResponse)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Root span per request: search and LLM spans inside the route nest under it
+    with span(f"{request.method} {request.url.path}") as root:
+        response = await call_next(request)
+        root.set_attribute("status_code", response.status_code)
+    response.headers["X-Trace-Id"] = root.trace_id
+    return response
+
+# Request's ?fields= and Accept-Encoding for FastJSONResponse
+app.add_middleware(ResponseOptionsMiddleware)
+
+# Outermost: per-request deadline, cancelled when the client disconnects
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
 
 @app.get("/health")
 def health():
@@ -0,0 +1,81 @@
+"""
+Adapter over the shared per-request deadline (agents/v3/deadline.py at the repo root):
+these routes, the search/LLM services and the root modules they call (redaction,
+sanitize cache) all read the same ContextVar.
+
+DeadlineMiddleware gives each HTTP request a budget of REQUEST_DEADLINE_SECONDS
+and cancels it when the client disconnects. Outbound calls take their timeout
+from the remaining budget:
+
+    client.search(request=req, timeout=remaining_timeout(30))
+
+Work running in a thread (sync routes run in FastAPI's threadpool, which copies
+the context) sees the same deadline.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+_REPO_ROOT = str(Path(__file__).resolve().parents[3])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.deadline import (  # noqa: E402,F401
+    Cancelled,
+    Deadline,
+    DeadlineExceeded,
+    check_deadline,
+    current_deadline,
+    deadline_scope,
+    remaining_timeout,
+)
+
+
+class DeadlineMiddleware:
+    """
+    Pure ASGI middleware: opens a Deadline per HTTP request and cancels it if the
+    client disconnects before the response is sent.
+    """
+
+    def __init__(self, app, seconds: Optional[float] = None):
+        self.app = app
+        self.seconds = seconds if seconds is not None else float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(self.seconds)
+        body_done = asyncio.Event()
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"content-length", b"0") == b"0" and b"transfer-encoding" not in headers:
+            body_done.set()
+
+        async def watch_disconnect():
+            # Only listen once the app has consumed the body, so no request data is lost
+            await body_done.wait()
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    deadline.cancel("client disconnected")
+                    return
+
+        async def wrapped_receive():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                deadline.cancel("client disconnected")
+            elif message["type"] == "http.request" and not message.get("more_body", False):
+                body_done.set()
+            return message
+
+        with deadline_scope(deadline):
+            watcher = asyncio.ensure_future(watch_disconnect())
+            try:
+                await self.app(scope, wrapped_receive, send)
+            finally:
+                watcher.cancel()
@@ -2,12 +2,33 @@ from __future__ import annotations
 import json
 import re
 import logging
+import os
 from typing import Any, Dict, List, Optional, Type
 
 from pydantic import BaseModel, ValidationError
 
+from app.services.deadline import DeadlineExceeded, check_deadline, remaining_timeout
+from app.services.replay import (
+    decode_gemini,
+    decode_openai,
+    encode_gemini,
+    encode_openai,
+    replay_call,
+)
+from app.services.tracing import (
+    increment,
+    record_gemini_usage,
+    record_openai_usage,
+    set_attribute,
+    span,
+    traced,
+)
+
 logger = logging.getLogger("semhys-llm")
 
+# Per-call cap; the request deadline shortens it further (app/services/deadline.py)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
 JSON_BLOCK_RE = re.compile(r"\{.*\}", re.DOTALL)
 
 def _extract_json(text: str) -> dict:
@@ -47,6 +68,7 @@ def _repair_messages(messages: List[dict], schema_hint: str) -> List[dict]:
     )
     return messages + [{"role": "user", "content": repair}]
 
+@traced("llm.generate_response")
 def generate_response(
     messages: List[Dict[str, str]],
     model_preference: str,
@@ -70,12 +92,21 @@ def generate_response(
         if not openai_api_key: raise RuntimeError("OPENAI_API_KEY missing")
         from openai import OpenAI
         client = OpenAI(api_key=openai_api_key)
-        resp = client.chat.completions.create(
-            model=openai_model,
-            messages=messages,
-            response_format={"type": "json_object"} if json_mode else None,
-            temperature=0.2
-        )
+        with span("llm.openai", model=openai_model, json_mode=json_mode):
+            resp = replay_call(
+                "openai.chat",
+                {"model": openai_model, "messages": messages, "json_mode": json_mode},
+                lambda: client.chat.completions.create(
+                    model=openai_model,
+                    messages=messages,
+                    response_format={"type": "json_object"} if json_mode else None,
+                    temperature=0.2,
+                    timeout=remaining_timeout(LLM_TIMEOUT_SECONDS),
+                ),
+                encode=encode_openai,
+                decode=decode_openai,
+            )
+            record_openai_usage(resp)
         return resp.choices[0].message.content or ""
 
     def call_gemini():
@@ -88,7 +119,19 @@ def generate_response(
         generation_config = {"temperature": 0.2}
         if json_mode: generation_config["response_mime_type"] = "application/json"
         
-        resp = gmodel.generate_content(prompt, generation_config=generation_config)
+        with span("llm.gemini", model=gemini_model, json_mode=json_mode):
+            resp = replay_call(
+                "gemini.generate",
+                {"model": gemini_model, "prompt": prompt, "generation_config": generation_config},
+                lambda: gmodel.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": remaining_timeout(LLM_TIMEOUT_SECONDS)},
+                ),
+                encode=encode_gemini,
+                decode=decode_gemini,
+            )
+            record_gemini_usage(resp)
         return (resp.text or "").strip()
 
     # Routing Logic (Simplified)
@@ -104,16 +147,22 @@ def generate_response(
         try:
             if provider == "openai":
                 text = call_openai()
+                set_attribute("provider", "openai")
                 return {"provider": "openai", "text": text, "errors": errors}
             elif provider == "gemini":
                 text = call_gemini()
+                set_attribute("provider", "gemini")
                 return {"provider": "gemini", "text": text, "errors": errors}
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             errors.append(f"{provider}: {e}")
+            increment("provider_failures")
             logger.warning(f"Provider {provider} failed: {e}")
     
     raise RuntimeError(f"All providers failed: {'; '.join(errors)}")
 
+@traced("llm.generate_structured_response")
 def generate_structured_response(
     *,
     messages: List[Dict[str, str]],
@@ -139,6 +188,8 @@ def generate_structured_response(
     cur_messages = messages
 
     for attempt in range(max_retries + 1):
+        set_attribute("attempts", attempt + 1)
+        check_deadline("structured generation")
         try:
             if model_preference in ("auto", "openai") and openai_api_key:
                 raw = _call_openai_json(
@@ -149,6 +200,7 @@ def generate_structured_response(
                 )
                 data = _extract_json(raw)
                 parsed = output_model.model_validate(data)
+                set_attribute("provider", "openai")
                 return {"provider": "openai", "raw_text": raw, "parsed": parsed}
 
             if model_preference in ("gemini", "auto") and google_api_key:
@@ -195,9 +247,13 @@ def generate_structured_response(
                     
                     data = _extract_json(raw)
                     parsed = output_model.model_validate(data)
+                    set_attribute("provider", provider)
                     return {"provider": provider, "raw_text": raw, "parsed": parsed}
 
+                except DeadlineExceeded:
+                    raise
                 except Exception as provider_err:
+                    increment("provider_failures")
                     logger.warning(f"Provider {provider} failed in structured gen: {provider_err}")
                     continue # Try next provider in this attempt
 
@@ -210,6 +266,8 @@ def generate_structured_response(
             # Re-raise to trigger the outer except loop for 'attempt' retry
             raise ValueError("All providers failed or returned invalid JSON")
 
+        except DeadlineExceeded:
+            raise
         except (ValidationError, json.JSONDecodeError, ValueError) as e:
             last_err = e
             logger.warning(f"Structured JSON failed attempt={attempt}: {e}")
@@ -238,29 +296,47 @@ def _call_openai_json(*, messages, api_key, model, schema_json) -> str:
 
     # Preferred: JSON Schema (Structured Outputs)
     try:
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "SemhysStructuredOutput",
-                    "schema": schema_json,
-                    "strict": True
-                },
-            },
-            temperature=0.2,
-        )
+        with span("llm.openai", model=model, response_format="json_schema"):
+            resp = replay_call(
+                "openai.chat",
+                {"model": model, "messages": messages, "response_format": "json_schema", "schema": schema_json},
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format={
+                        "type": "json_schema",
+                        "json_schema": {
+                            "name": "SemhysStructuredOutput",
+                            "schema": schema_json,
+                            "strict": True
+                        },
+                    },
+                    temperature=0.2,
+                    timeout=remaining_timeout(LLM_TIMEOUT_SECONDS),
+                ),
+                encode=encode_openai,
+                decode=decode_openai,
+            )
+            record_openai_usage(resp)
         return resp.choices[0].message.content or ""
     except Exception as e:
         # Fallback: json_object
         logger.warning(f"OpenAI json_schema failed, fallback json_object. err={e}")
-        resp = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            response_format={"type": "json_object"},
-            temperature=0.2,
-        )
+        with span("llm.openai", model=model, response_format="json_object"):
+            resp = replay_call(
+                "openai.chat",
+                {"model": model, "messages": messages, "response_format": "json_object"},
+                lambda: client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    temperature=0.2,
+                    timeout=remaining_timeout(LLM_TIMEOUT_SECONDS),
+                ),
+                encode=encode_openai,
+                decode=decode_openai,
+            )
+            record_openai_usage(resp)
         return resp.choices[0].message.content or ""
 
 def _call_gemini_json(*, messages, api_key, model) -> str:
@@ -279,11 +355,21 @@ def _call_gemini_json(*, messages, api_key, model) -> str:
     prompt = "\n".join(prompt)
 
     gmodel = genai.GenerativeModel(model)
-    resp = gmodel.generate_content(
-        prompt,
-        generation_config={
+    with span("llm.gemini", model=model, response_format="json"):
+        generation_config = {
             "temperature": 0.2,
             "response_mime_type": "application/json",
-        },
-    )
+        }
+        resp = replay_call(
+            "gemini.generate",
+            {"model": model, "prompt": prompt, "generation_config": generation_config},
+            lambda: gmodel.generate_content(
+                prompt,
+                generation_config=generation_config,
+                request_options={"timeout": remaining_timeout(LLM_TIMEOUT_SECONDS)},
+            ),
+            encode=encode_gemini,
+            decode=decode_gemini,
+        )
+        record_gemini_usage(resp)
     return (resp.text or "").strip()
@@ -1,19 +1,64 @@
+"""
+Adapter over the shared redaction service (agents/v3/redaction.py at the repo root),
+so the API routes and the blog agents apply the same rule sets.
 
-import re
+Rule sets used here:
+  - pii_strict / pii_standard: email, phone (+ long IDs in strict) -> [REDACTED_*]
+  - kill_switch: internal references (gs:// URIs, office file names, client names)
+    that block a response instead of redacting it
+
+Search snippets go through the shared sanitized-document cache
+(agents/v3/sanitize_cache.py), so hot documents are redacted once per rule-set version.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+_REPO_ROOT = str(Path(__file__).resolve().parents[3])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.redaction import RedactionEngine, get_engine, iter_redacted  # noqa: E402
+from agents.v3.sanitize_cache import get_sanitize_cache  # noqa: E402
+
+
+def engine_for(mode: str = "strict") -> RedactionEngine:
+    return get_engine("pii_strict" if mode == "strict" else "pii_standard")
 
-EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.IGNORECASE)
-PHONE_RE = re.compile(r"(\+?\d{1,2}\s*)?(\(?\d{3}\)?[\s.-]?)?\d{3}[\s.-]?\d{4}")
-ID_RE = re.compile(r"\b([A-Z0-9]{12,}|[0-9]{9,})\b", re.IGNORECASE)
 
 def redact_text(text: str, mode: str = "strict") -> str:
-    if not text:
-        return text
+    return engine_for(mode).redact(text)
+
+
+def redact_documents(docs: List[Dict[str, Any]], mode: str = "strict") -> List[Dict[str, Any]]:
+    """
+    Copies of search results with the snippet redacted, cached per
+    (document uri, content hash, rule-set version).
+    """
+    engine = engine_for(mode)
+    cache = get_sanitize_cache()
+    return [
+        {**doc, "snippet": engine.scan_cached(doc.get("snippet") or "", doc.get("uri") or doc.get("title") or "", cache).text}
+        for doc in docs
+    ]
+
+
+def redact_model(obj: Any, mode: str = "strict", skip: Iterable[str] = ("provider",)) -> Any:
+    """Copy of a response model with every string field redacted in one pass."""
+    return engine_for(mode).redact_model(obj, skip=skip)
+
+
+def redact_stream(chunks: Iterable[str], mode: str = "strict") -> Iterator[str]:
+    """Redact a stream of text chunks; matches split across chunks are still caught."""
+    return iter_redacted(chunks, engine_for(mode))
+
 
-    out = text
-    out = EMAIL_RE.sub("[REDACTED_EMAIL]", out)
-    out = PHONE_RE.sub("[REDACTED_PHONE]", out)
+def kill_switch_scan(obj: Any, skip: Iterable[str] = ("provider",)) -> List[str]:
+    """Kill-switch rules matched anywhere in `obj` (a string or a response model)."""
+    return get_engine("kill_switch").blocked_in(obj, skip=skip)
 
-    if mode == "strict":
-        out = ID_RE.sub("[REDACTED_ID]", out)
 
-    return out
+def is_blocked(obj: Any, skip: Iterable[str] = ("provider",)) -> bool:
+    return bool(kill_switch_scan(obj, skip=skip))
@@ -0,0 +1,50 @@
+"""
+Adapter over the shared record/replay layer (agents/v3/replay.py at the repo root), so
+these routes and the main pipeline key, record and serve fixtures the same way.
+
+    REPLAY_MODE=off     live calls (default)
+    REPLAY_MODE=record  live calls, each response saved as a fixture
+    REPLAY_MODE=replay  offline: fixtures are served with simulated latency
+
+Only the OpenAI response shape lives here; Gemini responses use the shared
+encode/decode of Vertex generations.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict
+
+_REPO_ROOT = str(Path(__file__).resolve().parents[3])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.replay import (  # noqa: E402,F401
+    ReplayMiss,
+    decode_generation as decode_gemini,
+    encode_generation as encode_gemini,
+    replay_call,
+    replay_mode,
+    replayable,
+)
+
+
+def encode_openai(resp: Any) -> Dict[str, Any]:
+    usage = getattr(resp, "usage", None)
+    return {
+        "content": resp.choices[0].message.content,
+        "usage": {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "total_tokens": getattr(usage, "total_tokens", None),
+        } if usage is not None else None,
+    }
+
+
+def decode_openai(data: Dict[str, Any]) -> Any:
+    usage = data.get("usage")
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=data["content"]))],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
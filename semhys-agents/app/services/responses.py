@@ -0,0 +1,77 @@
+"""
+Fast JSON responses: orjson serialization, optional field projection (?fields=) and
+negotiated compression (br > gzip) above RESPONSE_COMPRESS_MIN_BYTES.
+
+Adapter over the shared encoding helpers (response_encoding.py at the repo root), so
+these routes and the root APIs project and compress the same way.
+
+ResponseOptionsMiddleware stores the request's ?fields= and Accept-Encoding in a
+ContextVar. FastJSONResponse (the app's default_response_class) reads them when FastAPI
+renders a route's return value, which happens after response_model validation, so
+routes keep returning their Pydantic models:
+
+    POST /api/reports/generate?fields=title,citations_internal.uri
+"""
+from __future__ import annotations
+
+import contextvars
+import sys
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+
+_REPO_ROOT = str(Path(__file__).resolve().parents[3])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from response_encoding import compress_body, dumps, parse_fields, project  # noqa: E402
+
+# (fields, accept_encoding) of the current request
+_options: contextvars.ContextVar[Tuple[Optional[str], Optional[str]]] = contextvars.ContextVar(
+    "semhys_agents_response_options", default=(None, None)
+)
+
+
+class ResponseOptionsMiddleware:
+    """Pure ASGI middleware: captures ?fields= and Accept-Encoding for FastJSONResponse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        headers = dict(scope.get("headers") or [])
+        token = _options.set((
+            query.get("fields", [None])[-1],
+            headers.get(b"accept-encoding", b"").decode("latin-1") or None,
+        ))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _options.reset(token)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson body, projected on 200 responses, compressed when large enough."""
+
+    def __init__(self, content: Any, status_code: int = 200, headers=None, media_type=None, background=None):
+        super().__init__(content, status_code, headers, media_type, background)
+        _, accept_encoding = _options.get()
+        body, extra = compress_body(self.body, accept_encoding)
+        if body is not self.body:
+            self.body = body
+            self.headers["content-length"] = str(len(body))
+        for name, value in extra.items():
+            self.headers[name] = value
+
+    def render(self, content: Any) -> bytes:
+        fields, _ = _options.get()
+        if self.status_code == 200 and fields:
+            content = project(content, parse_fields(fields))
+        return dumps(content)
@@ -0,0 +1,41 @@
+"""
+Adapter over the shared span tracing (agents/v3/tracing.py at the repo root): these
+routes and the main pipeline nest spans in the same ContextVar and export the same
+JSONL records (TRACE_EXPORT_PATH), rendered by the shared viewer:
+
+    python ../agents/v3/tracing.py waterfall --file traces.jsonl
+
+Only the OpenAI usage shape lives here; Gemini responses use the shared record_usage.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any
+
+_REPO_ROOT = str(Path(__file__).resolve().parents[3])
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from agents.v3.tracing import (  # noqa: E402,F401
+    current_span,
+    increment,
+    record_usage as record_gemini_usage,
+    set_attribute,
+    span,
+    traced,
+)
+
+
+def record_openai_usage(resp: Any) -> None:
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    for key, attr in (
+        ("prompt_tokens", "prompt_tokens"),
+        ("output_tokens", "completion_tokens"),
+        ("total_tokens", "total_tokens"),
+    ):
+        value = getattr(usage, attr, None)
+        if isinstance(value, int):
+            set_attribute(key, value)
@@ -1,15 +1,24 @@
 
+import os
 from typing import Any, Dict, List, Tuple
-from google.cloud import discoveryengine_v1 as discoveryengine
-from google.api_core.client_options import ClientOptions
+
+from app.services.deadline import remaining_timeout
+from app.services.replay import replayable
+from app.services.tracing import set_attribute, span, traced
 
 def _client(location: str):
+    # SDK imported on first search, not at app startup
+    from google.cloud import discoveryengine_v1 as discoveryengine
+    from google.api_core.client_options import ClientOptions
+
     if location == "global":
         return discoveryengine.SearchServiceClient()
     return discoveryengine.SearchServiceClient(
         client_options=ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
     )
 
+@traced("search_vertex")
+@replayable("vertex.search", encode=list, decode=tuple)
 def search_vertex(
     project_id: str,
     location: str,
@@ -31,14 +40,21 @@ def search_vertex(
         serving_config=serving_config,
     )
 
+    from google.cloud import discoveryengine_v1 as discoveryengine
+
     req = discoveryengine.SearchRequest(
         serving_config=sc_path,
         query=query,
         page_size=top_k,
     )
 
-    resp = client.search(request=req)
-    results = list(resp.results)
+    with span("vertex.search", data_store=data_store_id, page_size=top_k):
+        resp = client.search(
+            request=req,
+            timeout=remaining_timeout(float(os.getenv("SEARCH_TIMEOUT_SECONDS", "30"))),
+        )
+        results = list(resp.results)
+    set_attribute("results", len(results))
 
     docs: List[Dict[str, Any]] = []
     facets = {"year": [], "project": [], "doc_type": [], "discipline": []}
@@ -0,0 +1,226 @@
+"""
+Sitio estático (semhys.com) servido por main.py: build con huella + precompresión y
+capa de servicio con negociación de contenido.
+
+    python static_site.py                        # build en static_dist/ (STATIC_DIST_DIR)
+    python static_site.py --output /tmp/dist
+
+Build:
+  - Solo se publica la lista blanca PAGES + ASSETS (nada de source.zip, logs ni código).
+  - Cada asset se copia como <nombre>.<sha256[:12]>.<ext> y las páginas se reescriben
+    para apuntar a esa versión (script.js?v=1.1 -> script.3f9a1c2b7d4e.js).
+  - Los tipos de texto se precomprimen (.gz y, si está instalado brotli, .br); solo se
+    guarda la variante si ahorra al menos MIN_SAVING.
+  - manifest.json: ruta URL -> tipo, política de caché y variantes con su ETag.
+
+Servicio (StaticSite):
+  - Ruta fuera del manifiesto: 404.
+  - Accept-Encoding decide la variante (br > gzip > identity), con Vary: Accept-Encoding.
+  - ETag fuerte por variante; If-None-Match -> 304.
+  - Assets con huella: Cache-Control immutable de un año. Páginas y nombres sin
+    huella (script.js, logo.png): no-cache, se revalidan con el ETag.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from response_encoding import ENCODINGS, accepted_encodings, compress
+
+logger = logging.getLogger("semhys-backend")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIST_DIR = os.getenv("STATIC_DIST_DIR", os.path.join(ROOT, "static_dist"))
+
+# Lista blanca: lo único que se publica
+PAGES = ("index.html", "blog.html", "services.html", "shop.html", "energy.html", "hydraulics.html", "water.html")
+ASSETS = ("script.js", "ecosistimasemhys.js", "logo.png")
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".ico": "image/x-icon",
+}
+# Formatos ya comprimidos (png, jpg, webp) no se precomprimen
+COMPRESSIBLE = (".html", ".js", ".css", ".json", ".svg")
+MIN_SAVING = 0.05
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Build: compresión máxima (se hace una vez, no por petición)
+BUILD_LEVELS = {"br": 11, "gzip": 9}
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_variants(output: str, name: str, data: bytes) -> Dict[str, Dict]:
+    """Escribe el archivo y sus variantes comprimidas; devuelve {encoding: {path, etag, size}}."""
+    with open(os.path.join(output, name), "wb") as f:
+        f.write(data)
+    variants = {"identity": {"path": name, "etag": _digest(data)[:20], "size": len(data)}}
+    if not name.endswith(COMPRESSIBLE):
+        return variants
+    for encoding in ENCODINGS:
+        compressed = compress(data, encoding, level=BUILD_LEVELS[encoding])
+        if compressed is None or len(compressed) > len(data) * (1 - MIN_SAVING):
+            continue
+        path = name + SUFFIXES[encoding]
+        with open(os.path.join(output, path), "wb") as f:
+            f.write(compressed)
+        variants[encoding] = {"path": path, "etag": f"{_digest(data)[:20]}-{encoding}", "size": len(compressed)}
+    return variants
+
+
+def _fingerprinted(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{_digest(data)[:12]}{ext}"
+
+
+def _rewrite_references(html: str, renames: Dict[str, str]) -> str:
+    """src/href a un asset (con o sin ?v=...) -> su nombre con huella."""
+    for original, hashed in renames.items():
+        html = re.sub(
+            rf'((?:src|href)=["\'])(?:\./|/)?{re.escape(original)}(?:\?[^"\']*)?(["\'])',
+            rf"\g<1>{hashed}\g<2>",
+            html
+        )
+    return html
+
+
+def build(source: str = ROOT, output: str = DEFAULT_DIST_DIR) -> Dict:
+    """
+    Genera el sitio en 'output' (se reemplaza entero) y devuelve el manifiesto.
+    Se construye en un directorio temporal y se mueve al final: un servidor que lea
+    'output' nunca ve un build a medias.
+    """
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".static_build_", dir=parent)
+    files, renames = {}, {}
+
+    for name in ASSETS:
+        with open(os.path.join(source, name), "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(name)[1]
+        hashed = _fingerprinted(name, data)
+        renames[name] = hashed
+        variants = _write_variants(staging, hashed, data)
+        files[f"/{hashed}"] = {"content_type": CONTENT_TYPES[ext], "immutable": True, "variants": variants}
+        # Nombre original para enlaces externos y HTML en caché: mismo contenido, se revalida
+        files[f"/{name}"] = {"content_type": CONTENT_TYPES[ext], "immutable": False, "variants": variants}
+
+    for name in PAGES:
+        with open(os.path.join(source, name), "r", encoding="utf-8") as f:
+            html = _rewrite_references(f.read(), renames)
+        variants = _write_variants(staging, name, html.encode("utf-8"))
+        files[f"/{name}"] = {"content_type": CONTENT_TYPES[".html"], "immutable": False, "variants": variants}
+    files["/"] = files["/index.html"]
+
+    manifest = {"files": files}
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.replace(staging, output)
+    return manifest
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110): ignora el prefijo W/."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class StaticSite:
+    """
+    Sitio generado por build() y cargado en memoria (unos cientos de KB por variante).
+    Si no existe el build (p. ej. desarrollo local sin el paso de Docker), se genera al cargar.
+    """
+
+    def __init__(self, dist_dir: str = DEFAULT_DIST_DIR, source: str = ROOT):
+        self.dist_dir = dist_dir
+        self.source = source
+        self.files: Dict[str, Dict] = {}
+        self._bodies: Dict[str, bytes] = {}
+
+    def load(self) -> "StaticSite":
+        manifest_path = os.path.join(self.dist_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            logger.warning(f"⚠️ Sin build estático en {self.dist_dir}: generándolo (python static_site.py)")
+            build(self.source, self.dist_dir)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.files = json.load(f)["files"]
+        self._bodies = {}
+        for entry in self.files.values():
+            for variant in entry["variants"].values():
+                if variant["path"] not in self._bodies:
+                    with open(os.path.join(self.dist_dir, variant["path"]), "rb") as f:
+                        self._bodies[variant["path"]] = f.read()
+        logger.info(f"🌐 Sitio estático cargado: {len(self.files)} rutas, {len(self._bodies)} variantes")
+        return self
+
+    def respond(
+        self,
+        path: str,
+        accept_encoding: Optional[str] = None,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[int, bytes, Dict[str, str]]:
+        """(status, cuerpo, cabeceras) para la ruta URL pedida."""
+        entry = self.files.get(path)
+        if entry is None:
+            return 404, b"Not Found", {"Content-Type": "text/plain; charset=utf-8", "Cache-Control": REVALIDATE_CACHE}
+
+        accepted = accepted_encodings(accept_encoding)
+        encoding = next((e for e in ENCODINGS if e in entry["variants"] and e in accepted), "identity")
+        variant = entry["variants"][encoding]
+
+        headers = {
+            "ETag": f'"{variant["etag"]}"',
+            "Cache-Control": IMMUTABLE_CACHE if entry["immutable"] else REVALIDATE_CACHE,
+            "Content-Type": entry["content_type"],
+        }
+        if len(entry["variants"]) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if _etag_matches(if_none_match, headers["ETag"]):
+            return 304, b"", headers
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, self._bodies[variant["path"]], headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build del sitio estático (huella + precompresión)")
+    parser.add_argument("--source", default=ROOT)
+    parser.add_argument("--output", default=DEFAULT_DIST_DIR)
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.output)
+    for path, entry in sorted(manifest["files"].items()):
+        sizes = ", ".join(f"{e} {v['size'] / 1024:.1f} KB" for e, v in entry["variants"].items())
+        print(f"  {path:<40} {sizes}")
+    print(f"✅ Sitio estático generado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import pytest
+
+from agents.v3.claim_checker import extract_local_claims, extract_quantities, pre_verify
+
+
+def _values(text):
+    return [(q["low"], q["high"], q["unit"]) for q in extract_quantities(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("entre 30 y 40%", [(30.0, 40.0, "%")]),
+    ("de 5 a 10 bar", [(5.0, 10.0, "bar")]),
+    ("del 20 al 30%", [(20.0, 30.0, "%")]),
+    ("between 2 and 3 bar", [(2.0, 3.0, "bar")]),
+    ("from 1,000 kW to 1,500 kW", [(1000.0, 1500.0, "kW")]),
+    ("30-40%", [(30.0, 40.0, "%")]),
+    ("30 – 40 %", [(30.0, 40.0, "%")]),
+])
+def test_ranges(text, expected):
+    assert _values(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("20%, 30% y 40%", [(20.0, 20.0, "%"), (30.0, 30.0, "%"), (40.0, 40.0, "%")]),
+    ("30 and 40 bar", [(30.0, 30.0, "bar"), (40.0, 40.0, "bar")]),
+    ("increased 20% to 30%", [(20.0, 20.0, "%"), (30.0, 30.0, "%")]),
+])
+def test_lists_are_not_ranges(text, expected):
+    assert _values(text) == expected
+
+
+def test_mixed_units():
+    assert _values("50% and 30 bar") == [(50.0, 50.0, "%"), (30.0, 30.0, "bar")]
+    # Misma magnitud con unidades distintas: se convierte cada extremo
+    assert _values("de 1 MW a 1500 kW") == [(1000.0, 1500.0, "kW")]
+    assert _values("3 bar") == [(3.0, 3.0, "bar")]
+    assert _values("100 psi") == [(pytest.approx(6.89476), pytest.approx(6.89476), "bar")]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,500 kW", [(1500.0, 1500.0, "kW")]),
+    ("1.500 kW", [(1500.0, 1500.0, "kW")]),
+    ("2,5 bar", [(2.5, 2.5, "bar")]),
+    ("0,85 bar", [(0.85, 0.85, "bar")]),
+    ("1.234,5 m3/h", [(1234.5, 1234.5, "m³/h")]),
+])
+def test_thousands_and_decimal_separators(text, expected):
+    assert _values(text) == expected
+
+
+def test_local_claims_skip_years_and_counts():
+    claims = extract_local_claims(
+        "En 2019 se instalaron las primeras bombas en la planta.\n"
+        "La sección 3 describe el montaje completo del equipo.\n"
+        "El variador reduce el consumo de forma notable.\n"
+        "La eficiencia alcanza el 85% en el punto nominal."
+    )
+    assert [c["claim_type"] for c in claims] == ["comparative", "numerical"]
+
+
+def _claim(text):
+    return {"claim_text": text, "quantities": extract_quantities(text)}
+
+
+def _passage(text, passage_id="p1"):
+    return {"passage_id": passage_id, "text": text}
+
+
+def test_pre_verify_match_within_source_range():
+    result = pre_verify(
+        _claim("Las fugas de agua en la red alcanzan el 12%."),
+        [_passage("Las fugas de agua en redes urbanas están entre 10 y 15% del caudal.")],
+    )
+    assert result["verified"] is True
+    assert result["verification_method"] == "numeric_match"
+
+
+def test_pre_verify_mismatch_same_context():
+    result = pre_verify(
+        _claim("Las fugas de agua en la red alcanzan el 30%."),
+        [_passage("Las fugas de agua en redes urbanas están entre 10 y 15% del caudal.")],
+    )
+    assert result["verified"] is False
+    assert result["verification_method"] == "numeric_mismatch"
+
+
+def test_pre_verify_ignores_unrelated_context():
+    # Misma unidad pero otra magnitud: no se decide de forma determinista
+    assert pre_verify(
+        _claim("Las fugas de agua en la red alcanzan el 30%."),
+        [_passage("La eficiencia del motor eléctrico llega al 30% de mejora tras el ajuste.")],
+    ) is None
+    assert pre_verify(
+        _claim("Las fugas de agua en la red alcanzan el 12%."),
+        [_passage("La eficiencia del motor eléctrico mejora un 40% tras el ajuste.")],
+    ) is None
+
+
+def test_pre_verify_list_is_not_a_range():
+    # "12% y 14%" son dos valores: no respalda un 13%
+    assert pre_verify(
+        _claim("Las fugas de agua en la red alcanzan el 13%."),
+        [_passage("Las fugas de agua medidas fueron 12% y 14% en dos campañas.")],
+    )["verified"] is False
+
+
+def test_pre_verify_without_quantities_or_candidates():
+    assert pre_verify(_claim("El variador mejora la eficiencia."), [_passage("Texto")]) is None
+    assert pre_verify(_claim("Las fugas alcanzan el 12%."), []) is None
@@ -0,0 +1,60 @@
+import pytest
+
+from agents.v3.evidence_index import EvidenceIndex, parse_number, tokenize
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1,000", 1000.0),
+    ("1.000", 1000.0),
+    ("1,234,567", 1234567.0),
+    ("0,85", 0.85),
+    ("0,850", 0.85),
+    ("2,5", 2.5),
+    ("3.14159", 3.14159),
+    ("1.234,5", 1234.5),
+    ("1,234.5", 1234.5),
+    ("50", 50.0),
+])
+def test_parse_number_separators(raw, expected):
+    assert parse_number(raw) == pytest.approx(expected)
+
+
+def test_tokenize_normalizes_numbers():
+    tokens = tokenize("Caudal de 1,000 m3/h con eficiencia 0,85 y 50.0 bar")
+    assert "#1000" in tokens
+    assert "#0.85" in tokens
+    assert "#50" in tokens
+    assert "#1" not in tokens
+    # Sin acentos ni stopwords
+    assert "eficiencia" in tokens and "con" not in tokens
+
+
+def _dossier(*contents):
+    return {"knowledge_base": {"hydraulics": [
+        {"doc_type": "manual", "technical_content": content} for content in contents
+    ]}}
+
+
+def test_search_ranks_matching_passage_first():
+    index = EvidenceIndex(_dossier(
+        "Los variadores de frecuencia reducen el consumo de las bombas centrífugas un 30%.",
+        "La cavitación aparece cuando el NPSH disponible cae por debajo del requerido.",
+        "El golpe de ariete se controla con válvulas de cierre lento en la impulsión.",
+    ))
+    results = index.search("cavitación NPSH requerido")
+    assert results[0]["passage_id"] == "hydraulics:1:0"
+    assert all(r["score"] > 0 for r in results)
+
+
+def test_search_boosts_numeric_match():
+    index = EvidenceIndex(_dossier(
+        "La eficiencia de la bomba en el punto nominal es del 85% según el fabricante.",
+        "La eficiencia de la bomba en el punto nominal es del 70% según el fabricante.",
+    ))
+    assert index.search("eficiencia de la bomba 70%")[0]["passage_id"] == "hydraulics:1:0"
+
+
+def test_search_without_matches():
+    index = EvidenceIndex(_dossier("Texto sobre válvulas de retención en redes de riego."))
+    assert index.search("turbina eólica") == []
+    assert EvidenceIndex({}).search("bomba") == []